@@ -1,17 +1,27 @@
 from fastapi import FastAPI
+from .assets import router as assets_router
 from .auth import router as auth_router
+from .health import router as health_router
 from .home import router as home_router
+from .obrazky import router as obrazky_router
 from .rocniky import router as rocniky_router
+from .udrzba import router as udrzba_router
 from .users import router as users_router
 from .vina import router as vina_router
+from .zmeny import router as zmeny_router
 
 
 def register_routers(app: FastAPI) -> None:
     """
     Připojí všechny routery k instanci FastAPI aplikace.
     """
+    app.include_router(assets_router, prefix="/assets", tags=["assets"])
     app.include_router(auth_router, prefix="/auth", tags=["auth"])
+    app.include_router(health_router, prefix="/health", tags=["health"])
     app.include_router(home_router, tags=["home"])
+    app.include_router(obrazky_router, prefix="/obrazky", tags=["obrazky"])
     app.include_router(rocniky_router, prefix="/rocniky", tags=["rocniky"])
+    app.include_router(udrzba_router, prefix="/udrzba", tags=["udrzba"])
     app.include_router(users_router, prefix="/users", tags=["users"])
-    app.include_router(vina_router, prefix="/vina", tags=["vina"])
\ No newline at end of file
+    app.include_router(vina_router, prefix="/vina", tags=["vina"])
+    app.include_router(zmeny_router, prefix="/zmeny", tags=["zmeny"])
\ No newline at end of file
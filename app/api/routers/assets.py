@@ -0,0 +1,34 @@
+import mimetypes
+from fastapi import APIRouter, Request, HTTPException, status
+from fastapi.responses import FileResponse
+
+from app.core.assets import najit_asset
+
+router = APIRouter()
+
+@router.get("/{nazev:path}")
+def asset(nazev: str, request: Request):
+    """
+    Vrátí statický soubor s otiskem obsahu v názvu.
+
+    Obsah se pod daným názvem nikdy nezmění, proto smí prohlížeč soubor
+    držet v cache napořád (immutable). Podle Accept-Encoding se pošle
+    předkomprimovaná varianta brotli/gzip, bez komprese za běhu.
+    """
+    nalezeny = najit_asset(nazev, request.headers.get("accept-encoding", ""))
+    if not nalezeny:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+    cesta, kodovani = nalezeny
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Vary": "Accept-Encoding",
+    }
+    if kodovani:
+        headers["Content-Encoding"] = kodovani
+
+    return FileResponse(
+        cesta,
+        media_type=mimetypes.guess_type(nazev)[0] or "application/octet-stream",
+        headers=headers
+    )
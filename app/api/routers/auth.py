@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Request, Form, Depends, status
+from typing import Optional
+from fastapi import APIRouter, Request, Form, Depends, Cookie, status
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
-from app.core.security import verify_password, create_access_token
-from app.core.config import settings
+from app.core.security import verify_password, create_access_token, set_auth_cookies
 from app.repositories.users import get_user_by_login
-from app.dependencies import get_template_context
+from app.repositories.tokens import vydat_refresh_token, zrusit_refresh_token
+from app.core.ratelimit import login_throttle
+from app.dependencies import get_template_context, check_login_throttle
 
 router = APIRouter()
 
@@ -26,7 +28,7 @@ def login_page(
 @router.post("/login")
 def login_submit(
     request: Request,
-    username: str = Form(...),
+    username: str = Depends(check_login_throttle),
     password: str = Form(...),
     db: Session = Depends(get_db),
     ctx: dict = Depends(get_template_context)
@@ -35,12 +37,13 @@ def login_submit(
     Zpracuje odeslaný přihlašovací formulář.
 
     Provede následující kroky:
-    1. Ověří existenci uživatele podle loginu.
-    2. Ověří správnost hesla (hash).
-    3. Zkontroluje, zda má uživatel aktivní účet.
-    4. V případě úspěchu vytvoří JWT access token.
-    5. Nastaví token do zabezpečené HttpOnly cookie.
-    6. Přesměruje uživatele na hlavní stránku.
+    1. Započítá pokus do limitu přihlášení (viz 'check_login_throttle').
+    2. Ověří existenci uživatele podle loginu.
+    3. Ověří správnost hesla (hash).
+    4. Zkontroluje, zda má uživatel aktivní účet.
+    5. V případě úspěchu vytvoří JWT access token a rotující refresh token.
+    6. Nastaví oba tokeny do zabezpečených HttpOnly cookies.
+    7. Přesměruje uživatele na hlavní stránku.
 
     Pokud ověření selže, vrátí znovu přihlašovací formulář s chybovou hláškou.
     """
@@ -58,27 +61,33 @@ def login_submit(
             {**ctx, "error": "Váš účet byl deaktivován."}
         )
 
+    login_throttle.success(username)
+
     access_token = create_access_token(data={"sub": user.login})
+    refresh_token = vydat_refresh_token(db, user)
+    db.commit()
 
     response = RedirectResponse(url="/", status_code=status.HTTP_302_FOUND)
     
-    response.set_cookie(
-        key="access_token",
-        value=f"Bearer {access_token}",
-        httponly=True,
-        max_age=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
-    )
+    set_auth_cookies(response, access_token, refresh_token)
     
     return response
 
 @router.get("/logout")
-def logout():
+def logout(
+    refresh_token: Optional[str] = Cookie(None),
+    db: Session = Depends(get_db)
+):
     """
     Odhlásí uživatele.
 
-    Smaže cookie s přístupovým tokenem ('access_token')
-    přesměruje uživatele na hlavní stránku.
+    Zneplatní refresh token na serveru, smaže cookies s tokeny
+    ('access_token', 'refresh_token') a přesměruje uživatele na hlavní stránku.
     """
+    if refresh_token:
+        zrusit_refresh_token(db, refresh_token)
+
     response = RedirectResponse(url="/", status_code=status.HTTP_302_FOUND)
     response.delete_cookie("access_token")
+    response.delete_cookie("refresh_token")
     return response
\ No newline at end of file
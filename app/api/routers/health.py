@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Request, status
+from fastapi.responses import JSONResponse
+
+from app.core.kapacita import metriky_kapacity
+from app.core.prenos import metriky_prenosu
+
+router = APIRouter()
+
+@router.get("/live")
+def live():
+    """Proces běží a odpovídá (liveness)."""
+    return {"status": "ok"}
+
+@router.get("/ready")
+def ready(request: Request):
+    """
+    Aplikace je připravená přijímat provoz (readiness).
+    Dokud neskončí zahřátí po startu, vrací 503.
+    """
+    if not getattr(request.app.state, "pripraveno", False):
+        return JSONResponse({"status": "starting"}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    return {"status": "ready", "startup": request.app.state.casy_startu}
+
+@router.get("/kapacita")
+async def kapacita():
+    """
+    Obsazenost skupin provozu, délka jejich front a počty odmítnutých požadavků,
+    k tomu počet diváků živého přenosu pořadí (ti se do skupin nepočítají).
+    Běží přímo v event loopu: potřebuje ho ke čtení stavu threadpoolu
+    a musí odpovědět, i když jsou všechna vlákna obsazená.
+    """
+    return {**metriky_kapacity(), "prenos": metriky_prenosu()}
@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Request, Depends, status, HTTPException
-from fastapi.responses import RedirectResponse
+import anyio
+from fastapi import APIRouter, Request, Depends, Header, Response, status, HTTPException
+from fastapi.responses import RedirectResponse, StreamingResponse
 from typing import Optional
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db, iterovat_v_session
+from app.core.prenos import prihlasit
+from app.core.streaming import StreamingTemplateResponse
 from app.dependencies import get_template_context
 from app.repositories.rocniky import get_nejnovejsi_rocnik, get_rocnik_by_id
-from app.repositories.vina import get_vina_by_rocnik, get_vino_detail
-from app.repositories.users import get_public_user_detail
+from app.repositories.vina import iter_vina_by_rocnik, get_vino_detail
+from app.repositories.poradi import zajistit_poradi, get_verze_poradi
+from app.repositories.users import get_profil_vinare
+from app.repositories.hledani import hledat_vina
 
 router = APIRouter()
 
@@ -21,6 +27,7 @@ def home_page(
     Zobrazí úvodní stránku se seznamem vín.
     
     Pokud není specifikován 'rocnik_id', zobrazí se vína z nejnovějšího ročníku.
+    Stránka se streamuje, tabulka vín se posílá průběžně po řádcích.
     """
     selected_rocnik = None
 
@@ -32,26 +39,75 @@ def home_page(
     
     vina = []
     rocnik_nazev = "V databázi nejsou žádné ročníky"
+    verze_poradi = None
 
     if selected_rocnik:
         rocnik_nazev = f"Ročník {selected_rocnik.rok}"
         if not selected_rocnik.is_active:
             rocnik_nazev += " (Archiv)"
-        vina = get_vina_by_rocnik(db, selected_rocnik.id)
+        zajistit_poradi(db, selected_rocnik.id)
+        vina = iterovat_v_session(iter_vina_by_rocnik, selected_rocnik.id)
+        if not selected_rocnik.is_archived:
+            # Verze pořadí, ze které stránka vzniká, pro živý přenos
+            verze_poradi = get_verze_poradi(db, selected_rocnik.id)
 
     error_msg = ctx["request"].query_params.get("error")
     
-    return ctx["request"].app.state.templates.TemplateResponse(
+    return StreamingTemplateResponse(
+        ctx["request"].app.state.templates,
         "index.html",
         {
             **ctx,
             "active_rocnik": selected_rocnik, 
             "rocnik_nazev": rocnik_nazev,
             "vina": vina,
+            "verze_poradi": verze_poradi,
             "error": error_msg
         }
     )
 
+def _lze_prenaset(rocnik_id: int) -> bool:
+    db = SessionLocal()
+    try:
+        rocnik = get_rocnik_by_id(db, rocnik_id)
+        return rocnik is not None and not rocnik.is_archived
+    finally:
+        db.close()
+
+@router.get("/prenos/{rocnik_id}")
+async def prenos_poradi(
+    request: Request,
+    rocnik_id: int,
+    verze: Optional[int] = None,
+    last_event_id: Optional[int] = Header(None)
+):
+    """
+    Živý přenos výsledkové tabulky ročníku (Server-Sent Events). Po každé
+    změně pořadí přijdou jen změněné řádky a nové pořadí vín, takže diváci
+    nemusí obnovovat celou stránku (viz app.core.prenos).
+
+    'verze' je verze pořadí ročníku, ze které vznikla stránka (zápisy, které
+    pořadí nemění, ji neposouvají); prohlížeč po výpadku
+    pošle poslední přijatou v hlavičce Last-Event-ID. Je-li starší než
+    poslední změna pořadí, přijde pokyn stránku znovu načíst.
+    Archivovaný nebo neexistující ročník vrací 204 (EventSource to ukončí).
+    """
+    if not await anyio.to_thread.run_sync(_lze_prenaset, rocnik_id):
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    odberatel = prihlasit(rocnik_id, request.app.state.templates)
+    if odberatel is None:
+        return Response(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": str(settings.KAPACITA_RETRY_AFTER)}
+        )
+
+    return StreamingResponse(
+        odberatel.zpravy(last_event_id if last_event_id is not None else verze),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/vino/{vino_id}")
 def vino_detail(
     vino_id: int,
@@ -81,9 +137,9 @@ def vinar_detail(
     db: Session = Depends(get_db)
 ):
     """
-    Zobrazí veřejný profil vinaře a jeho vína.
+    Zobrazí veřejný profil vinaře a jeho vína ze všech ročníků.
     """
-    vinar = get_public_user_detail(db, vinar_id)
+    vinar = get_profil_vinare(db, vinar_id)
     
     if not vinar:
         return RedirectResponse(
@@ -94,4 +150,20 @@ def vinar_detail(
     return ctx["request"].app.state.templates.TemplateResponse(
         "detail_vinar.html", 
         {**ctx, "vinar": vinar}
-    )
\ No newline at end of file
+    )
+
+@router.get("/hledat")
+def hledat(
+    q: str = "",
+    strana: int = 1,
+    ctx: dict = Depends(get_template_context),
+    db: Session = Depends(get_db)
+):
+    """
+    Fulltextové hledání vín napříč všemi ročníky včetně archivu
+    (název, odrůda, vinař, poznámky hodnotitelů), seřazené podle relevance.
+    """
+    return ctx["request"].app.state.templates.TemplateResponse(
+        "hledani.html",
+        {**ctx, "vysledek": hledat_vina(db, q, strana)}
+    )
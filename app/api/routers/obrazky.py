@@ -0,0 +1,28 @@
+import mimetypes
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import FileResponse
+
+from app.core.obrazky import najit_obrazek
+
+router = APIRouter()
+
+@router.get("/{velikost}/{otisk}")
+def obrazek(velikost: str, otisk: str):
+    """
+    Vrátí obrázek etikety v dané velikosti (nahled, web, original).
+
+    Adresa obsahuje otisk obsahu, takže se pod ní obrázek nikdy nezmění
+    a prohlížeč ho smí držet v cache napořád. Soubor posílá přímo server
+    (FileResponse), aplikace ho nečte do paměti. Dokud odvozená velikost
+    není připravená, pošle se původní obrázek bez dlouhodobé cache.
+    """
+    nalezeny = najit_obrazek(otisk, velikost)
+    if not nalezeny:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+    cesta, hotovy = nalezeny
+    return FileResponse(
+        cesta,
+        media_type=mimetypes.guess_type(cesta.name)[0] or "application/octet-stream",
+        headers={"Cache-Control": "public, max-age=31536000, immutable" if hotovy else "no-cache"}
+    )
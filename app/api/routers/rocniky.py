@@ -3,15 +3,21 @@ from fastapi import APIRouter, Request, Depends, status
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 
+from app.core.archiv import smazat_z_archivu
 from app.core.database import get_db
 from app.dependencies import get_template_context, require_admin
 from app.models.db import Rocnik, Vino, Hodnoceni
+from app.repositories.degustace import naplanovat_lety, get_prehled_letu, get_pocet_nezarazenych_vin
 from app.repositories.rocniky import (
     get_vsechny_rocniky, 
     set_active_rocnik_logic, 
     deactivate_rocnik_logic,
     get_rocnik_by_id,
-    get_nejnovejsi_rocnik
+    get_nejnovejsi_rocnik,
+    get_pocty_vin,
+    archivovat_rocnik_logic,
+    get_aktivni_rocnik,
+    smazat_rocnik_logic
 )
 
 router = APIRouter()
@@ -25,12 +31,15 @@ def sprava_rocniku(
 ):
     """Zobrazí stránku pro správu ročníků."""
     rocniky = get_vsechny_rocniky(db)
+    pocty_vin = get_pocty_vin(db)
 
     return ctx["request"].app.state.templates.TemplateResponse(
         "sprava_rocniku.html",
         {
             **ctx, 
-            "rocniky": rocniky
+            "rocniky": rocniky,
+            "pocty_vin": pocty_vin,
+            "error": request.query_params.get("error")
         }
     )
 
@@ -86,6 +95,25 @@ def deaktivovat_rocnik(
     
     return RedirectResponse("/rocniky/sprava", status_code=status.HTTP_303_SEE_OTHER)
 
+@router.get("/archivovat/{rocnik_id}")
+def archivovat_rocnik(
+    rocnik_id: int,
+    ctx: dict = Depends(get_template_context),
+    db: Session = Depends(get_db),
+    admin_check: dict = Depends(require_admin)
+):
+    """
+    Přesune vína a hodnocení deaktivovaného ročníku do souboru archivu.
+    Výsledky ročníku zůstanou dostupné jen pro čtení.
+    """
+    if not archivovat_rocnik_logic(db, rocnik_id):
+        return RedirectResponse(
+            "/rocniky/sprava?error=Ročník nelze archivovat (je aktivní, nejnovější nebo už archivovaný).",
+            status_code=status.HTTP_303_SEE_OTHER
+        )
+
+    return RedirectResponse("/rocniky/sprava", status_code=status.HTTP_303_SEE_OTHER)
+
 @router.get("/smazat/{rocnik_id}")
 def smazat_rocnik(
     rocnik_id: int,
@@ -94,13 +122,66 @@ def smazat_rocnik(
     admin_check: dict = Depends(require_admin)
 ):
     """
-    Smaže ročník i se všemi víny a jejich hodnocením v daném ročníku
-    díky parametrům cascade="all, delete-orphan" v db.py
+    Smaže ročník i se všemi víny a jejich hodnocením v daném ročníku.
+    Závislé řádky maže databáze kaskádou, viz 'smazat_rocnik_logic'.
+    U archivovaného ročníku se vína smažou i z archivu.
     """
     rocnik = get_rocnik_by_id(db, rocnik_id)
     
     if rocnik:
-        db.delete(rocnik)
+        archivovany = rocnik.is_archived
+        smazat_rocnik_logic(db, rocnik.id)
         db.commit()
+        # Archiv se zapisuje vlastním spojením, proto až po úspěšném commitu
+        if archivovany:
+            smazat_z_archivu(rocnik_id=rocnik_id)
+
+    return RedirectResponse("/rocniky/sprava", status_code=status.HTTP_303_SEE_OTHER)
+
+@router.get("/lety")
+def lety_page(
+    ctx: dict = Depends(get_template_context),
+    db: Session = Depends(get_db),
+    admin_check: dict = Depends(require_admin)
+):
+    """Zobrazí degustační lety aktivního ročníku a složení jejich panelů."""
+    rocnik = get_aktivni_rocnik(db)
+    lety = get_prehled_letu(db, rocnik.id) if rocnik else []
+    nezarazena = get_pocet_nezarazenych_vin(db, rocnik.id) if rocnik else 0
+
+    return ctx["request"].app.state.templates.TemplateResponse(
+        "lety.html",
+        {
+            **ctx,
+            "rocnik": rocnik,
+            "lety": lety,
+            "nezarazena": nezarazena,
+            "info": ctx["request"].query_params.get("info")
+        }
+    )
+
+@router.post("/lety")
+def naplanovat_lety_submit(
+    ctx: dict = Depends(get_template_context),
+    db: Session = Depends(get_db),
+    admin_check: dict = Depends(require_admin)
+):
+    """
+    Rozdělí vína aktivního ročníku do degustačních letů a přiřadí panely
+    hodnotitelů. Předchozí plán se nahradí, udělená hodnocení zůstávají.
+    """
+    rocnik = get_aktivni_rocnik(db)
+    if not rocnik:
+        return RedirectResponse("/rocniky/lety", status_code=status.HTTP_303_SEE_OTHER)
+
+    souhrn = naplanovat_lety(db, rocnik.id)
+    db.commit()
+
+    info = (
+        f"Naplánováno {souhrn['pocet_letu']} letů pro {souhrn['pocet_vin']} vín, "
+        f"panel {souhrn['velikost_panelu']} z {souhrn['pocet_hodnotitelu']} hodnotitelů."
+    )
+    if souhrn["neuplne_panely"]:
+        info += f" Neúplný panel (střet zájmů): {souhrn['neuplne_panely']} letů."
 
-    return RedirectResponse("/rocniky/sprava", status_code=status.HTTP_303_SEE_OTHER)
\ No newline at end of file
+    return RedirectResponse(f"/rocniky/lety?info={info}", status_code=status.HTTP_303_SEE_OTHER)
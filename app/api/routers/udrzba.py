@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, status
+from fastapi.responses import RedirectResponse
+
+from app.core.config import settings
+from app.core.udrzba import statistiky_databaze, stav_udrzby, udrzovat
+from app.dependencies import get_template_context, require_admin
+
+router = APIRouter()
+
+@router.get("")
+def udrzba_page(
+    ctx: dict = Depends(get_template_context),
+    admin_check: dict = Depends(require_admin)
+):
+    """Zobrazí velikost a fragmentaci databáze soutěže a poslední běhy údržby."""
+    return ctx["request"].app.state.templates.TemplateResponse(
+        "udrzba.html",
+        {
+            **ctx,
+            "soubory": statistiky_databaze(),
+            "stav": stav_udrzby(),
+            "interval": settings.UDRZBA_INTERVAL_MINUTES,
+            "info": ctx["request"].query_params.get("info")
+        }
+    )
+
+@router.post("/spustit")
+def spustit_udrzbu(
+    admin_check: dict = Depends(require_admin)
+):
+    """
+    Spustí údržbu hned: úplný ANALYZE a uvolnění volných stránek
+    (po krocích, nejvýš UDRZBA_VACUUM_MAX_KROKU) bez čekání na klid.
+    """
+    vysledek = udrzovat(vynutit=True)
+    if vysledek["chyba"]:
+        info = f"Údržba nedoběhla: {vysledek['chyba']}"
+    else:
+        info = (
+            f"Statistiky přepočítány, uvolněno {vysledek['uvolneno_stranek']} stránek "
+            f"za {vysledek['trvani_s']} s."
+        )
+    return RedirectResponse(f"/udrzba?info={info}", status_code=status.HTTP_303_SEE_OTHER)
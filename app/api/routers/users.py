@@ -1,13 +1,22 @@
-from fastapi import APIRouter, Request, Depends, status, HTTPException, Form    
+from fastapi import APIRouter, Request, Depends, status, HTTPException, Form, File, UploadFile
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 from typing import List
+from urllib.parse import parse_qsl, urlencode
 
+from app.core.archiv import smazat_z_archivu
+from app.core.config import settings
 from app.core.database import get_db
 from app.dependencies import get_template_context, require_admin, get_current_user
-from app.repositories.users import get_all_users, get_user_by_id, get_all_roles, get_user_by_login
+from app.repositories.users import (
+    hledat_uzivatele, get_user_by_id, get_all_roles, get_user_by_login, smazat_uzivatele_logic,
+    smazat_uzivatele_hromadne, nastavit_aktivitu, pridat_roli, odebrat_roli
+)
+from app.repositories.import_vin import nacist_soubor
+from app.repositories.import_uzivatelu import SLOUPCE, pripravit_import, spustit_import, stav_importu
 from app.models.db import Role, Users
 from app.core.security import get_password_hash
+from app.repositories.poradi import prepocitat_poradi
 
 router = APIRouter()
 
@@ -74,30 +83,90 @@ def muj_profil_submit(
     
     return RedirectResponse("/users/profil", status_code=status.HTTP_303_SEE_OTHER)
 
+def _parametr_role(role: str):
+    return int(role) if role.isdigit() else None
+
 @router.get("/sprava")
 def sprava_uzivatelu(
     request: Request,
+    q: str = "",
+    role: str = "",
+    razeni: str = "id",
+    smer: str = "asc",
+    strana: int = 1,
     ctx: dict = Depends(get_template_context),
     db: Session = Depends(get_db),
     admin_check: dict = Depends(require_admin)
 ):
     """
-    Zobrazí administrační přehled všech uživatelů (pouze pro Adminy).
-    Načte seznam všech uživatelů a zobrazí je v tabulce s možností úprav nebo smazání.
+    Zobrazí administrační přehled uživatelů (pouze pro Adminy).
+    Hledání, filtr podle role, řazení i stránkování dělá databáze
+    (viz 'hledat_uzivatele'), stránka nese jen jednu stranu uživatelů.
+    Vybrané uživatele lze hromadně upravit ('POST /users/hromadne').
     """
-    users = get_all_users(db)
-    
-    error_msg = request.query_params.get("error")
+    stranka = hledat_uzivatele(db, q, _parametr_role(role), razeni, smer == "desc", strana)
 
     return ctx["request"].app.state.templates.TemplateResponse(
         "sprava_uzivatelu.html",
         {
-            **ctx, 
-            "users": users,
-            "error": error_msg
+            **ctx,
+            "stranka": stranka,
+            "all_roles": get_all_roles(db),
+            "zpet": request.url.query,
+            "info": request.query_params.get("info"),
+            "error": request.query_params.get("error")
         }
     )
 
+@router.post("/hromadne")
+def hromadna_akce(
+    akce: str = Form(...),
+    ids: List[int] = Form([]),
+    role: str = Form(""),
+    zpet: str = Form(""),
+    db: Session = Depends(get_db),
+    admin_check: dict = Depends(require_admin),
+    user: Users = Depends(get_current_user)
+):
+    """
+    Provede akci s vybranými uživateli naráz, vždy jedním příkazem pro
+    všechny: aktivace, deaktivace, přidání a odebrání role nebo smazání.
+    Vlastní účet admina se vynechá (stejně jako při jednotlivé úpravě).
+    Vrací se na stejnou stranu přehledu se zprávou o výsledku.
+    """
+    vybrani = [i for i in ids if i != user.id]
+    role_id = _parametr_role(role)
+    zprava = {}
+
+    if not vybrani:
+        zprava["error"] = "Nejsou vybraní žádní uživatelé (vlastní účet nelze hromadně měnit)."
+    elif akce in ("aktivovat", "deaktivovat"):
+        pocet = nastavit_aktivitu(db, vybrani, akce == "aktivovat")
+        zprava["info"] = f"{'Aktivováno' if akce == 'aktivovat' else 'Deaktivováno'} uživatelů: {pocet}."
+    elif akce in ("pridat_roli", "odebrat_roli"):
+        if role_id is None or not db.get(Role, role_id):
+            zprava["error"] = "Vyberte roli."
+        elif akce == "pridat_roli":
+            zprava["info"] = f"Role přidána uživatelům: {pridat_roli(db, vybrani, role_id)}."
+        else:
+            zprava["info"] = f"Role odebrána uživatelům: {odebrat_roli(db, vybrani, role_id)}."
+    elif akce == "smazat":
+        smazano, dotcene_rocniky = smazat_uzivatele_hromadne(db, vybrani)
+        for rocnik_id in dotcene_rocniky:
+            prepocitat_poradi(db, rocnik_id)
+        zprava["info"] = f"Smazáno uživatelů: {smazano}."
+    else:
+        zprava["error"] = "Neznámá akce."
+
+    db.commit()
+    if akce == "smazat" and vybrani:
+        # Archiv se zapisuje vlastním spojením, proto až po úspěšném commitu
+        smazat_z_archivu(uzivatel_ids=vybrani)
+
+    parametry = [(k, v) for k, v in parse_qsl(zpet) if k not in ("info", "error")]
+    parametry += list(zprava.items())
+    return RedirectResponse(f"/users/sprava?{urlencode(parametry)}", status_code=status.HTTP_303_SEE_OTHER)
+
 @router.get("/upravit/{user_id}")
 def upravit_uzivatele_page(
     user_id: int,
@@ -258,6 +327,76 @@ def pridat_uzivatele_submit(
 
     return RedirectResponse("/users/sprava", status_code=status.HTTP_303_SEE_OTHER)
 
+@router.get("/import")
+def import_uzivatelu_page(
+    ctx: dict = Depends(get_template_context),
+    admin_check: dict = Depends(require_admin)
+):
+    """Zobrazí formulář pro hromadný import uživatelů ze souboru CSV nebo XLSX."""
+    return ctx["request"].app.state.templates.TemplateResponse("import_uzivatelu.html", {**ctx})
+
+@router.post("/import")
+def import_uzivatelu_submit(
+    soubor: UploadFile = File(...),
+    ctx: dict = Depends(get_template_context),
+    db: Session = Depends(get_db),
+    admin_check: dict = Depends(require_admin)
+):
+    """
+    Hromadně založí uživatele ze souboru (sloupce login, heslo, jmeno,
+    email, telefon, adresa, role). Řádky se hned ověří a duplicitní
+    loginy a e-maily se vyřadí, hashování hesel a uložení pak běží
+    na pozadí a průběh ukazuje stránka '/users/import/{uloha_id}'.
+    Kontrola souboru i založení úlohy běží ve vlákně (synchronní endpoint).
+    """
+    templates = ctx["request"].app.state.templates
+
+    obsah = soubor.file.read(settings.IMPORT_MAX_VELIKOST + 1)
+    try:
+        if len(obsah) > settings.IMPORT_MAX_VELIKOST:
+            raise ValueError("Soubor je příliš velký.")
+        radky = nacist_soubor(soubor.filename, obsah, SLOUPCE, "login")
+        kandidati, chyby = pripravit_import(db, radky)
+    except ValueError as chyba:
+        return templates.TemplateResponse("import_uzivatelu.html", {**ctx, "error": str(chyba)})
+
+    if not kandidati:
+        return templates.TemplateResponse(
+            "import_uzivatelu.html",
+            {**ctx, "error": "V souboru není žádný uživatel, kterého by šlo založit.", "chyby": chyby}
+        )
+
+    uloha_id = spustit_import(kandidati, chyby)
+    return RedirectResponse(f"/users/import/{uloha_id}", status_code=status.HTTP_303_SEE_OTHER)
+
+@router.get("/import/{uloha_id}")
+def import_uzivatelu_prubeh(
+    uloha_id: str,
+    ctx: dict = Depends(get_template_context),
+    admin_check: dict = Depends(require_admin)
+):
+    """Průběh a výsledek importu uživatelů, dokud běží, stránka se sama obnovuje."""
+    uloha = stav_importu(uloha_id)
+    if uloha is None:
+        return RedirectResponse(
+            "/users/sprava?error=Import nebyl nalezen (starší importy se zapomínají).",
+            status_code=status.HTTP_303_SEE_OTHER
+        )
+    return ctx["request"].app.state.templates.TemplateResponse(
+        "import_uzivatelu.html", {**ctx, "uloha": uloha, "chyby": uloha["chyby"]}
+    )
+
+@router.get("/import/{uloha_id}/stav")
+def import_uzivatelu_stav(
+    uloha_id: str,
+    admin_check: dict = Depends(require_admin)
+):
+    """Průběh importu uživatelů jako JSON (stav, celkem, zahashovano, vlozeno, chyby)."""
+    uloha = stav_importu(uloha_id)
+    if uloha is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import nebyl nalezen.")
+    return uloha
+
 @router.get("/smazat/{user_id}")
 def smazat_uzivatele(
     user_id: int,
@@ -269,7 +408,8 @@ def smazat_uzivatele(
     """
     Smaže uživatele z databáze.
     Admin nemůže smazat sám sebe.
-    Díky nastavení v db.py se smazáním uživatele automaticky smažou i jeho vína a hodnocení.
+    Se smazáním uživatele se v databázi kaskádou smažou i jeho vína a hodnocení
+    (viz 'smazat_uzivatele_logic').
     """
     user_to_delete = get_user_by_id(db, user_id)
     
@@ -282,7 +422,11 @@ def smazat_uzivatele(
             status_code=status.HTTP_303_SEE_OTHER
         )
 
-    db.delete(user_to_delete)
+    dotcene_rocniky = smazat_uzivatele_logic(db, user_to_delete.id)
+    for rocnik_id in dotcene_rocniky:
+        prepocitat_poradi(db, rocnik_id)
     db.commit()
+    # Archiv se zapisuje vlastním spojením, proto až po úspěšném commitu
+    smazat_z_archivu(uzivatel_id=user_to_delete.id)
     
     return RedirectResponse("/users/sprava", status_code=status.HTTP_303_SEE_OTHER)
\ No newline at end of file
@@ -1,17 +1,42 @@
-from fastapi import APIRouter, Request, Depends, Form, status, HTTPException
-from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session, aliased
-from typing import Optional
+from fastapi import APIRouter, Request, Depends, Form, File, UploadFile, Body, status, HTTPException
+from fastapi.responses import RedirectResponse, FileResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+import time
+import uuid
+from typing import Any, List, Optional
 
-from app.core.database import get_db
-from app.dependencies import get_template_context, get_current_user
+from app.core.config import settings
+
+from app.core.database import get_db, iterovat_v_session, zaznamenat_zmeny_dotazem, SMAZANI
+from app.core.obrazky import NeplatnyObrazek, ulozit_obrazek
+from app.core.streaming import StreamingTemplateResponse
+from app.dependencies import get_template_context, get_current_user, get_current_user_api, require_login_z_tokenu
 from app.repositories.users import get_user_by_login
 from app.repositories.rocniky import get_aktivni_rocnik
-from app.repositories.vina import get_vina_by_vinar
+from app.repositories.vina import get_vina_by_vinar, get_vino_k_hodnoceni, iter_vina_k_hodnoceni, existuji_vina_k_hodnoceni
+from app.repositories.poradi import prepocitat_poradi
+from app.repositories.degustace import get_lety_hodnotitele, vybrat_aktualni_let, existuji_lety
+from app.repositories.import_vin import nacist_soubor, importovat_vina
+from app.repositories.odrudy import get_indexy, sjednotit_odrudu
+from app.repositories.hodnoceni import synchronizovat_hodnoceni
 from app.models.db import Vino, Hodnoceni, Users
+from app.models.schemas import VysledekImportu, DavkaHodnoceni, VysledekSynchronizace, ZmenaHodnoceni, StavZmenyHodnoceni
 
 router = APIRouter()
 
+SERVICE_WORKER = "app/static/hodnoceni-sw.js"
+
+
+def _ulozit_etiketu(soubor: Optional[UploadFile]) -> Optional[str]:
+    """Uloží nahranou fotku etikety a vrátí její otisk (None, pokud se nic nenahrálo)."""
+    if soubor is None or not soubor.filename:
+        return None
+    data = soubor.file.read(settings.OBRAZKY_MAX_VELIKOST + 1)
+    if not data:
+        return None
+    return ulozit_obrazek(data)
+
 @router.get("/sprava")
 def sprava_vina(
     request: Request,
@@ -71,6 +96,7 @@ def pridat_vino_submit(
     sladkost: str = Form(None),
     privlastek: str = Form(None),
     rok_sklizne: int = Form(...),
+    etiketa: Optional[UploadFile] = File(None),
     ctx: dict = Depends(get_template_context),
     db: Session = Depends(get_db),
     user: Users = Depends(get_current_user)
@@ -79,6 +105,7 @@ def pridat_vino_submit(
     Uloží nové víno do databáze.
     Víno se automaticky přiřadí k aktuálně přihlášenému vinaři a k právě
     aktivnímu ročníku. Pokud aktivní ročník není nastaven, akce selže.
+    Volitelně se uloží i fotka etikety.
     """
     active_rocnik = get_aktivni_rocnik(db)
     if not active_rocnik:
@@ -87,22 +114,128 @@ def pridat_vino_submit(
             {**ctx, "error": "Není nastaven žádný aktivní ročník!"}
         )
 
+    try:
+        otisk_etikety = _ulozit_etiketu(etiketa)
+    except NeplatnyObrazek as chyba:
+        return ctx["request"].app.state.templates.TemplateResponse(
+            "pridat_vino.html", {**ctx, "error": str(chyba)}
+        )
+
     nove_vino = Vino(
         nazev=nazev,
-        odruda=odruda,
+        odruda=sjednotit_odrudu(odruda),
         barva=barva,
         sladkost=sladkost,
         privlastek=privlastek,
         rok_sklizne=rok_sklizne,
+        etiketa=otisk_etikety,
         vinar_id=user.id,
         rocnik_id=active_rocnik.id
     )
     
     db.add(nove_vino)
+    prepocitat_poradi(db, active_rocnik.id, [barva])
     db.commit()
 
     return RedirectResponse("/vina/sprava", status_code=status.HTTP_303_SEE_OTHER)
 
+@router.get("/import")
+def import_vin_page(
+    request: Request,
+    ctx: dict = Depends(get_template_context),
+    user: Users = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Zobrazí formulář pro hromadný import vín ze souboru CSV nebo XLSX.
+    """
+    active_rocnik = get_aktivni_rocnik(db)
+
+    return ctx["request"].app.state.templates.TemplateResponse(
+        "import_vin.html",
+        {
+            **ctx,
+            "error": "Pozor: Není nastaven aktivní ročník, nelze přidávat vína!" if not active_rocnik else None
+        }
+    )
+
+@router.post("/import")
+def import_vin_submit(
+    request: Request,
+    soubor: UploadFile = File(...),
+    ctx: dict = Depends(get_template_context),
+    db: Session = Depends(get_db),
+    user: Users = Depends(get_current_user)
+):
+    """
+    Hromadně naimportuje vína přihlášeného vinaře ze souboru CSV nebo XLSX
+    (první řádek je hlavička se sloupci nazev, odruda, barva, sladkost,
+    privlastek, rok_sklizne) do aktivního ročníku.
+    Platné řádky se uloží najednou, u neplatných se zobrazí chyby.
+    Načtení souboru i zápis běží ve vlákně (synchronní endpoint), ne ve smyčce událostí.
+    """
+    templates = ctx["request"].app.state.templates
+
+    active_rocnik = get_aktivni_rocnik(db)
+    if not active_rocnik:
+        return templates.TemplateResponse(
+            "import_vin.html",
+            {**ctx, "error": "Není nastaven žádný aktivní ročník!"}
+        )
+
+    obsah = soubor.file.read(settings.IMPORT_MAX_VELIKOST + 1)
+    try:
+        if len(obsah) > settings.IMPORT_MAX_VELIKOST:
+            raise ValueError("Soubor je příliš velký.")
+        radky = nacist_soubor(soubor.filename, obsah)
+        vysledek = importovat_vina(db, radky, user.id, active_rocnik.id)
+    except ValueError as chyba:
+        return templates.TemplateResponse("import_vin.html", {**ctx, "error": str(chyba)})
+
+    db.commit()
+
+    return templates.TemplateResponse("import_vin.html", {**ctx, "vysledek": vysledek})
+
+@router.post("/import/json", response_model=VysledekImportu)
+def import_vin_json(
+    vina: List[Any] = Body(...),
+    db: Session = Depends(get_db),
+    user: Users = Depends(get_current_user)
+):
+    """
+    Hromadný import vín přihlášeného vinaře ve formátu JSON (seznam objektů
+    s poli vína). Řádky se ověřují jednotlivě, takže chyba v jednom
+    nezpůsobí odmítnutí ostatních. Čísla řádků v chybách začínají od 1.
+    """
+    active_rocnik = get_aktivni_rocnik(db)
+    if not active_rocnik:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Není nastaven žádný aktivní ročník.")
+
+    try:
+        vysledek = importovat_vina(db, list(enumerate(vina, start=1)), user.id, active_rocnik.id)
+    except ValueError as chyba:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(chyba))
+
+    db.commit()
+    return vysledek
+
+@router.get("/naseptavac/{pole}")
+def naseptavac(
+    pole: str,
+    q: str = "",
+    limit: int = 10,
+    login: str = Depends(require_login_z_tokenu)
+) -> List[str]:
+    """
+    Návrhy pro rozepsaný název vína nebo odrůdu ('pole' je nazev/odruda).
+    Odpovídá z indexu v paměti a přihlášení ověří jen z access tokenu,
+    do databáze se při psaní nesahá.
+    """
+    index = get_indexy().get(pole)
+    if index is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Neznámé pole.")
+    return index.naseptat(q, min(max(limit, 1), 20))
+
 @router.get("/upravit/{vino_id}")
 def upravit_vino_page(
     vino_id: int,
@@ -138,6 +271,8 @@ def upravit_vino_submit(
     sladkost: str = Form(None),
     privlastek: str = Form(None),
     rok_sklizne: int = Form(...),
+    etiketa: Optional[UploadFile] = File(None),
+    odebrat_etiketu: bool = Form(False),
     ctx: dict = Depends(get_template_context),
     db: Session = Depends(get_db),
     user: Users = Depends(get_current_user)
@@ -145,6 +280,7 @@ def upravit_vino_submit(
     """
     Uloží změny u existujícího vína.
     Kontroluje, zda uživatel má právo toto víno editovat.
+    Nově nahraná fotka etikety nahradí původní, 'odebrat_etiketu' ji odstraní.
     """
     vino = db.query(Vino).filter(Vino.id == vino_id, Vino.vinar_id == user.id).first()
     
@@ -154,13 +290,27 @@ def upravit_vino_submit(
             status_code=status.HTTP_303_SEE_OTHER
         )
 
+    try:
+        otisk_etikety = _ulozit_etiketu(etiketa)
+    except NeplatnyObrazek as chyba:
+        return ctx["request"].app.state.templates.TemplateResponse(
+            "upravit_vino.html", {**ctx, "vino": vino, "error": str(chyba)}
+        )
+
+    puvodni_barva = vino.barva
+
+    if otisk_etikety:
+        vino.etiketa = otisk_etikety
+    elif odebrat_etiketu:
+        vino.etiketa = None
     vino.nazev = nazev
-    vino.odruda = odruda
+    vino.odruda = sjednotit_odrudu(odruda)
     vino.barva = barva
     vino.sladkost = sladkost
     vino.privlastek = privlastek
     vino.rok_sklizne = rok_sklizne
     
+    prepocitat_poradi(db, vino.rocnik_id, [puvodni_barva, barva])
     db.commit()
     
     return RedirectResponse("/vina/sprava", status_code=status.HTTP_303_SEE_OTHER)
@@ -175,7 +325,7 @@ def smazat_vino(
     """
     Smaže víno z databáze.
     Lze smazat pouze vlastní víno.
-    Spolu s vínem se automaticky smažou i všechna jeho hodnocení díky parametru cascade v db.py.
+    Spolu s vínem smaže databáze kaskádou i všechna jeho hodnocení (ON DELETE CASCADE).
     """
     vino = db.query(Vino).filter(Vino.id == vino_id, Vino.vinar_id == user.id).first()
     
@@ -185,7 +335,9 @@ def smazat_vino(
             status_code=status.HTTP_303_SEE_OTHER
         )
         
+    zaznamenat_zmeny_dotazem(db, "HODNOCENI", select(Hodnoceni.id).where(Hodnoceni.vino_id == vino.id), SMAZANI)
     db.delete(vino)
+    prepocitat_poradi(db, vino.rocnik_id, [vino.barva])
     db.commit()
     
     return RedirectResponse("/vina/sprava", status_code=status.HTTP_303_SEE_OTHER)
@@ -193,6 +345,7 @@ def smazat_vino(
 @router.get("/hodnoceni")
 def hodnoceni_page(
     request: Request,
+    let_id: Optional[int] = None,
     ctx: dict = Depends(get_template_context),
     db: Session = Depends(get_db),
     user: Users = Depends(get_current_user)
@@ -201,38 +354,38 @@ def hodnoceni_page(
     Zobrazí stránku pro hodnocení vín ostatních vinařů.
     Načte seznam všech vín v aktivním ročníku KROMĚ vín přihlášeného uživatele.
     V seznamu zobrazí uživatelem již udělená hodnocení.
+    Tabulka se streamuje průběžně, jak přicházejí řádky z databáze.
+
+    Pokud jsou pro ročník naplánované degustační lety, zobrazí se jen vína
+    z aktuálního letu hodnotitele (prvního nedohodnoceného), případně
+    z letu vybraného parametrem 'let_id'. Hodnotitel mimo všechny panely
+    nedostane žádná vína (zápisy mimo panel odmítá i 'synchronizovat_hodnoceni').
     """
     active_rocnik = get_aktivni_rocnik(db)
     
     if not active_rocnik:
          return ctx["request"].app.state.templates.TemplateResponse(
-            "hodnoceni.html", {**ctx, "error": "Není aktivní ročník.", "vina_data": []}
+            "hodnoceni.html", {**ctx, "error": "Není aktivní ročník.", "vina_data": [], "ma_vina": False}
         )
 
-    MojeHodnoceni = aliased(Hodnoceni)
-
-    results = (
-        db.query(Vino, MojeHodnoceni)
-        .join(Vino.vinar)
-        .outerjoin(MojeHodnoceni, (MojeHodnoceni.vino_id == Vino.id) & (MojeHodnoceni.hodnotitel_id == user.id))
-        .filter(Vino.rocnik_id == active_rocnik.id)
-        .filter(Vino.vinar_id != user.id)
-        .order_by(Vino.nazev)
-        .all()
-    )
-    
-    vina_data = []
-    for vino, hodnoceni in results:
-        vina_data.append({
-            "vino": vino,
-            "hodnoceni": hodnoceni
-        })
+    lety = get_lety_hodnotitele(db, active_rocnik.id, user.id)
+    if not lety and existuji_lety(db, active_rocnik.id):
+        return ctx["request"].app.state.templates.TemplateResponse(
+            "hodnoceni.html",
+            {**ctx, "error": "Nejste v panelu žádného degustačního letu tohoto ročníku.", "vina_data": [], "ma_vina": False}
+        )
+    aktualni_let = next((let for let in lety if let.id == let_id), None) or vybrat_aktualni_let(lety)
+    vybrany_let_id = aktualni_let.id if aktualni_let else None
 
-    return ctx["request"].app.state.templates.TemplateResponse(
+    return StreamingTemplateResponse(
+        ctx["request"].app.state.templates,
         "hodnoceni.html",
         {
             **ctx, 
-            "vina_data": vina_data
+            "lety": lety,
+            "aktualni_let": aktualni_let,
+            "vina_data": iterovat_v_session(iter_vina_k_hodnoceni, active_rocnik.id, user.id, vybrany_let_id),
+            "ma_vina": existuji_vina_k_hodnoceni(db, active_rocnik.id, user.id, vybrany_let_id)
         }
     )
 
@@ -245,54 +398,136 @@ async def hodnoceni_submit(
     user: Users = Depends(get_current_user)
 ):
     """
-    Zpracuje hromadný formulář s hodnocením vín.
+    Zpracuje hromadný formulář s hodnocením vín (archa bez JavaScriptu).
     Pokud už hodnocení existuje, aktualizuje ho. Pokud ne, vytvoří nové.
     Pokud uživatel smaže body, hodnocení se odstraní.
+
+    Změněné řádky se zapíšou stejnou cestou jako dávky z /hodnoceni/sync,
+    takže i smazání z formuláře zanechá čas změny a starší změna ve frontě
+    offline zařízení ho už neobnoví.
     """
     form_data = await request.form()
-    
+    active_rocnik = get_aktivni_rocnik(db)
+    if not active_rocnik:
+        return RedirectResponse("/vina/hodnoceni", status_code=status.HTTP_303_SEE_OTHER)
+
+    radky = {}
     for key, value in form_data.items():
         if key.startswith("body_"):
             try:
                 vino_id = int(key.split("_")[1])
                 raw_body = value.strip()
-                
-                poznamka_key = f"poznamka_{vino_id}"
-                poznamka_val = form_data.get(poznamka_key, "").strip()
-
-                vino_db = db.query(Vino).filter(Vino.id == vino_id).first()
-                if not vino_db or vino_db.vinar_id == user.id:
-                    continue
-
-                hodnoceni = db.query(Hodnoceni).filter(
-                    Hodnoceni.vino_id == vino_id,
-                    Hodnoceni.hodnotitel_id == user.id
-                ).first()
-
-                if raw_body:
-                    body_val = int(raw_body)
-                    
-                    if body_val < 0: body_val = 0
-                    if body_val > 100: body_val = 100
-
-                    if hodnoceni:
-                        hodnoceni.body = body_val
-                        hodnoceni.poznamka = poznamka_val
-                    else:
-                        nove_hodnoceni = Hodnoceni(
-                            body=body_val,
-                            poznamka=poznamka_val,
-                            vino_id=vino_id,
-                            hodnotitel_id=user.id
-                        )
-                        db.add(nove_hodnoceni)
-                else:
-                    if hodnoceni:
-                        db.delete(hodnoceni)
-                        
+                body_val = min(max(int(raw_body), 0), 100) if raw_body else None
             except ValueError:
                 continue
+            radky[vino_id] = (body_val, form_data.get(f"poznamka_{vino_id}", "").strip())
 
-    db.commit()
+    stavajici = {
+        h.vino_id: h for h in db.scalars(
+            select(Hodnoceni).where(Hodnoceni.hodnotitel_id == user.id, Hodnoceni.vino_id.in_(radky))
+        )
+    }
+    cas = int(time.time() * 1000)
+    zmeny = []
+    for vino_id, (body_val, poznamka_val) in radky.items():
+        hodnoceni = stavajici.get(vino_id)
+        if hodnoceni is None and body_val is None:
+            continue
+        if hodnoceni is not None and (hodnoceni.body, hodnoceni.poznamka or "") == (body_val, poznamka_val):
+            continue
+        try:
+            zmeny.append(ZmenaHodnoceni(
+                klic=uuid.uuid4().hex, vino_id=vino_id, body=body_val, poznamka=poznamka_val, cas=cas
+            ))
+        except ValueError:  # i ValidationError z pydanticu (příliš dlouhá poznámka)
+            continue
+
+    if zmeny:
+        synchronizovat_hodnoceni(db, user.id, active_rocnik.id, zmeny)
+        db.commit()
     
-    return RedirectResponse("/vina/hodnoceni", status_code=status.HTTP_303_SEE_OTHER)
\ No newline at end of file
+    return RedirectResponse("/vina/hodnoceni", status_code=status.HTTP_303_SEE_OTHER)
+
+@router.post("/hodnoceni/sync", response_model=VysledekSynchronizace)
+def hodnoceni_sync(
+    davka: DavkaHodnoceni,
+    db: Session = Depends(get_db),
+    user: Users = Depends(get_current_user_api)
+):
+    """
+    Přijme dávku změn hodnocení z offline archu (hodnoceni.js) a zapíše
+    ji v jedné transakci. Platí poslední zápis podle času změny, opakovaně
+    odeslané změny se poznají podle klíče idempotence. Pořadí se přepočítá
+    a živý přenos se probudí až odloženě po commitu (jen při změně bodů).
+    """
+    if len(davka.zmeny) > settings.SYNC_MAX_ZMEN:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Dávka smí mít nejvýš {settings.SYNC_MAX_ZMEN} změn."
+        )
+
+    active_rocnik = get_aktivni_rocnik(db)
+    if not active_rocnik:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Není nastaven žádný aktivní ročník.")
+
+    vysledky = synchronizovat_hodnoceni(db, user.id, active_rocnik.id, davka.zmeny)
+    db.commit()
+    return VysledekSynchronizace(vysledky=vysledky)
+
+@router.post("/hodnoceni/vino/{vino_id}")
+def hodnoceni_vina(
+    request: Request,
+    vino_id: int,
+    body: str = Form(""),
+    poznamka: str = Form(""),
+    klic: Optional[str] = Form(None),
+    cas: Optional[int] = Form(None),
+    db: Session = Depends(get_db),
+    user: Users = Depends(get_current_user_api)
+):
+    """
+    Automatické uložení jednoho vína z archu hodnocení. Vrací jen
+    překreslený řádek tabulky (hodnoceni_radek.html), stránka si ho
+    vymění na místě, takže uložení nestojí víc než jeden řádek.
+
+    Zápis jde stejnou cestou jako dávky z /hodnoceni/sync (poslední zápis
+    vyhrává, 'klic' chrání před dvojím uložením při opakování požadavku).
+    Jak se změnou server naložil, říká hlavička X-Stav-Hodnoceni.
+    """
+    try:
+        zmena = ZmenaHodnoceni(
+            klic=klic or uuid.uuid4().hex,
+            vino_id=vino_id,
+            body=int(body) if body.strip() else None,
+            poznamka=poznamka.strip(),
+            cas=cas if cas is not None else int(time.time() * 1000)
+        )
+    except ValueError:  # i ValidationError z pydanticu
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Neplatné hodnocení.")
+
+    active_rocnik = get_aktivni_rocnik(db)
+    if not active_rocnik:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Není nastaven žádný aktivní ročník.")
+
+    vysledek, = synchronizovat_hodnoceni(db, user.id, active_rocnik.id, [zmena])
+    db.commit()
+    if vysledek.stav == StavZmenyHodnoceni.ODMITNUTA:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Víno nelze hodnotit.")
+
+    return request.app.state.templates.TemplateResponse(
+        "hodnoceni_radek.html",
+        {"request": request, "item": get_vino_k_hodnoceni(db, vino_id, user.id)},
+        headers={"X-Stav-Hodnoceni": vysledek.stav.value}
+    )
+
+@router.get("/hodnoceni/sw.js")
+def hodnoceni_service_worker():
+    """
+    Service worker offline archu. Musí mít stálou adresu (ne otisk obsahu
+    jako ostatní assety) a smí řídit stránku hodnocení i s parametry.
+    """
+    return FileResponse(
+        SERVICE_WORKER,
+        media_type="text/javascript",
+        headers={"Cache-Control": "no-cache", "Service-Worker-Allowed": "/vina/hodnoceni"}
+    )
\ No newline at end of file
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from app.core.database import get_db
+from app.dependencies import require_admin
+from app.models.schemas import DavkaZmen
+from app.repositories.zmeny import nacist_zmeny, get_davka_odberatele, get_pozice, potvrdit_pozici
+
+router = APIRouter()
+
+@router.get("", response_model=DavkaZmen)
+def seznam_zmen(
+    od: int = 0,
+    limit: Optional[int] = None,
+    db: Session = Depends(get_db),
+    admin_check: dict = Depends(require_admin)
+):
+    """Vrátí změny s verzí vyšší než 'od' (bez ukládání pozice)."""
+    return nacist_zmeny(db, od, limit)
+
+@router.get("/odberatele/{odberatel}", response_model=DavkaZmen)
+def davka_odberatele(
+    odberatel: str,
+    limit: Optional[int] = None,
+    db: Session = Depends(get_db),
+    admin_check: dict = Depends(require_admin)
+):
+    """
+    Vrátí další dávku změn od uložené pozice odběratele. Pozice se posune
+    až potvrzením ('POST /zmeny/odberatele/{odberatel}?verze=...'), takže
+    dávka, kterou se nepodařilo zpracovat, přijde znovu.
+    """
+    return get_davka_odberatele(db, odberatel, limit)
+
+@router.post("/odberatele/{odberatel}")
+def potvrdit_davku(
+    odberatel: str,
+    verze: int,
+    db: Session = Depends(get_db),
+    admin_check: dict = Depends(require_admin)
+):
+    """Potvrdí zpracování změn až po 'verze' a vrátí uloženou pozici odběratele."""
+    potvrdit_pozici(db, odberatel, verze)
+    db.commit()
+    return {"odberatel": odberatel, "verze": get_pozice(db, odberatel)}
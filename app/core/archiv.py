@@ -0,0 +1,231 @@
+import logging
+import sqlite3
+from typing import Iterable, Optional
+from sqlalchemy import MetaData, Table, Column
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import declarative_base, relationship, foreign
+from sqlalchemy.schema import CreateTable, CreateIndex
+
+from app.core.database import zmena, UPRAVA, SMAZANI, PRESUN
+from app.core.souteze import cesta_databaze, cesta_archivu
+from app.core.fulltext import TABULKA as HLEDANI, hledani_existuje, sql_naplneni
+from app.models.db import Vino, Hodnoceni, Umisteni, Users
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = "archiv"
+
+archiv_metadata = MetaData()
+ArchivBase = declarative_base(metadata=archiv_metadata)
+
+def _kopie_tabulky(tabulka: Table) -> Table:
+    """
+    Kopie tabulky v archivu: stejné sloupce, ale bez cizích klíčů
+    (uživatelé a ročníky zůstávají v hlavní databázi) a s indexy
+    na sloupcích, podle kterých se archiv prohledává.
+    """
+    return Table(
+        tabulka.name,
+        archiv_metadata,
+        *(
+            Column(
+                c.name,
+                c.type,
+                primary_key=c.primary_key,
+                nullable=c.nullable,
+                index=bool(c.foreign_keys) and not c.primary_key
+            )
+            for c in tabulka.columns
+        ),
+        schema=SCHEMA
+    )
+
+archiv_vino = _kopie_tabulky(Vino.__table__)
+archiv_hodnoceni = _kopie_tabulky(Hodnoceni.__table__)
+archiv_umisteni = _kopie_tabulky(Umisteni.__table__)
+
+
+class VinoArchiv(ArchivBase):
+    """Víno archivovaného ročníku (jen pro čtení, stejné atributy jako Vino)."""
+    __table__ = archiv_vino
+
+    vinar = relationship(
+        Users, primaryjoin=foreign(archiv_vino.c.vinar_id) == Users.id, viewonly=True
+    )
+
+class HodnoceniArchiv(ArchivBase):
+    """Hodnocení vína archivovaného ročníku (jen pro čtení)."""
+    __table__ = archiv_hodnoceni
+
+    hodnotitel = relationship(
+        Users, primaryjoin=foreign(archiv_hodnoceni.c.hodnotitel_id) == Users.id, viewonly=True
+    )
+
+class UmisteniArchiv(ArchivBase):
+    """Umístění vína archivovaného ročníku (jen pro čtení)."""
+    __table__ = archiv_umisteni
+
+
+_PRESOUVANE = (archiv_vino, archiv_hodnoceni, archiv_umisteni)
+
+_dialekt = sqlite.dialect()
+
+
+def _spojeni_pro_zapis() -> sqlite3.Connection:
+    """Samostatné spojení na hlavní databázi s archivem připojeným pro zápis."""
+    conn = sqlite3.connect(cesta_databaze(), isolation_level=None)
+    conn.execute("ATTACH DATABASE ? AS archiv", (str(cesta_archivu().resolve()),))
+    return conn
+
+def _pripravit_schema(conn: sqlite3.Connection) -> None:
+    """Vytvoří tabulky archivu a doplní sloupce, které mezitím přibyly v modelech."""
+    for tabulka in _PRESOUVANE:
+        conn.execute(str(CreateTable(tabulka, if_not_exists=True).compile(dialect=_dialekt)))
+        for index in tabulka.indexes:
+            conn.execute(str(CreateIndex(index, if_not_exists=True).compile(dialect=_dialekt)))
+
+        existujici = {r[1] for r in conn.execute(f'PRAGMA archiv.table_info("{tabulka.name}")')}
+        for sloupec in tabulka.columns:
+            if sloupec.name not in existujici:
+                typ = sloupec.type.compile(dialect=_dialekt)
+                conn.execute(f'ALTER TABLE archiv."{tabulka.name}" ADD COLUMN "{sloupec.name}" {typ}')
+
+def _zvysit_verzi_dat(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        "INSERT INTO DATA_VERSION (id, verze) VALUES (1, 1) "
+        "ON CONFLICT(id) DO UPDATE SET verze = verze + 1"
+    )
+
+def _zaznamenat_zmeny(
+    conn: sqlite3.Connection, schema: str, tabulka: str, podminka: str, parametry: tuple, operace: str
+) -> None:
+    """Zapíše do seznamu změn (app.core.database.zmena) řádky tabulky, kterých se přesun či mazání týká."""
+    conn.execute(
+        f'INSERT INTO main."{zmena.name}" (entita, entita_id, operace) '
+        f'SELECT ?, id, ? FROM {schema}."{tabulka}" WHERE {podminka}',
+        (tabulka, operace, *parametry)
+    )
+
+def pripravit_archiv() -> None:
+    """Založí soubor archivu a jeho tabulky (volá 'scripts/init_db.py')."""
+    cesta_archivu().parent.mkdir(parents=True, exist_ok=True)
+    conn = _spojeni_pro_zapis()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        _pripravit_schema(conn)
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+def presunout_rocnik(rocnik_id: int) -> int:
+    """
+    Přesune vína ročníku, jejich hodnocení a umístění z hlavní databáze
+    do archivu a označí ročník jako archivovaný.
+
+    Vše proběhne v jedné transakci přes oba soubory, takže data nikdy
+    nejsou zároveň v obou ani v žádném. Vrací počet přesunutých vín.
+    """
+    conn = _spojeni_pro_zapis()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            _pripravit_schema(conn)
+
+            vina_rocniku = 'SELECT id FROM main."VINO" WHERE rocnik_id = ?'
+            podminky = {
+                "VINO": ("rocnik_id = ?", (rocnik_id,)),
+                "HODNOCENI": (f"vino_id IN ({vina_rocniku})", (rocnik_id,)),
+                "UMISTENI": ("rocnik_id = ?", (rocnik_id,)),
+            }
+
+            for tabulka in _PRESOUVANE:
+                sloupce = ", ".join(f'"{c.name}"' for c in tabulka.columns)
+                podminka, parametry = podminky[tabulka.name]
+                conn.execute(
+                    f'INSERT INTO archiv."{tabulka.name}" ({sloupce}) '
+                    f'SELECT {sloupce} FROM main."{tabulka.name}" WHERE {podminka}',
+                    parametry
+                )
+
+            pocet = conn.execute(
+                'SELECT count(*) FROM archiv."VINO" WHERE rocnik_id = ?', (rocnik_id,)
+            ).fetchone()[0]
+
+            _zaznamenat_zmeny(conn, "main", "HODNOCENI", f"vino_id IN ({vina_rocniku})", (rocnik_id,), PRESUN)
+            _zaznamenat_zmeny(conn, "main", "VINO", "rocnik_id = ?", (rocnik_id,), PRESUN)
+            _zaznamenat_zmeny(conn, "main", "ROCNIK", "id = ?", (rocnik_id,), UPRAVA)
+
+            # Plán degustačních letů archivovaný ročník už nepotřebuje
+            lety_rocniku = 'SELECT id FROM main."DEGUSTACNI_LET" WHERE rocnik_id = ?'
+            conn.execute(f'DELETE FROM main."LET_HODNOTITEL" WHERE let_id IN ({lety_rocniku})', (rocnik_id,))
+            conn.execute(f'DELETE FROM main."LET_VINO" WHERE let_id IN ({lety_rocniku})', (rocnik_id,))
+            conn.execute('DELETE FROM main."DEGUSTACNI_LET" WHERE rocnik_id = ?', (rocnik_id,))
+
+            # Mazání v opačném pořadí, aby hodnocení nezůstala bez vína
+            for tabulka in reversed(_PRESOUVANE):
+                podminka, parametry = podminky[tabulka.name]
+                conn.execute(f'DELETE FROM main."{tabulka.name}" WHERE {podminka}', parametry)
+
+            # Smazaná vína zmizela z hledání triggerem, vrátí se tam z archivu
+            if hledani_existuje(conn):
+                conn.execute(sql_naplneni("archiv", "v.rocnik_id = ?"), (rocnik_id,))
+
+            conn.execute('UPDATE main."ROCNIK" SET is_archived = 1 WHERE id = ?', (rocnik_id,))
+            _zvysit_verzi_dat(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+    logger.info("Ročník %s přesunut do archivu (%s vín)", rocnik_id, pocet)
+    return pocet
+
+def smazat_z_archivu(
+    rocnik_id: Optional[int] = None,
+    uzivatel_id: Optional[int] = None,
+    uzivatel_ids: Optional[Iterable[int]] = None
+) -> None:
+    """
+    Smaže z archivu vína ročníku nebo vína a hodnocení uživatele či více
+    uživatelů najednou (volá se při mazání ročníku nebo uživatelů v hlavní databázi).
+    """
+    if uzivatel_id is not None:
+        uzivatel_ids = [uzivatel_id]
+    uzivatel_ids = tuple(uzivatel_ids or ())
+    if rocnik_id is None and not uzivatel_ids:
+        return
+
+    if rocnik_id is not None:
+        vina = ('SELECT id FROM archiv."VINO" WHERE rocnik_id = ?', (rocnik_id,))
+        hodnoceni = None
+    else:
+        seznam = ", ".join("?" * len(uzivatel_ids))
+        vina = (f'SELECT id FROM archiv."VINO" WHERE vinar_id IN ({seznam})', uzivatel_ids)
+        hodnoceni = (f'hodnotitel_id IN ({seznam})', uzivatel_ids)
+
+    conn = _spojeni_pro_zapis()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            _pripravit_schema(conn)
+            dotaz, parametry = vina
+            _zaznamenat_zmeny(conn, "archiv", "HODNOCENI", f"vino_id IN ({dotaz})", parametry, SMAZANI)
+            conn.execute(f'DELETE FROM archiv."HODNOCENI" WHERE vino_id IN ({dotaz})', parametry)
+            conn.execute(f'DELETE FROM archiv."UMISTENI" WHERE vino_id IN ({dotaz})', parametry)
+            if hodnoceni:
+                podminka, parametry_h = hodnoceni
+                _zaznamenat_zmeny(conn, "archiv", "HODNOCENI", podminka, parametry_h, SMAZANI)
+                conn.execute(f'DELETE FROM archiv."HODNOCENI" WHERE {podminka}', parametry_h)
+            _zaznamenat_zmeny(conn, "archiv", "VINO", f"id IN ({dotaz})", parametry, SMAZANI)
+            if hledani_existuje(conn):
+                conn.execute(f'DELETE FROM main."{HLEDANI}" WHERE rowid IN ({dotaz})', parametry)
+            conn.execute(f'DELETE FROM archiv."VINO" WHERE id IN ({dotaz})', parametry)
+            _zvysit_verzi_dat(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
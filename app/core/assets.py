@@ -0,0 +1,134 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # volitelná závislost, bez ní se připraví jen gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+ZDROJ = Path("app/static")
+MANIFEST = "manifest.json"
+
+# Přípony souborů, které má smysl komprimovat (obrázky typu PNG už komprimované jsou)
+KOMPRIMOVAT = {".css", ".js", ".svg", ".html", ".json", ".txt", ".map"}
+
+# Pořadí preferencí kódování: (název v Accept-Encoding, přípona souboru)
+KODOVANI = (("br", ".br"), ("gzip", ".gz"))
+
+_manifest: Dict[str, str] = {}
+
+
+def _cil() -> Path:
+    return Path(settings.ASSETS_DIR)
+
+def _zapsat_atomicky(cesta: Path, data: bytes) -> None:
+    """Zapíše soubor přes dočasný soubor, aby souběžné workery neviděly polovičatý obsah."""
+    docasna = cesta.with_name(f"{cesta.name}.{os.getpid()}.tmp")
+    docasna.write_bytes(data)
+    os.replace(docasna, cesta)
+
+def _hashovany_nazev(relativni: Path, obsah: bytes) -> str:
+    otisk = hashlib.sha256(obsah).hexdigest()[:12]
+    return relativni.with_name(f"{relativni.stem}.{otisk}{relativni.suffix}").as_posix()
+
+def sestavit_assety() -> Dict[str, str]:
+    """
+    Projde app/static a do ASSETS_DIR zapíše soubory s otiskem obsahu
+    v názvu (style.3f2a9c1b0d4e.css) a jejich předkomprimované varianty
+    (.gz, a pokud je nainstalovaný balíček brotli, i .br). Varianta se
+    ponechá jen tehdy, když je skutečně menší.
+
+    Vrací manifest {původní cesta: hashovaná cesta}, který se uloží
+    i do manifest.json. Už existující soubory se nepřepisují, takže
+    opakované sestavení při každém startu je levné.
+    """
+    cil = _cil()
+    manifest: Dict[str, str] = {}
+
+    for soubor in sorted(p for p in ZDROJ.rglob("*") if p.is_file()):
+        relativni = soubor.relative_to(ZDROJ)
+        obsah = soubor.read_bytes()
+        hashovany = _hashovany_nazev(relativni, obsah)
+        manifest[relativni.as_posix()] = hashovany
+
+        vystup = cil / hashovany
+        if vystup.exists():
+            continue
+        vystup.parent.mkdir(parents=True, exist_ok=True)
+        _zapsat_atomicky(vystup, obsah)
+
+        if soubor.suffix.lower() not in KOMPRIMOVAT:
+            continue
+        varianty = {".gz": gzip.compress(obsah, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            varianty[".br"] = brotli.compress(obsah, quality=11)
+        for pripona, data in varianty.items():
+            if len(data) < len(obsah):
+                _zapsat_atomicky(vystup.with_name(vystup.name + pripona), data)
+
+    cil.mkdir(parents=True, exist_ok=True)
+    _zapsat_atomicky(cil / MANIFEST, json.dumps(manifest, indent=2).encode())
+    logger.info("Sestaveno %s assetů do %s", len(manifest), cil)
+    return manifest
+
+def nacist_manifest() -> Dict[str, str]:
+    """Sestaví assety a manifest si ponechá v paměti pro asset_url()."""
+    global _manifest
+    _manifest = sestavit_assety()
+    return _manifest
+
+def asset_url(cesta: str) -> str:
+    """
+    Jinja helper: vrátí URL souboru s otiskem obsahu v názvu.
+    Soubor, který v manifestu není, se vrátí z /static (bez dlouhé cache).
+    """
+    hashovany = _manifest.get(cesta)
+    if hashovany is None:
+        return f"/static/{cesta}"
+    return f"/assets/{hashovany}"
+
+def najit_asset(nazev: str, accept_encoding: str) -> Optional[Tuple[Path, Optional[str]]]:
+    """
+    Najde soubor pro požadovaný hashovaný název a vybere nejlepší
+    předkomprimovanou variantu podle hlavičky Accept-Encoding.
+    Vrací (cesta, kódování) nebo None, pokud asset neexistuje.
+    Obsluhují se jen názvy z manifestu, takže cesta nemůže utéct mimo ASSETS_DIR.
+    """
+    if nazev not in _manifest.values():
+        return None
+
+    zaklad = _cil() / nazev
+    prijate = _prijata_kodovani(accept_encoding)
+    for kodovani, pripona in KODOVANI:
+        varianta = zaklad.with_name(zaklad.name + pripona)
+        if kodovani in prijate and varianta.exists():
+            return varianta, kodovani
+
+    if not zaklad.exists():
+        return None
+    return zaklad, None
+
+def _prijata_kodovani(hlavicka: str) -> set:
+    """Z hlavičky Accept-Encoding vybere kódování s nenulovou vahou (q)."""
+    prijate = set()
+    for polozka in hlavicka.split(","):
+        nazev, _, parametry = polozka.strip().partition(";")
+        vaha = 1.0
+        parametry = parametry.strip()
+        if parametry.startswith("q="):
+            try:
+                vaha = float(parametry[2:])
+            except ValueError:
+                vaha = 0.0
+        if nazev and vaha > 0:
+            prijate.add(nazev.lower())
+    return prijate
@@ -0,0 +1,215 @@
+import logging
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+from app.core.config import settings
+from app.core.souteze import VYCHOZI, aktualni_soutez, cesta_archivu, cesta_databaze, seznam_soutezi, soutez_kontext
+
+logger = logging.getLogger(__name__)
+
+PRIPONA = ".db"
+PREFIX = "kost-"
+# Záloha archivu leží vedle zálohy hlavní databáze: kost-<čas>.archiv.db
+PRIPONA_ARCHIVU = ".archiv.db"
+# Kolikrát se záloha zopakuje, pokud se archiv během ní změnil
+MAX_POKUSU = 3
+
+
+class ChybaZalohy(Exception):
+    """Záloha nebo obnova databáze se nezdařila."""
+
+
+def _adresar() -> Path:
+    """Adresář záloh aktuální soutěže (další soutěže mají podadresář se svým názvem)."""
+    adresar = Path(settings.BACKUP_DIR)
+    if aktualni_soutez() != VYCHOZI:
+        adresar = adresar / aktualni_soutez()
+    adresar.mkdir(parents=True, exist_ok=True)
+    return adresar
+
+def _kopirovat(zdroj: sqlite3.Connection, cil: sqlite3.Connection) -> None:
+    """
+    Zkopíruje databázi pomocí SQLite online backup API po malých dávkách
+    stránek. Mezi dávkami se zámek uvolní, takže čtenáři ani zapisovatelé
+    aplikace nejsou blokováni déle než na jednu dávku.
+    """
+    zdroj.backup(
+        cil,
+        pages=settings.BACKUP_PAGES_PER_STEP,
+        sleep=settings.BACKUP_SLEEP_SECONDS
+    )
+
+def overit_zalohu(cesta: Path) -> bool:
+    """Spustí na souboru 'PRAGMA integrity_check' a vrátí, zda je v pořádku."""
+    conn = sqlite3.connect(f"file:{cesta}?mode=ro", uri=True)
+    try:
+        vysledek = conn.execute("PRAGMA integrity_check").fetchone()
+        return vysledek is not None and vysledek[0] == "ok"
+    finally:
+        conn.close()
+
+def zaloha_archivu(cesta: Path) -> Path:
+    """Soubor se zálohou archivu, který patří k záloze hlavní databáze."""
+    return cesta.with_name(cesta.name[:-len(PRIPONA)] + PRIPONA_ARCHIVU)
+
+def seznam_zaloh() -> List[Path]:
+    """Vrátí existující zálohy hlavní databáze seřazené od nejnovější."""
+    return sorted(
+        (p for p in _adresar().glob(f"{PREFIX}*{PRIPONA}") if not p.name.endswith(PRIPONA_ARCHIVU)),
+        reverse=True
+    )
+
+def _zkopirovat_soubor(zdroj: Path, cil: Path) -> None:
+    zdroj_conn = sqlite3.connect(zdroj)
+    cil_conn = sqlite3.connect(cil)
+    try:
+        _kopirovat(zdroj_conn, cil_conn)
+    finally:
+        cil_conn.close()
+        zdroj_conn.close()
+
+def _zkopirovat_par(docasna: Path, docasna_archivu: Path) -> None:
+    """
+    Zkopíruje archiv a po něm hlavní databázi. Archivace ročníku mění oba
+    soubory v jedné transakci, proto se kopie zopakuje, pokud se archiv
+    od začátku kopírování změnil ('PRAGMA data_version'). Jinak by dvojice
+    mohla obsahovat přesunutá vína dvakrát, nebo vůbec.
+    """
+    archiv = sqlite3.connect(cesta_archivu())
+    try:
+        for _ in range(MAX_POKUSU):
+            verze = archiv.execute("PRAGMA data_version").fetchone()[0]
+            cil = sqlite3.connect(docasna_archivu)
+            try:
+                _kopirovat(archiv, cil)
+            finally:
+                cil.close()
+            _zkopirovat_soubor(cesta_databaze(), docasna)
+            if archiv.execute("PRAGMA data_version").fetchone()[0] == verze:
+                return
+        raise ChybaZalohy("Archiv se během zálohy opakovaně změnil, záloha zrušena.")
+    finally:
+        archiv.close()
+
+def vytvorit_zalohu(rotovat: bool = True) -> Path:
+    """
+    Vytvoří konzistentní snímek databáze a jejího archivu za běhu aplikace.
+
+    Snímky se zapisují do dočasných souborů, po kontrole integrity se
+    přejmenují na finální názvy a nakonec se (při 'rotovat') smažou
+    nejstarší zálohy nad limit BACKUP_KEEP. Vrací cestu zálohy hlavní
+    databáze, záloha archivu je vedle ní (viz 'zaloha_archivu').
+    """
+    zacatek = time.monotonic()
+    cesta = _adresar() / f"{PREFIX}{datetime.now():%Y%m%d-%H%M%S}{PRIPONA}"
+    docasne = {cesta: cesta.with_suffix(".part")}
+
+    try:
+        if cesta_archivu().exists():
+            docasne[zaloha_archivu(cesta)] = zaloha_archivu(cesta).with_suffix(".part")
+            _zkopirovat_par(docasne[cesta], docasne[zaloha_archivu(cesta)])
+        else:
+            _zkopirovat_soubor(cesta_databaze(), docasne[cesta])
+
+        for finalni, docasna in docasne.items():
+            if not overit_zalohu(docasna):
+                raise ChybaZalohy(f"Záloha {finalni.name} neprošla kontrolou integrity.")
+    except Exception:
+        for docasna in docasne.values():
+            docasna.unlink(missing_ok=True)
+        raise
+
+    # Archiv dřív, seznam záloh se řídí souborem hlavní databáze
+    for finalni, docasna in reversed(docasne.items()):
+        docasna.replace(finalni)
+    if rotovat:
+        _rotovat()
+
+    logger.info("Záloha %s vytvořena za %.2f s", cesta.name, time.monotonic() - zacatek)
+    return cesta
+
+def _rotovat() -> None:
+    for stara in seznam_zaloh()[settings.BACKUP_KEEP:]:
+        stara.unlink(missing_ok=True)
+        zaloha_archivu(stara).unlink(missing_ok=True)
+
+def zalohovat_pokud_je_cas() -> None:
+    """
+    Vstupní bod pro plánovač, zálohuje postupně všechny soutěže. Při více
+    workerech běží plánovač v každém z nich, proto se záloha soutěže
+    přeskočí, pokud už ji nedávno udělal jiný worker.
+    """
+    interval = settings.BACKUP_INTERVAL_MINUTES * 60
+    for soutez in seznam_soutezi():
+        with soutez_kontext(soutez):
+            zalohy = seznam_zaloh()
+            if zalohy and time.time() - zalohy[0].stat().st_mtime < interval / 2:
+                continue
+            try:
+                vytvorit_zalohu()
+            except Exception:
+                logger.exception("Záloha soutěže %s selhala", soutez)
+
+def obnovit_zalohu(cesta: Path) -> None:
+    """
+    Obnoví databázi ze zálohy (aplikace by při tom neměla běžet).
+
+    Pokud má záloha vedle sebe zálohu archivu, obnoví se oba soubory
+    jako dvojice. Před obnovou se ověří integrita zálohy a aktuální stav
+    se pro jistotu sám zazálohuje. Verze dat se po obnově zvýší nad
+    původní hodnotu, aby případně běžící workery zahodily své cache.
+    """
+    if not cesta.exists():
+        raise ChybaZalohy(f"Soubor {cesta} neexistuje.")
+    archiv = zaloha_archivu(cesta)
+    for soubor in (cesta, archiv):
+        if soubor.exists() and not overit_zalohu(soubor):
+            raise ChybaZalohy(f"Záloha {soubor.name} je poškozená, obnova zrušena.")
+    if not archiv.exists() and cesta_archivu().exists():
+        logger.warning("Záloha %s nemá zálohu archivu, archiv zůstane v aktuálním stavu", cesta.name)
+
+    # Bez rotace: ta by mohla smazat právě obnovovanou (nejstarší) zálohu
+    if cesta_databaze().exists():
+        vytvorit_zalohu(rotovat=False)
+
+    if archiv.exists():
+        cesta_archivu().parent.mkdir(parents=True, exist_ok=True)
+        cil = sqlite3.connect(cesta_archivu())
+        try:
+            zdroj = sqlite3.connect(f"file:{archiv}?mode=ro", uri=True)
+            try:
+                _kopirovat(zdroj, cil)
+            finally:
+                zdroj.close()
+        finally:
+            cil.close()
+
+    cil = sqlite3.connect(cesta_databaze())
+    try:
+        puvodni_verze = _verze_dat(cil)
+
+        zdroj = sqlite3.connect(f"file:{cesta}?mode=ro", uri=True)
+        try:
+            _kopirovat(zdroj, cil)
+        finally:
+            zdroj.close()
+
+        nova_verze = max(puvodni_verze, _verze_dat(cil)) + 1
+        with cil:
+            cil.execute(
+                "INSERT INTO DATA_VERSION (id, verze) VALUES (1, ?) "
+                "ON CONFLICT(id) DO UPDATE SET verze = excluded.verze",
+                (nova_verze,)
+            )
+    finally:
+        cil.close()
+
+def _verze_dat(conn: sqlite3.Connection) -> int:
+    try:
+        radek = conn.execute("SELECT verze FROM DATA_VERSION WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return radek[0] if radek else 0
@@ -0,0 +1,84 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.core.souteze import aktualni_soutez
+
+_registr: List[Tuple[Any, Optional[str]]] = []
+_registr_lock = threading.Lock()
+
+
+def zaregistrovat(objekt: Any, soutez: Optional[str] = None) -> None:
+    """
+    Zaregistruje objekt s metodou 'clear()', aby ho 'invalidate_all'
+    vyprázdnila spolu s ostatními cache.
+    Objekt patřící jedné soutěži se vyprázdní jen při změně v ní.
+    """
+    with _registr_lock:
+        _registr.append((objekt, soutez))
+
+
+class Cache:
+    """
+    Jednoduchá vláknově bezpečná cache v paměti procesu.
+
+    Ukládá hotové výsledky (DTO, seznamy, slovníky), nikdy ne ORM objekty
+    navázané na session, protože ty po zavření session nelze dál používat.
+
+    Každá instance se zaregistruje, aby ji 'invalidate_all' mohla vyprázdnit
+    po zápisu z jiného workeru (viz app.core.database.zkontrolovat_verzi_dat).
+
+    Hodnoty jsou oddělené podle soutěže (app.core.souteze), klíč stačí
+    uvádět v rámci jedné soutěže.
+    """
+
+    def __init__(self, nazev: str):
+        self.nazev = nazev
+        self._data: Dict[str, Dict[Hashable, Any]] = {}
+        self._lock = threading.Lock()
+        self._generace = 0
+
+        zaregistrovat(self)
+
+    def get_or_set(self, klic: Hashable, vytvorit: Callable[[], Any]) -> Any:
+        """
+        Vrátí hodnotu z cache. Pokud chybí, vytvoří ji funkcí 'vytvorit' a uloží.
+        Hodnota None se neukládá (typicky neexistující záznam).
+
+        Pokud během výpočtu proběhne invalidace, výsledek se neuloží, aby
+        v cache nezůstala hodnota spočítaná ze starých dat.
+        """
+        soutez = aktualni_soutez()
+        with self._lock:
+            data = self._data.get(soutez)
+            if data is not None and klic in data:
+                return data[klic]
+            generace = self._generace
+
+        hodnota = vytvorit()
+
+        if hodnota is not None:
+            with self._lock:
+                if generace == self._generace:
+                    self._data.setdefault(soutez, {})[klic] = hodnota
+        return hodnota
+
+    def invalidate(self, klic: Hashable) -> None:
+        """Odstraní jednu položku z cache."""
+        with self._lock:
+            self._data.get(aktualni_soutez(), {}).pop(klic, None)
+            self._generace += 1
+
+    def clear(self) -> None:
+        """Vyprázdní cache aktuální soutěže."""
+        with self._lock:
+            self._data.pop(aktualni_soutez(), None)
+            self._generace += 1
+
+
+def invalidate_all() -> None:
+    """Vyprázdní všechny cache aktuální soutěže v procesu."""
+    soutez = aktualni_soutez()
+    with _registr_lock:
+        cache = [c for c, jen_pro in _registr if jen_pro is None or jen_pro == soutez]
+    for c in cache:
+        c.clear()
@@ -2,11 +2,94 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     db_path: str = "data/kost.db"
+    ARCHIV_DB_PATH: str = "data/archiv.db"
     debug: bool = True
+    JINJA_CACHE_DIR: str = "data/jinja_cache"
+    ASSETS_DIR: str = "data/assets"
+    DB_POOL_PREOPEN: int = 5
+
+    # Další soutěže mají vlastní databázi v SOUTEZE_DIR/<nazev>/ a vybírají se
+    # subdoménou SOUTEZ_DOMENA (vinobrani.kost.cz -> 'vinobrani')
+    SOUTEZE_DIR: str = "data/souteze"
+    SOUTEZ_DOMENA: str = ""
+    SOUTEZE_MAX_OTEVRENYCH: int = 16
+
+    # Kolik požadavků každé skupiny se obsluhuje současně (součet = velikost threadpoolu)
+    KAPACITA_VEREJNE: int = 24
+    KAPACITA_AUTH: int = 8
+    KAPACITA_ADMIN: int = 8
+    KAPACITA_MAX_CEKANI: float = 5.0
+    KAPACITA_RETRY_AFTER: int = 5
     
     SECRET_KEY: str = "super-tajny-klic-ktery-nikdo-neuhadne-123456"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_HOURS: int = 24
+    REFRESH_TOKEN_GRACE_SECONDS: int = 30
+
+    BACKUP_DIR: str = "data/backups"
+    BACKUP_INTERVAL_MINUTES: int = 60
+    BACKUP_KEEP: int = 24
+    BACKUP_PAGES_PER_STEP: int = 256
+    BACKUP_SLEEP_SECONDS: float = 0.01
+
+    # Údržba databáze: ANALYZE po hromadných změnách, PRAGMA optimize v intervalu
+    # a uvolňování volných stránek (incremental_vacuum), když je aplikace v klidu
+    UDRZBA_INTERVAL_MINUTES: int = 15
+    UDRZBA_PRAH_ZMEN: int = 1000
+    UDRZBA_ANALYSIS_LIMIT: int = 1000
+    UDRZBA_NECINNOST_SEKUND: float = 30.0
+    UDRZBA_VACUUM_STRANEK: int = 256
+    UDRZBA_VACUUM_MAX_KROKU: int = 64
+    UDRZBA_VACUUM_PAUZA: float = 0.05
+    UDRZBA_BUSY_TIMEOUT: float = 2.0
+
+    MEDAILE_ZLATA: float = 90.0
+    MEDAILE_STRIBRNA: float = 85.0
+    MEDAILE_BRONZOVA: float = 80.0
+
+    LET_MAX_VIN: int = 12
+    LET_HODNOCENI_NA_VINO: int = 5
+
+    IMPORT_MAX_RADKU: int = 1000
+    IMPORT_MAX_VELIKOST: int = 2 * 1024 * 1024
+    # Procesy pro hashování hesel při importu uživatelů (0 = počet jader)
+    HESLA_PROCESY: int = 0
+
+    ZMENY_DAVKA: int = 500
+
+    # Index našeptávače se sám přestaví na pozadí nejpozději po této době
+    # (hodnoty uložené v jiném workeru), jinak jen po smazání či přejmenování vína
+    NASEPTAVAC_MAX_STARI: float = 600.0
+
+    SYNC_MAX_ZMEN: int = 500
+    # Jak dlouho se pamatují klíče přijatých změn hodnocení (poslední změna
+    # každého vína a hodnotitele zůstává vždy, nese čas pro "poslední zápis vyhrává")
+    SYNC_UCHOVAT_DNI: int = 30
+    # Pořadí se po uložení hodnocení přepočítá s tímto zpožděním, uložení
+    # během čekání se sloučí do jednoho přepočtu barvy
+    PORADI_ODLOZENI: float = 1.0
+
+    # Živý přenos pořadí (SSE): změny hodnocení se slučují do jednoho přepočtu,
+    # DATA_VERSION se kontroluje kvůli zápisům z ostatních workerů
+    PRENOS_SLOUCENI: float = 1.0
+    PRENOS_KONTROLA: float = 5.0
+    PRENOS_HEARTBEAT: float = 15.0
+    PRENOS_FRONTA: int = 16
+    PRENOS_MAX_ODBERATELU: int = 5000
+    PRENOS_RETRY_MS: int = 5000
+
+    # Obrázky etiket: úložiště podle otisku obsahu, velikosti se připravují na pozadí
+    OBRAZKY_DIR: str = "data/obrazky"
+    OBRAZKY_MAX_VELIKOST: int = 15 * 1024 * 1024
+    OBRAZKY_VLAKNA: int = 2
+
+    LOGIN_LIMIT_BACKEND: str = "memory"
+    LOGIN_LIMIT_DB_PATH: str = "data/ratelimit.db"
+    LOGIN_IP_KAPACITA: int = 20
+    LOGIN_IP_ZA_MINUTU: float = 10
+    LOGIN_UZIVATEL_KAPACITA: int = 5
+    LOGIN_UZIVATEL_ZA_MINUTU: float = 1
     
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
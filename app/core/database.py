@@ -1,20 +1,279 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from sqlalchemy import create_engine, event, insert, literal, select, Select, Table, Column, Integer, String
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker, declarative_base, Session
 from app.core.config import settings
+from app.core.cache import invalidate_all
+from app.core.souteze import VYCHOZI, NeznamaSoutez, aktualni_soutez, cesta_databaze, cesta_archivu
 
 SQLALCHEMY_DATABASE_URL = f"sqlite:///./{settings.db_path}"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _vytvorit_engine(url: str, archiv: Path) -> Engine:
+    novy = create_engine(url, connect_args={"check_same_thread": False, "uri": True})
+
+    @event.listens_for(novy, "connect")
+    def _pripojit_archiv(dbapi_connection, connection_record) -> None:
+        """
+        Ke každému spojení připojí soubor archivu jen pro čtení pod jménem 'archiv'.
+        Zapisuje do něj pouze app.core.archiv vlastním spojením.
+        """
+        cesta = archiv.resolve()
+        if not cesta.exists():
+            cesta.parent.mkdir(parents=True, exist_ok=True)
+            sqlite3.connect(cesta).close()
+        dbapi_connection.execute("ATTACH DATABASE ? AS archiv", (f"{cesta.as_uri()}?mode=ro",))
+
+    @event.listens_for(novy, "connect")
+    def _zapnout_cizi_klice(dbapi_connection, connection_record) -> None:
+        """
+        Bez kontroly cizích klíčů by SQLite ignoroval ON DELETE CASCADE, na který
+        spoléhá mazání ročníků, uživatelů a vín (app.models.db).
+        """
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+    return novy
+
+engine = _vytvorit_engine(SQLALCHEMY_DATABASE_URL, Path(settings.ARCHIV_DB_PATH))
+
+
+class RegistrShardu:
+    """
+    Enginy databází jednotlivých soutěží (jeden soubor SQLite na soutěž).
+
+    Engine se otevře až při prvním požadavku na soutěž. Otevřených je
+    nejvýš 'max_otevrenych', nejdéle nepoužitý se zavře (jeho spojení,
+    která právě někdo drží, doběhnou a zavřou se při vrácení). Výchozí
+    soutěž má stálý engine 'engine' a do limitu se nepočítá.
+
+    Každá soutěž má vlastní soubor, a tedy i vlastní zámek pro zápis,
+    takže zápisy různých soutěží na sebe nečekají.
+    """
+
+    def __init__(self, max_otevrenych: int):
+        self.max_otevrenych = max_otevrenych
+        self._enginy: "OrderedDict[str, Engine]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def engine(self, nazev: str) -> Engine:
+        if nazev == VYCHOZI:
+            return engine
+
+        with self._lock:
+            if nazev in self._enginy:
+                self._enginy.move_to_end(nazev)
+                return self._enginy[nazev]
+
+        cesta = cesta_databaze(nazev)
+        if not cesta.exists():
+            raise NeznamaSoutez(nazev)
+        novy = _vytvorit_engine(f"sqlite:///{cesta}", cesta_archivu(nazev))
+
+        zavrit = []
+        with self._lock:
+            if nazev in self._enginy:
+                zavrit.append(novy)
+                novy = self._enginy[nazev]
+            else:
+                self._enginy[nazev] = novy
+            self._enginy.move_to_end(nazev)
+            while len(self._enginy) > self.max_otevrenych:
+                zavrit.append(self._enginy.popitem(last=False)[1])
+        for stary in zavrit:
+            stary.dispose()
+        return novy
+
+    def otevrene(self) -> list:
+        with self._lock:
+            return list(self._enginy)
+
+registr_shardu = RegistrShardu(settings.SOUTEZE_MAX_OTEVRENYCH)
+
+def get_engine() -> Engine:
+    """Engine databáze aktuální soutěže."""
+    return registr_shardu.engine(aktualni_soutez())
+
+
+class SessionSouteze(Session):
+    """Session, která se bez výslovného 'bind' připojí k databázi aktuální soutěže."""
+
+    def __init__(self, bind=None, **kwargs):
+        super().__init__(bind=bind if bind is not None else get_engine(), **kwargs)
+
+SessionLocal = sessionmaker(class_=SessionSouteze, autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
+# Jednořádková tabulka s číslem verze dat. Každý commit, který něco zapsal,
+# ji ve stejné transakci zvýší. Workery podle ní poznají, že mají zahodit
+# své cache, aniž by potřebovaly zvláštní message broker.
+data_version = Table(
+    "DATA_VERSION",
+    Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("verze", Integer, nullable=False, default=0)
+)
+
+# Přírůstkový seznam změn (change feed): jeden řádek na vložení, úpravu
+# nebo smazání sledované entity, zapsaný ve stejné transakci jako změna.
+# 'verze' je pořadové číslo změny. SQLite má vždy jen jednoho zapisovatele,
+# takže se změny commitují ve stejném pořadí, v jakém dostaly číslo, a odběratel
+# (app.repositories.zmeny) může číst prostě od poslední zpracované verze.
+zmena = Table(
+    "ZMENA",
+    Base.metadata,
+    Column("verze", Integer, primary_key=True),
+    Column("entita", String(20), nullable=False),
+    Column("entita_id", Integer, nullable=False),
+    Column("operace", String(1), nullable=False),
+    sqlite_autoincrement=True
+)
+
+# Pozice odběratelů v seznamu změn (poslední zpracovaná verze)
+odberatel_zmen = Table(
+    "ODBERATEL_ZMEN",
+    Base.metadata,
+    Column("nazev", String(50), primary_key=True),
+    Column("verze", Integer, nullable=False, default=0)
+)
+
+# Operace v seznamu změn. PRESUN = řádek se přesunul do archivu
+# (z hlavní databáze zmizel, ale dál existuje jen pro čtení).
+VLOZENI, UPRAVA, SMAZANI, PRESUN = "I", "U", "D", "A"
+
+SLEDOVANE_ENTITY = {"VINO", "HODNOCENI", "USERS", "ROCNIK"}
+
+_ZAPIS = "zapis_dat"
+# Entity, ze kterých transakce něco smazala (session.info), odebírá je
+# listener after_commit indexů našeptávače (app.repositories.odrudy)
+SMAZANE_ENTITY = "smazane_entity"
+# Transakce zapsala jen data, která žádná sdílená cache nedrží (session.info),
+# verze dat se kvůli ní nezvyšuje
+NEMENI_CACHE = "nemeni_cache"
+_posledni_verze: Dict[str, int] = {}
+_verze_lock = threading.Lock()
+
+@event.listens_for(Session, "after_flush")
+def _oznacit_zapis_flush(session: Session, flush_context) -> None:
+    session.info[_ZAPIS] = True
+
+def zaznamenat_zmeny(session: Session, entita: str, ids: Iterable[int], operace: str) -> None:
+    """
+    Zapíše změny do seznamu změn. Volá se u hromadných SQL příkazů,
+    které ORM události nezachytí (ORM změny se zapisují samy po flushi).
+    """
+    radky = [{"entita": entita, "entita_id": i, "operace": operace} for i in ids]
+    if radky:
+        session.connection().execute(insert(zmena), radky)
+        session.info[_ZAPIS] = True
+        if operace == SMAZANI:
+            session.info.setdefault(SMAZANE_ENTITY, set()).add(entita)
+
+def zaznamenat_zmeny_dotazem(session: Session, entita: str, ids: Select, operace: str) -> None:
+    """
+    Zapíše do seznamu změn řádky, jejichž ID vrátí dotaz 'ids' (jediný sloupec),
+    aniž by se načítaly do Pythonu. Volá se před hromadným mazáním, po kterém
+    závislé řádky smaže databáze kaskádou, takže je už nikdo neuvidí.
+    """
+    vyber = ids.subquery()
+    session.connection().execute(
+        insert(zmena).from_select(
+            ["entita", "entita_id", "operace"],
+            select(literal(entita), list(vyber.c)[0], literal(operace))
+        )
+    )
+    session.info[_ZAPIS] = True
+    if operace == SMAZANI:
+        session.info.setdefault(SMAZANE_ENTITY, set()).add(entita)
+
+@event.listens_for(Session, "after_flush")
+def _zaznamenat_zmeny_flush(session: Session, flush_context) -> None:
+    """Po flushi zapíše vložené, upravené a smazané sledované entity do seznamu změn."""
+    radky = []
+    for objekty, operace in (
+        (session.new, VLOZENI),
+        (session.dirty, UPRAVA),
+        (session.deleted, SMAZANI),
+    ):
+        for obj in objekty:
+            entita = getattr(obj, "__tablename__", None)
+            if entita not in SLEDOVANE_ENTITY:
+                continue
+            if operace == UPRAVA and not session.is_modified(obj, include_collections=False):
+                continue
+            radky.append({"entita": entita, "entita_id": obj.id, "operace": operace})
+            if operace == SMAZANI:
+                session.info.setdefault(SMAZANE_ENTITY, set()).add(entita)
+    if radky:
+        session.connection().execute(insert(zmena), radky)
+
+@event.listens_for(Session, "do_orm_execute")
+def _oznacit_zapis_prikaz(orm_execute_state) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_ZAPIS] = True
+
+@event.listens_for(Session, "before_commit")
+def _zvysit_verzi_dat(session: Session) -> None:
+    """Pokud transakce něco zapsala, zvýší ve stejné transakci verzi dat."""
+    session.flush()
+    nemeni_cache = session.info.pop(NEMENI_CACHE, False)
+    if session.info.pop(_ZAPIS, False) and not nemeni_cache:
+        session.connection().execute(
+            sqlite_insert(data_version)
+            .values(id=1, verze=1)
+            .on_conflict_do_update(
+                index_elements=[data_version.c.id],
+                set_={"verze": data_version.c.verze + 1}
+            )
+        )
+
+@event.listens_for(Session, "after_rollback")
+def _zahodit_zapis(session: Session) -> None:
+    session.info.pop(_ZAPIS, None)
+    session.info.pop(NEMENI_CACHE, None)
+    session.info.pop(SMAZANE_ENTITY, None)
+
+def nacist_verzi_dat() -> Optional[int]:
+    """Aktuální verze dat soutěže (None, dokud se nic nezapsalo)."""
+    with get_engine().connect() as conn:
+        return conn.execute(select(data_version.c.verze).where(data_version.c.id == 1)).scalar()
+
+def zkontrolovat_verzi_dat() -> None:
+    """
+    Přečte aktuální verzi dat (jeden řádek) a pokud se od minulé kontroly
+    změnila, vyprázdní cache aktuální soutěže. Volá se jednou na požadavek.
+    """
+    soutez = aktualni_soutez()
+    verze = nacist_verzi_dat()
+
+    with _verze_lock:
+        zmenena = soutez not in _posledni_verze or verze != _posledni_verze[soutez]
+        _posledni_verze[soutez] = verze
+    if zmenena:
+        invalidate_all()
+
+def iterovat_v_session(funkce, *args):
+    """
+    Spustí generátor 'funkce(db, *args)' s vlastní session, která se otevře
+    až při prvním čtení a zavře po posledním řádku. Používá se pro data,
+    která se čtou průběžně během streamování odpovědi (StreamingTemplateResponse),
+    kdy už session požadavku není k dispozici.
+    """
+    db = SessionLocal()
+    try:
+        yield from funkce(db, *args)
+    finally:
+        db.close()
+
 def get_db():
+    zkontrolovat_verzi_dat()
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
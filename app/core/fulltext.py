@@ -0,0 +1,146 @@
+import logging
+import re
+import sqlite3
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Fulltextový index vín: jeden řádek na víno (rowid = id vína) z hlavní
+# databáze i z archivu. Tokenizer odstraňuje diakritiku, takže 'rynsky'
+# najde 'rýnský'. Předponové indexy zrychlují hledání rozepsaných slov.
+TABULKA = "HLEDANI"
+
+_VYTVORIT = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS "{TABULKA}" USING fts5(
+    nazev, odruda, vinar, poznamky, vinar_id UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+# Hledání drží v souladu triggery v hlavní databázi. Trigger nesmí sahat
+# do připojeného archivu, proto řádky archivovaných vín přidává a maže
+# přímo app.core.archiv (viz 'sql_naplneni'). Hodnocení smazané kaskádou
+# spolu s vínem už poznámky nepřepočítává, řádek vína je v tu chvíli pryč.
+_TRIGGERY = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS hledani_vino_ai AFTER INSERT ON "VINO" BEGIN
+        INSERT INTO "{TABULKA}" (rowid, nazev, odruda, vinar, poznamky, vinar_id)
+        VALUES (
+            NEW.id, NEW.nazev, NEW.odruda,
+            (SELECT jmeno FROM "USERS" WHERE id = NEW.vinar_id), NULL, NEW.vinar_id
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS hledani_vino_au AFTER UPDATE OF nazev, odruda, vinar_id ON "VINO" BEGIN
+        UPDATE "{TABULKA}" SET
+            nazev = NEW.nazev,
+            odruda = NEW.odruda,
+            vinar = (SELECT jmeno FROM "USERS" WHERE id = NEW.vinar_id),
+            vinar_id = NEW.vinar_id
+        WHERE rowid = NEW.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS hledani_vino_ad AFTER DELETE ON "VINO" BEGIN
+        DELETE FROM "{TABULKA}" WHERE rowid = OLD.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS hledani_hodnoceni_ai AFTER INSERT ON "HODNOCENI"
+    WHEN NEW.poznamka IS NOT NULL AND NEW.poznamka != '' BEGIN
+        UPDATE "{TABULKA}" SET poznamky = (
+            SELECT group_concat(poznamka, ' ') FROM "HODNOCENI" WHERE vino_id = NEW.vino_id
+        ) WHERE rowid = NEW.vino_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS hledani_hodnoceni_au AFTER UPDATE OF poznamka, vino_id ON "HODNOCENI"
+    WHEN OLD.poznamka IS NOT NEW.poznamka OR OLD.vino_id != NEW.vino_id BEGIN
+        UPDATE "{TABULKA}" SET poznamky = (
+            SELECT group_concat(poznamka, ' ') FROM "HODNOCENI" WHERE vino_id = "{TABULKA}".rowid
+        ) WHERE rowid IN (OLD.vino_id, NEW.vino_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS hledani_hodnoceni_ad AFTER DELETE ON "HODNOCENI"
+    WHEN OLD.poznamka IS NOT NULL AND OLD.poznamka != ''
+         AND EXISTS (SELECT 1 FROM "VINO" WHERE id = OLD.vino_id) BEGIN
+        UPDATE "{TABULKA}" SET poznamky = (
+            SELECT group_concat(poznamka, ' ') FROM "HODNOCENI" WHERE vino_id = OLD.vino_id
+        ) WHERE rowid = OLD.vino_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS hledani_users_au AFTER UPDATE OF jmeno ON "USERS"
+    WHEN OLD.jmeno IS NOT NEW.jmeno BEGIN
+        UPDATE "{TABULKA}" SET vinar = NEW.jmeno WHERE vinar_id = NEW.id;
+    END
+    """,
+]
+
+
+def sql_naplneni(schema: str, podminka: str = "1") -> str:
+    """
+    INSERT ... SELECT, který do hledání přidá vína ze schématu 'main'
+    nebo 'archiv' vyhovující podmínce (nad aliasem 'v' tabulky VINO).
+    Jméno vinaře se bere vždy z hlavní databáze.
+    """
+    return f"""
+        INSERT INTO main."{TABULKA}" (rowid, nazev, odruda, vinar, poznamky, vinar_id)
+        SELECT v.id, v.nazev, v.odruda, u.jmeno,
+               (SELECT group_concat(h.poznamka, ' ') FROM {schema}."HODNOCENI" h WHERE h.vino_id = v.id),
+               v.vinar_id
+        FROM {schema}."VINO" v
+        LEFT JOIN main."USERS" u ON u.id = v.vinar_id
+        WHERE {podminka}
+    """
+
+def _archiv_pripojen(conn: sqlite3.Connection) -> bool:
+    return any(radek[1] == "archiv" for radek in conn.execute("PRAGMA database_list"))
+
+def prestavet_hledani(conn: sqlite3.Connection) -> int:
+    """Naplní hledání znovu ze všech vín (hlavní databáze i archiv). Vrací počet řádků."""
+    conn.execute(f'DELETE FROM main."{TABULKA}"')
+    conn.execute(sql_naplneni("main"))
+    if _archiv_pripojen(conn):
+        conn.execute(sql_naplneni("archiv"))
+    conn.execute(f"""INSERT INTO main."{TABULKA}" ("{TABULKA}") VALUES ('optimize')""")
+    return conn.execute(f'SELECT count(*) FROM main."{TABULKA}"').fetchone()[0]
+
+def hledani_existuje(conn: sqlite3.Connection) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = ?", (TABULKA,)
+    ).fetchone() is not None
+
+def pripravit_hledani(engine: Engine) -> None:
+    """
+    Založí fulltextovou tabulku a (znovu) triggery (volá 'scripts/init_db.py' po
+    migraci, která při přestavbě tabulky její triggery zahodí). Nově založenou
+    tabulku naplní.
+    """
+    raw = engine.raw_connection()
+    conn: sqlite3.Connection = raw.driver_connection
+    puvodni_izolace = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            nova = not hledani_existuje(conn)
+            conn.execute(_VYTVORIT)
+            # Triggery se zakládají vždy znovu, aby se projevila i změna jejich definice
+            for trigger in _TRIGGERY:
+                nazev = re.search(r"TRIGGER IF NOT EXISTS (\w+)", trigger).group(1)
+                conn.execute(f"DROP TRIGGER IF EXISTS {nazev}")
+                conn.execute(trigger)
+            if nova:
+                pocet = prestavet_hledani(conn)
+                logger.info("Fulltextové hledání založeno (%s vín)", pocet)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.isolation_level = puvodni_izolace
+        raw.close()
@@ -0,0 +1,171 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+import anyio
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Přiřazení cest ke skupinám provozu, rozhoduje první shodná předpona
+SKUPINY_CEST = (
+    ("/auth", "auth"),
+    ("/users/profil", "verejne"),
+    ("/users", "admin"),
+    ("/rocniky", "admin"),
+    ("/zmeny", "admin"),
+    ("/udrzba", "admin"),
+)
+VYCHOZI_SKUPINA = "verejne"
+
+# Cesty mimo řízení kapacity: statické soubory, obrázky a health checky musí
+# odpovídat i při přetížení, dlouhá spojení živého pořadí (SSE) by jinak
+# držela místo (jejich počet omezuje PRENOS_MAX_ODBERATELU). Rozhoduje jen
+# cesta, nikdy hlavičky, které si klient může nastavit sám.
+BEZ_RIZENI = ("/static", "/assets", "/obrazky", "/health", "/prenos/")
+
+
+class Skupina:
+    """Omezení počtu současně obsluhovaných požadavků jedné skupiny provozu a jeho statistiky."""
+
+    def __init__(self, nazev: str, kapacita: int):
+        self.nazev = nazev
+        self.limiter = anyio.CapacityLimiter(kapacita)
+        self.prijato = 0
+        self.odmitnuto = 0
+        self.cekani_celkem = 0.0
+        self.cekani_max = 0.0
+        self._lock = threading.Lock()
+
+    def zaznamenat(self, cekani: float, prijat: bool) -> None:
+        with self._lock:
+            if prijat:
+                self.prijato += 1
+                self.cekani_celkem += cekani
+                self.cekani_max = max(self.cekani_max, cekani)
+            else:
+                self.odmitnuto += 1
+
+    def metriky(self) -> dict:
+        statistiky = self.limiter.statistics()
+        with self._lock:
+            return {
+                "kapacita": self.limiter.total_tokens,
+                "obsazeno": self.limiter.borrowed_tokens,
+                "ve_fronte": statistiky.tasks_waiting,
+                "prijato": self.prijato,
+                "odmitnuto": self.odmitnuto,
+                "cekani_prumer_ms": round(1000 * self.cekani_celkem / self.prijato, 2) if self.prijato else 0.0,
+                "cekani_max_ms": round(1000 * self.cekani_max, 2),
+            }
+
+
+_skupiny: Dict[str, Skupina] = {
+    "verejne": Skupina("verejne", settings.KAPACITA_VEREJNE),
+    "auth": Skupina("auth", settings.KAPACITA_AUTH),
+    "admin": Skupina("admin", settings.KAPACITA_ADMIN),
+}
+
+# Požadavky, které tento proces právě obsluhuje, a konec posledního z nich
+# (podle toho údržba databáze pozná, že je klid)
+_probihajici = 0
+_posledni_aktivita = time.monotonic()
+
+
+def celkova_kapacita() -> int:
+    return sum(skupina.limiter.total_tokens for skupina in _skupiny.values())
+
+def nastavit_threadpool() -> None:
+    """
+    Nastaví velikost výchozího threadpoolu anyio (v něm FastAPI pouští
+    synchronní endpointy a závislosti) na součet kapacit skupin. Každý
+    přijatý požadavek drží nejvýš jedno vlákno najednou, takže pool
+    nikdy není úzkým hrdlem a fronta vzniká jen ve vlastní skupině.
+    Volá se při startu aplikace (potřebuje běžící event loop).
+    """
+    anyio.to_thread.current_default_thread_limiter().total_tokens = celkova_kapacita()
+
+def skupina_cesty(cesta: str) -> Optional[str]:
+    """Skupina provozu pro cestu, None pro cesty mimo řízení kapacity."""
+    if cesta.startswith(BEZ_RIZENI):
+        return None
+    for predpona, skupina in SKUPINY_CEST:
+        if cesta.startswith(predpona):
+            return skupina
+    return VYCHOZI_SKUPINA
+
+def necinnost() -> float:
+    """Kolik sekund tento proces neobsluhuje žádný řízený požadavek (0, pokud nějaký obsluhuje)."""
+    if _probihajici:
+        return 0.0
+    return time.monotonic() - _posledni_aktivita
+
+def metriky_kapacity() -> dict:
+    """Obsazenost a délka fronty jednotlivých skupin a threadpoolu (volat z event loopu)."""
+    vlakna = anyio.to_thread.current_default_thread_limiter()
+    return {
+        "skupiny": {nazev: skupina.metriky() for nazev, skupina in _skupiny.items()},
+        "threadpool": {
+            "kapacita": vlakna.total_tokens,
+            "obsazeno": vlakna.borrowed_tokens,
+            "ve_fronte": vlakna.statistics().tasks_waiting,
+        },
+        "necinnost_s": round(necinnost(), 1),
+    }
+
+
+class RizeniKapacity:
+    """
+    ASGI middleware pro řízení přístupu (admission control).
+
+    Požadavek si před obsluhou vezme místo ve své skupině (admin, auth,
+    veřejné) a drží ho do odeslání celé odpovědi. Skupiny mají oddělené
+    kapacity, takže např. nával přihlašování (bcrypt) nezablokuje stránky.
+    Když místo nedostane do KAPACITA_MAX_CEKANI sekund, dostane hned
+    503 s hlavičkou Retry-After, místo aby čekal, až klientovi vyprší čas.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        global _probihajici, _posledni_aktivita
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        nazev = skupina_cesty(scope["path"])
+        if nazev is None:
+            await self.app(scope, receive, send)
+            return
+
+        skupina = _skupiny[nazev]
+        _posledni_aktivita = time.monotonic()
+        vypujcka = object()
+        zacatek = time.monotonic()
+        try:
+            with anyio.fail_after(settings.KAPACITA_MAX_CEKANI):
+                await skupina.limiter.acquire_on_behalf_of(vypujcka)
+        except TimeoutError:
+            skupina.zaznamenat(time.monotonic() - zacatek, prijat=False)
+            logger.warning("Přetížení: odmítnut požadavek %s (skupina %s)", scope["path"], nazev)
+            odpoved = PlainTextResponse(
+                "Server je momentálně přetížený, zkuste to prosím za chvíli.",
+                status_code=503,
+                headers={"Retry-After": str(settings.KAPACITA_RETRY_AFTER)}
+            )
+            await odpoved(scope, receive, send)
+            return
+
+        skupina.zaznamenat(time.monotonic() - zacatek, prijat=True)
+        _probihajici += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            skupina.limiter.release_on_behalf_of(vypujcka)
+            _probihajici -= 1
+            _posledni_aktivita = time.monotonic()
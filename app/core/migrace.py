@@ -0,0 +1,119 @@
+import logging
+import re
+import sqlite3
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateTable, CreateIndex
+
+from app.core.database import Base
+
+logger = logging.getLogger(__name__)
+
+_dialekt = sqlite.dialect()
+
+
+def _normalizovat(sql: str) -> str:
+    return re.sub(r"\s+", " ", sql or "").strip()
+
+def _ddl(tabulka) -> str:
+    return str(CreateTable(tabulka).compile(dialect=_dialekt))
+
+def _prestavet_tabulku(conn: sqlite3.Connection, tabulka) -> None:
+    """
+    Přestaví tabulku podle aktuálního modelu postupem doporučeným v dokumentaci
+    SQLite: nová tabulka, kopie společných sloupců, smazání staré, přejmenování.
+    """
+    nazev = tabulka.name
+    docasny = f"{nazev}__novy"
+
+    stare_sloupce = {r[1] for r in conn.execute(f'PRAGMA table_info("{nazev}")')}
+    spolecne = ", ".join(f'"{c.name}"' for c in tabulka.columns if c.name in stare_sloupce)
+
+    # Čítač AUTOINCREMENT se s tabulkou zahodí, nová by po kopii řádků znovu
+    # rozdala ID smazaných nebo archivovaných řádků
+    sekvence = None
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'").fetchone():
+        sekvence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (nazev,)).fetchone()
+
+    ddl = _ddl(tabulka).replace(f'CREATE TABLE "{nazev}"', f'CREATE TABLE "{docasny}"', 1)
+    conn.execute(ddl)
+    conn.execute(f'INSERT INTO "{docasny}" ({spolecne}) SELECT {spolecne} FROM "{nazev}"')
+    conn.execute(f'DROP TABLE "{nazev}"')
+    conn.execute(f'ALTER TABLE "{docasny}" RENAME TO "{nazev}"')
+
+    if sekvence and tabulka.kwargs.get("sqlite_autoincrement"):
+        conn.execute("UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = ?", (sekvence[0], nazev))
+
+    for index in tabulka.indexes:
+        conn.execute(str(CreateIndex(index, if_not_exists=True).compile(dialect=_dialekt)))
+
+def _smazat_osirele(conn: sqlite3.Connection) -> int:
+    """
+    Smaže řádky, které odkazují na neexistující řádek přes cizí klíč
+    s ON DELETE CASCADE. Dokud SQLite cizí klíče nekontroloval, mohly
+    takové řádky vzniknout, kaskáda by je smazala spolu s rodičem.
+    Opakuje se, dokud je co mazat (smazané víno osiří svá hodnocení).
+    """
+    smazano = 0
+    while True:
+        osirele = set()
+        for tabulka, rowid, _, fkid in conn.execute("PRAGMA foreign_key_check").fetchall():
+            klice = {r[0]: r[6] for r in conn.execute(f'PRAGMA foreign_key_list("{tabulka}")')}
+            if rowid is not None and klice.get(fkid) == "CASCADE":
+                osirele.add((tabulka, rowid))
+        if not osirele:
+            return smazano
+        for tabulka, rowid in osirele:
+            conn.execute(f'DELETE FROM "{tabulka}" WHERE rowid = ?', (rowid,))
+        smazano += len(osirele)
+
+def migrovat(engine: Engine) -> None:
+    """
+    Srovná schéma existující databáze s modely v app.models.db.
+
+    Tabulky, které ještě neexistují, vytvoří 'Base.metadata.create_all'.
+    Tabulky, jejichž uložené DDL se liší od modelu (nový sloupec, jiné
+    omezení, AUTOINCREMENT...), se přestaví i s daty a chybějící indexy
+    se dovytvoří. Vše proběhne v jedné
+    transakci. Spouští se z 'scripts/init_db.py', ne za běhu aplikace.
+    """
+    raw = engine.raw_connection()
+    conn: sqlite3.Connection = raw.driver_connection
+    puvodni_izolace = conn.isolation_level
+    conn.isolation_level = None
+    puvodni_fk = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    try:
+        conn.execute("PRAGMA foreign_keys=OFF")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            ulozene = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table'"))
+            for tabulka in Base.metadata.sorted_tables:
+                if tabulka.name not in ulozene:
+                    continue
+                if _normalizovat(ulozene[tabulka.name]) != _normalizovat(_ddl(tabulka)):
+                    logger.info("Přestavuji tabulku %s", tabulka.name)
+                    print(f"Migrace: přestavuji tabulku {tabulka.name}")
+                    _prestavet_tabulku(conn, tabulka)
+
+            # Indexy, které v modelu přibyly u tabulek, jež se nepřestavovaly
+            for tabulka in Base.metadata.sorted_tables:
+                if tabulka.name not in ulozene:
+                    continue
+                for index in tabulka.indexes:
+                    conn.execute(str(CreateIndex(index, if_not_exists=True).compile(dialect=_dialekt)))
+
+            osirele = _smazat_osirele(conn)
+            if osirele:
+                print(f"Migrace: smazáno {osirele} řádků odkazujících na neexistující záznamy")
+
+            chyby = conn.execute("PRAGMA foreign_key_check").fetchall()
+            if chyby:
+                raise RuntimeError(f"Migrace porušila cizí klíče: {chyby[:5]}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.execute(f"PRAGMA foreign_keys={puvodni_fk}")
+        conn.isolation_level = puvodni_izolace
+        raw.close()
@@ -0,0 +1,263 @@
+import bisect
+import contextvars
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Kolik kandidátů s odpovídající předponou se nejvýš prochází při řazení
+MAX_KANDIDATU = 500
+# Jaký podíl trigramů dotazu musí hodnota obsahovat, aby se nabídla i s překlepem
+MIN_PODOBNOST = 0.6
+
+_NEPISMENA = re.compile(r"[^0-9a-z]+")
+
+
+def normalizovat(text: str) -> str:
+    """Malá písmena bez diakritiky, interpunkce a nadbytečných mezer ('Müller-Thurgau' -> 'muller thurgau')."""
+    bez_diakritiky = "".join(
+        znak for znak in unicodedata.normalize("NFKD", text) if not unicodedata.combining(znak)
+    )
+    return _NEPISMENA.sub(" ", bez_diakritiky.lower()).strip()
+
+def _trigramy(klic: str) -> Set[str]:
+    doplneny = f"  {klic} "
+    return {doplneny[i:i + 3] for i in range(len(doplneny) - 2)}
+
+
+@dataclass
+class _Zaznam:
+    hodnota: str
+    pocet: int = 0
+    kanonicka: bool = False
+    trigramu: int = 0
+
+
+class _Data:
+    """
+    Data indexu. Při přestavbě se sestaví nová a jen se vymění odkaz, nové
+    hodnoty se doplňují na místě (pod zámkem indexu).
+    """
+
+    def __init__(self):
+        self.zaznamy: Dict[str, _Zaznam] = {}
+        self.predpony: List[Tuple[str, str]] = []
+        self.trigramy: Dict[str, Set[str]] = {}
+
+    def pridat(self, hodnota: str, pocet: int = 1, kanonicka: bool = False) -> None:
+        klic = normalizovat(hodnota)
+        if not klic:
+            return
+        zaznam = self.zaznamy.get(klic)
+        if zaznam is None:
+            trigramy = _trigramy(klic)
+            self.zaznamy[klic] = _Zaznam(hodnota, pocet, kanonicka, len(trigramy))
+            slova = klic.split(" ")
+            for i in range(len(slova)):
+                bisect.insort(self.predpony, (" ".join(slova[i:]), klic))
+            for trigram in trigramy:
+                self.trigramy.setdefault(trigram, set()).add(klic)
+            return
+
+        zaznam.pocet += pocet
+        # Zobrazí se kanonický tvar, jinak první uložený zápis
+        if kanonicka and not zaznam.kanonicka:
+            zaznam.hodnota, zaznam.kanonicka = hodnota, True
+
+
+class IndexNaseptavace:
+    """
+    Index pro našeptávání hodnot textového pole v paměti procesu.
+
+    Hodnoty se porovnávají bez diakritiky a velikosti písmen, takže
+    'Ryzlink rýnský' a 'ryzlink rynsky' jsou jedna položka (zobrazí se
+    kanonický tvar, pokud existuje). Hledá se podle předpony celé
+    hodnoty i kteréhokoli slova (binární vyhledávání v seřazeném
+    seznamu), zkratky se mapují přes 'aliasy' a při malém počtu shod
+    se doplní podobné hodnoty podle trigramů (překlepy).
+
+    Index se poprvé sestaví funkcí 'nacist', která vrací dvojice
+    (hodnota, počet použití). Nově uložené hodnoty se do něj doplňují
+    průběžně metodou 'pridat' (po commitu), celý se přestaví jen po
+    'clear()', tedy když hodnota z databáze zmizela (smazané nebo
+    přejmenované víno), a nejpozději po NASEPTAVAC_MAX_STARI sekundách
+    kvůli zápisům v jiných workerech. Na invalidate_all záměrně není
+    navázaný, ta běží po každém zápisu včetně přihlášení. Při přestavbě
+    se dál odpovídá ze starých dat a nová se sestaví na pozadí, takže
+    dotaz při psaní nikdy nečeká na databázi. Doplnění mění data na
+    místě, dotazy je proto čtou pod stejným zámkem.
+
+    Index patří soutěži, v jejímž kontextu vznikl, a čte jen její data.
+    """
+
+    def __init__(
+        self,
+        nazev: str,
+        nacist: Callable[[], Iterable[Tuple[str, int]]],
+        kanonicke: Iterable[str] = (),
+        aliasy: Optional[Dict[str, str]] = None
+    ):
+        self.nazev = nazev
+        self._nacist = nacist
+        self._kanonicke = list(kanonicke)
+        self._aliasy = {normalizovat(k): normalizovat(v) for k, v in (aliasy or {}).items()}
+        self._data: Optional[_Data] = None
+        self._lock = threading.Lock()
+        self._generace = 0
+        self._zastaraly = False
+        self._prestavuje_se = False
+        self._doplnene: List[str] = []
+        self._sestaveno = 0.0
+
+    def _sestavit(self) -> _Data:
+        data = _Data()
+        for hodnota in self._kanonicke:
+            data.pridat(hodnota, 0, kanonicka=True)
+        for hodnota, pocet in self._nacist():
+            if hodnota:
+                data.pridat(hodnota, pocet)
+        return data
+
+    def _prestavet(self) -> None:
+        with self._lock:
+            generace = self._generace
+        sestaveno = time.monotonic()
+        try:
+            data = self._sestavit()
+        except Exception:
+            logger.exception("Přestavba indexu %s selhala", self.nazev)
+            data = None
+        with self._lock:
+            self._prestavuje_se = False
+            doplnene, self._doplnene = self._doplnene, []
+            if data is not None:
+                # Hodnoty doplněné během přestavby nemusela nová data načíst
+                for hodnota in doplnene:
+                    data.pridat(hodnota)
+                self._data = data
+                self._sestaveno = sestaveno
+                self._zastaraly = generace != self._generace
+
+    def _aktualni_data(self) -> _Data:
+        with self._lock:
+            data = self._data
+            zastaraly = self._zastaraly or time.monotonic() - self._sestaveno > settings.NASEPTAVAC_MAX_STARI
+            spustit = data is not None and zastaraly and not self._prestavuje_se
+            if spustit:
+                self._prestavuje_se = True
+        if data is None:
+            self._prestavet()
+            return self._data or _Data()
+        if spustit:
+            threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(self._prestavet,),
+                name=f"index-{self.nazev}",
+                daemon=True
+            ).start()
+        return data
+
+    def clear(self) -> None:
+        """Označí index jako zastaralý, přestaví se při příštím dotazu na pozadí."""
+        with self._lock:
+            self._generace += 1
+            self._zastaraly = True
+
+    def pridat(self, hodnoty: Iterable[str]) -> None:
+        """Doplní do indexu nově uložené hodnoty (bez čtení z databáze)."""
+        hodnoty = [h for h in hodnoty if h and normalizovat(h)]
+        if not hodnoty:
+            return
+        with self._lock:
+            if self._data is None:
+                return
+            for hodnota in hodnoty:
+                self._data.pridat(hodnota)
+            if self._prestavuje_se:
+                self._doplnene.extend(hodnoty)
+
+    def kanonicky_tvar(self, hodnota: Optional[str]) -> Optional[str]:
+        """
+        Vrátí kanonický zápis hodnoty, pokud ji index zná jako kanonickou
+        (i přes zkratku), jinak hodnotu beze změny.
+        """
+        if not hodnota:
+            return hodnota
+        klic = normalizovat(hodnota)
+        data = self._aktualni_data()
+        with self._lock:
+            zaznam = data.zaznamy.get(self._aliasy.get(klic, klic))
+            if zaznam is not None and zaznam.kanonicka:
+                return zaznam.hodnota
+        return hodnota.strip()
+
+    def naseptat(self, dotaz: str, limit: int = 10) -> List[str]:
+        """
+        Vrátí nejvýš 'limit' návrhů pro rozepsaný text. Nejdřív zkratka,
+        pak shody od začátku hodnoty, pak od začátku slova (kanonické
+        a častěji použité hodnoty dřív), nakonec podobné hodnoty.
+        """
+        klic = normalizovat(dotaz or "")
+        if not klic or limit <= 0:
+            return []
+        data = self._aktualni_data()
+        with self._lock:
+            return self._naseptat(data, klic, limit)
+
+    def _naseptat(self, data: _Data, klic: str, limit: int) -> List[str]:
+        vysledek: List[str] = []
+        alias = self._aliasy.get(klic)
+        if alias in data.zaznamy:
+            vysledek.append(alias)
+
+        kandidati: Dict[str, bool] = {}
+        zacatek = bisect.bisect_left(data.predpony, (klic, ""))
+        for predpona, nalezeny in data.predpony[zacatek:zacatek + MAX_KANDIDATU]:
+            if not predpona.startswith(klic):
+                break
+            kandidati[nalezeny] = kandidati.get(nalezeny, False) or nalezeny.startswith(klic)
+        if alias is not None:
+            kandidati.pop(alias, None)
+
+        def razeni(nalezeny: str):
+            zaznam = data.zaznamy[nalezeny]
+            return (not kandidati[nalezeny], not zaznam.kanonicka, -zaznam.pocet, nalezeny)
+
+        vysledek.extend(heapq.nsmallest(limit - len(vysledek), kandidati, key=razeni))
+
+        if len(vysledek) < limit and len(klic) >= 3:
+            vysledek.extend(self._podobne(data, klic, set(vysledek), limit - len(vysledek)))
+
+        return [data.zaznamy[nalezeny].hodnota for nalezeny in vysledek[:limit]]
+
+    def _podobne(self, data: _Data, klic: str, vynechat: Set[str], limit: int) -> List[str]:
+        """
+        Hodnoty, které obsahují aspoň MIN_PODOBNOST trigramů dotazu.
+        Taková hodnota musí být v některém z (n - potřeba + 1) nejkratších
+        seznamů trigramů, takže se kandidáti berou jen z nich a velmi
+        časté trigramy se neprocházejí.
+        """
+        trigramy = sorted(_trigramy(klic), key=lambda t: len(data.trigramy.get(t, ())))
+        potreba = math.ceil(MIN_PODOBNOST * len(trigramy))
+
+        kandidati: Set[str] = set()
+        for trigram in trigramy[:len(trigramy) - potreba + 1]:
+            kandidati.update(data.trigramy.get(trigram, ()))
+        kandidati -= vynechat
+
+        podobne = []
+        for nalezeny in kandidati:
+            shoda = sum(1 for t in trigramy if nalezeny in data.trigramy.get(t, ()))
+            if shoda >= potreba:
+                zaznam = data.zaznamy[nalezeny]
+                podobne.append((-shoda, zaznam.trigramu, -zaznam.pocet, nalezeny))
+        return [nalezeny for *_, nalezeny in heapq.nsmallest(limit, podobne)]
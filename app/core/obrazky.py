@@ -0,0 +1,160 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # volitelná závislost, bez ní se obrázky posílají v původní velikosti
+    Image = ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+# Odvozené velikosti: název -> nejdelší strana v pixelech
+VELIKOSTI: Dict[str, int] = {"nahled": 160, "web": 1024}
+KVALITA_JPEG = 82
+
+# Podporované formáty podle prvních bajtů souboru (příponě ani Content-Type se nevěří)
+_SIGNATURY: Tuple[Tuple[bytes, str], ...] = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+)
+PRIPONY = (".jpg", ".png", ".gif", ".webp")
+_OTISK = re.compile(r"^[0-9a-f]{64}$")
+
+_pool = ThreadPoolExecutor(max_workers=settings.OBRAZKY_VLAKNA, thread_name_prefix="obrazky")
+_rozpracovane = set()
+_rozpracovane_lock = threading.Lock()
+
+
+class NeplatnyObrazek(ValueError):
+    """Nahraný soubor není podporovaný obrázek nebo je příliš velký."""
+
+
+def _koren() -> Path:
+    return Path(settings.OBRAZKY_DIR)
+
+def _pripona(data: bytes) -> Optional[str]:
+    for signatura, pripona in _SIGNATURY:
+        if data.startswith(signatura):
+            return pripona
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+def platny_otisk(otisk: str) -> bool:
+    return bool(_OTISK.match(otisk or ""))
+
+def cesta_originalu(otisk: str) -> Optional[Path]:
+    """Původní soubor obrázku (ukládá se s příponou podle formátu)."""
+    adresar = _koren() / "original" / otisk[:2]
+    for pripona in PRIPONY:
+        cesta = adresar / f"{otisk}{pripona}"
+        if cesta.exists():
+            return cesta
+    return None
+
+def cesta_odvozeneho(otisk: str, velikost: str) -> Path:
+    return _koren() / velikost / otisk[:2] / f"{otisk}.jpg"
+
+def _zapsat_atomicky(cesta: Path, zapsat) -> None:
+    """Zapíše soubor přes dočasný soubor, souběžné čtení nikdy nevidí polovičatý obsah."""
+    cesta.parent.mkdir(parents=True, exist_ok=True)
+    docasna = cesta.with_name(f"{cesta.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        zapsat(docasna)
+        os.replace(docasna, cesta)
+    finally:
+        docasna.unlink(missing_ok=True)
+
+def ulozit_obrazek(data: bytes) -> str:
+    """
+    Uloží nahraný obrázek pod otiskem obsahu (SHA-256) a vrátí otisk.
+
+    Stejný obrázek nahraný vícekrát (i k různým vínům či v jiné soutěži)
+    je na disku jen jednou. Odvozené velikosti se začnou připravovat
+    na pozadí, odpověď na nahrání na ně nečeká.
+    """
+    if len(data) > settings.OBRAZKY_MAX_VELIKOST:
+        raise NeplatnyObrazek(
+            f"Obrázek je příliš velký (nejvýš {settings.OBRAZKY_MAX_VELIKOST // (1024 * 1024)} MB)."
+        )
+    pripona = _pripona(data)
+    if not pripona:
+        raise NeplatnyObrazek("Podporované formáty obrázků jsou JPEG, PNG, GIF a WebP.")
+
+    otisk = hashlib.sha256(data).hexdigest()
+    if not cesta_originalu(otisk):
+        cesta = _koren() / "original" / otisk[:2] / f"{otisk}{pripona}"
+        _zapsat_atomicky(cesta, lambda docasna: docasna.write_bytes(data))
+
+    naplanovat_odvozene(otisk)
+    return otisk
+
+def naplanovat_odvozene(otisk: str) -> None:
+    """Zařadí přípravu chybějících velikostí do fronty (každý obrázek nejvýš jednou)."""
+    if Image is None:
+        return
+    if all(cesta_odvozeneho(otisk, velikost).exists() for velikost in VELIKOSTI):
+        return
+    with _rozpracovane_lock:
+        if otisk in _rozpracovane:
+            return
+        _rozpracovane.add(otisk)
+    _pool.submit(_vytvorit_odvozene, otisk)
+
+def _vytvorit_odvozene(otisk: str) -> None:
+    try:
+        original = cesta_originalu(otisk)
+        if original is None:
+            return
+        with Image.open(original) as obrazek:
+            obrazek = ImageOps.exif_transpose(obrazek).convert("RGB")
+            # Od největší velikosti k nejmenší, každá se zmenšuje z předchozí
+            for velikost, strana in sorted(VELIKOSTI.items(), key=lambda v: -v[1]):
+                cil = cesta_odvozeneho(otisk, velikost)
+                obrazek.thumbnail((strana, strana), Image.LANCZOS)
+                if not cil.exists():
+                    _zapsat_atomicky(
+                        cil,
+                        lambda docasna: obrazek.save(docasna, "JPEG", quality=KVALITA_JPEG, optimize=True, progressive=True)
+                    )
+    except Exception:
+        logger.exception("Příprava velikostí obrázku %s selhala", otisk)
+    finally:
+        with _rozpracovane_lock:
+            _rozpracovane.discard(otisk)
+
+def najit_obrazek(otisk: str, velikost: str) -> Optional[Tuple[Path, bool]]:
+    """
+    Soubor obrázku v požadované velikosti ('original' nebo klíč VELIKOSTI).
+    Vrací (cesta, hotovy). Dokud odvozená velikost není připravená (nebo
+    chybí Pillow), vrátí původní soubor s hotovy=False a přípravu zařadí.
+    """
+    if not platny_otisk(otisk) or (velikost != "original" and velikost not in VELIKOSTI):
+        return None
+    original = cesta_originalu(otisk)
+    if velikost == "original":
+        return (original, True) if original else None
+
+    cesta = cesta_odvozeneho(otisk, velikost)
+    if cesta.exists():
+        return cesta, True
+    if original is None:
+        return None
+    naplanovat_odvozene(otisk)
+    return original, False
+
+def obrazek_url(otisk: Optional[str], velikost: str = "web") -> Optional[str]:
+    """URL obrázku pro šablony (None, pokud víno obrázek nemá)."""
+    if not otisk:
+        return None
+    return f"/obrazky/{velikost}/{otisk}"
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import anyio
+from starlette.templating import Jinja2Templates
+
+from app.core.config import settings
+from app.core.database import SessionLocal, nacist_verzi_dat
+from app.core.souteze import aktualni_soutez, soutez_kontext
+from app.repositories.poradi import get_verze_poradi
+from app.repositories.vina import iter_vina_by_rocnik
+
+logger = logging.getLogger(__name__)
+
+# Pokyn prohlížeči, ať si stránku načte znovu celou (nestíhá zprávy nebo
+# se připojil se stránkou starší, než je poslední změna pořadí)
+OBNOVIT = "event: obnovit\ndata: {}\n\n"
+HEARTBEAT = ": ping\n\n"
+
+# Kanály podle (soutěž, ročník). Kanály i odběratelé žijí jen ve smyčce
+# událostí, zámky nepotřebují, z vláken se do ní vstupuje přes _smycka.
+_kanaly: Dict[Tuple[str, int], "Kanal"] = {}
+_smycka: Optional[asyncio.AbstractEventLoop] = None
+_pocet_odberatelu = 0
+
+
+class Odberatel:
+    """Jeden připojený prohlížeč s omezenou frontou zpráv k odeslání."""
+
+    def __init__(self, kanal: "Kanal"):
+        self.kanal = kanal
+        self.fronta: asyncio.Queue = asyncio.Queue(maxsize=settings.PRENOS_FRONTA)
+
+    def poslat(self, zprava: str) -> None:
+        try:
+            self.fronta.put_nowait(zprava)
+        except asyncio.QueueFull:
+            # Pomalý klient: nestihnuté rozdíly se zahodí a místo nich
+            # dostane jediný pokyn načíst si stránku znovu
+            while not self.fronta.empty():
+                self.fronta.get_nowait()
+            self.fronta.put_nowait(OBNOVIT)
+
+    async def zpravy(self, verze_klienta: Optional[int]) -> AsyncIterator[str]:
+        """
+        Proud SSE zpráv pro StreamingResponse. Bez zpráv se každých
+        PRENOS_HEARTBEAT sekund pošle komentář, aby proxy spojení nezavřela
+        a odpojený klient se poznal při zápisu. Odběratel se odhlásí, jakmile
+        proud skončí (i při odpojení klienta).
+        """
+        try:
+            yield f"retry: {settings.PRENOS_RETRY_MS}\n\n"
+            await self.kanal.pripraveno.wait()
+            if verze_klienta is not None and verze_klienta < self.kanal.verze_poradi:
+                yield OBNOVIT
+                return
+            while True:
+                try:
+                    zprava = await asyncio.wait_for(self.fronta.get(), settings.PRENOS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    zprava = HEARTBEAT
+                yield zprava
+                if zprava is OBNOVIT:
+                    return
+        finally:
+            self.kanal.odhlasit(self)
+
+
+class Kanal:
+    """
+    Pořadí jednoho ročníku pro všechny jeho diváky v procesu.
+
+    Přepočet běží jednou na změnu, ne jednou na diváka: úloha kanálu drží
+    poslední snímek výsledkové tabulky, po změně načte novou, porovná ji se
+    snímkem a všem odběratelům rozešle stejnou, jednou serializovanou zprávu
+    jen se změněnými řádky (vykreslenými šablonou index_radek.html).
+    Oznámení, která přijdou během PRENOS_SLOUCENI, se sloučí do jednoho
+    přepočtu. Zápisy z jiných workerů se poznají podle DATA_VERSION, která
+    se kontroluje každých PRENOS_KONTROLA sekund.
+    """
+
+    def __init__(self, soutez: str, rocnik_id: int, templates: Jinja2Templates):
+        self.soutez = soutez
+        self.rocnik_id = rocnik_id
+        self.sablona = templates.get_template("index_radek.html")
+        self.odberatele: Set[Odberatel] = set()
+        self.zmena = asyncio.Event()
+        self.pripraveno = asyncio.Event()
+        # Verze dat, ze které je snímek (jen pro zjištění, že se něco změnilo),
+        # a verze pořadí ročníku, se kterou se porovnává stránka diváka
+        self.verze_dat: Optional[int] = None
+        self.verze_poradi = 0
+        self._snimek: Dict[int, dict] = {}
+        self._poradi: List[int] = []
+        self.uloha = asyncio.create_task(self._smycka())
+
+    def prihlasit(self) -> Odberatel:
+        global _pocet_odberatelu
+        odberatel = Odberatel(self)
+        self.odberatele.add(odberatel)
+        _pocet_odberatelu += 1
+        return odberatel
+
+    def odhlasit(self, odberatel: Odberatel) -> None:
+        global _pocet_odberatelu
+        if odberatel in self.odberatele:
+            self.odberatele.discard(odberatel)
+            _pocet_odberatelu -= 1
+        if not self.odberatele:
+            self.zmena.set()  # úloha kanálu se probudí a skončí
+
+    def _nacist(self, verze_dat: Optional[int], snimek: Dict[int, dict], poradi: List[int]):
+        """
+        Běží ve vlákně. Pokud se od snímku změnila data, načte pořadí ročníku
+        a vrátí (verze dat, verze pořadí, snímek, pořadí, zpráva); zpráva je
+        None, pokud se pořadí nezměnilo nebo jde o první snímek. Beze změny
+        dat vrací None. Verze pořadí se čte až po snímku: přepočet mezi
+        nimi vede nanejvýš ke zbytečnému obnovení stránky, ne k jeho vynechání.
+        """
+        with soutez_kontext(self.soutez):
+            verze = nacist_verzi_dat() or 0
+            if verze == verze_dat:
+                return None
+            db = SessionLocal()
+            try:
+                vina = list(iter_vina_by_rocnik(db, self.rocnik_id))
+                verze_poradi = get_verze_poradi(db, self.rocnik_id)
+            finally:
+                db.close()
+
+        novy_snimek = {v.id: v.model_dump(mode="json") for v in vina}
+        nove_poradi = [v.id for v in vina]
+        if verze_dat is None:
+            return verze, verze_poradi, novy_snimek, nove_poradi, None
+
+        zmenene = [v for v in vina if snimek.get(v.id) != novy_snimek[v.id]]
+        smazane = [vino_id for vino_id in snimek if vino_id not in novy_snimek]
+        if not zmenene and not smazane and nove_poradi == poradi:
+            return verze, verze_poradi, novy_snimek, nove_poradi, None
+
+        data = {
+            "radky": {v.id: self.sablona.render(vino=v) for v in zmenene},
+            "smazane": smazane,
+            "poradi": nove_poradi if nove_poradi != poradi else None,
+        }
+        zprava = f"id: {verze_poradi}\nevent: poradi\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+        return verze, verze_poradi, novy_snimek, nove_poradi, zprava
+
+    async def _prepocitat(self) -> None:
+        vysledek = await anyio.to_thread.run_sync(self._nacist, self.verze_dat, self._snimek, self._poradi)
+        if vysledek is None:
+            return
+        # Diváci se stránkou starší než verze pořadí snímku si ji načtou znovu
+        self.verze_dat, self.verze_poradi, self._snimek, self._poradi, zprava = vysledek
+        if zprava:
+            for odberatel in list(self.odberatele):
+                odberatel.poslat(zprava)
+
+    async def _smycka(self) -> None:
+        klic = (self.soutez, self.rocnik_id)
+        try:
+            while self.odberatele:
+                try:
+                    await self._prepocitat()
+                except Exception:
+                    logger.exception("Přepočet živého pořadí ročníku %s selhal", self.rocnik_id)
+                self.pripraveno.set()
+
+                try:
+                    await asyncio.wait_for(self.zmena.wait(), settings.PRENOS_KONTROLA)
+                    await asyncio.sleep(settings.PRENOS_SLOUCENI)
+                except asyncio.TimeoutError:
+                    pass
+                self.zmena.clear()
+        finally:
+            # Bez await mezi kontrolou odběratelů a odebráním kanálu,
+            # nový odběratel tak vždy dostane živý kanál
+            if _kanaly.get(klic) is self:
+                del _kanaly[klic]
+            self.pripraveno.set()
+
+
+def prihlasit(rocnik_id: int, templates: Jinja2Templates) -> Optional[Odberatel]:
+    """
+    Přihlásí nového diváka k pořadí ročníku aktuální soutěže. Volá se ze
+    smyčky událostí. Vrací None, pokud proces už má PRENOS_MAX_ODBERATELU diváků.
+    """
+    global _smycka
+    if _pocet_odberatelu >= settings.PRENOS_MAX_ODBERATELU:
+        return None
+    _smycka = asyncio.get_running_loop()
+
+    klic = (aktualni_soutez(), rocnik_id)
+    kanal = _kanaly.get(klic)
+    if kanal is None:
+        kanal = _kanaly[klic] = Kanal(klic[0], rocnik_id, templates)
+    return kanal.prihlasit()
+
+def _probudit(klic: Tuple[str, int]) -> None:
+    kanal = _kanaly.get(klic)
+    if kanal is not None:
+        kanal.zmena.set()
+
+def oznamit_zmenu_poradi(rocnik_id: int) -> None:
+    """
+    Oznámí kanálu ročníku, že se po commitu mohlo změnit pořadí. Dá se volat
+    z vlákna i ze smyčky událostí. Bez diváků nic nedělá.
+    """
+    smycka = _smycka
+    if smycka is None:
+        return
+    try:
+        smycka.call_soon_threadsafe(_probudit, (aktualni_soutez(), rocnik_id))
+    except RuntimeError:
+        pass  # smyčka už skončila
+
+def metriky_prenosu() -> dict:
+    return {"kanalu": len(_kanaly), "odberatelu": _pocet_odberatelu}
@@ -0,0 +1,186 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Protocol, Tuple
+
+from app.core.config import settings
+
+
+class RateLimitBackend(Protocol):
+    """
+    Úložiště stavu token bucketů.
+    Paměťový backend stačí pro jeden proces, SQLite backend sdílí stav mezi
+    více workery uvicornu na jednom stroji.
+    """
+
+    def consume(self, klic: str, kapacita: float, za_sekundu: float) -> float:
+        """
+        Odebere z bucketu jeden token.
+        Vrátí 0, pokud byl token k dispozici, jinak počet sekund do doplnění.
+        """
+        ...
+
+    def reset(self, klic: str) -> None:
+        """Zahodí stav bucketu (bucket je znovu plný)."""
+        ...
+
+
+def _doplnit(tokeny: float, cas: float, kapacita: float, za_sekundu: float, ted: float) -> float:
+    return min(kapacita, tokeny + (ted - cas) * za_sekundu)
+
+
+class MemoryBackend:
+    """
+    Token buckety v paměti procesu.
+
+    Každý klíč zabírá jen jednu n-tici (tokeny, čas poslední změny, čas plného
+    doplnění). Buckety, které by už byly zase plné, se průběžně mažou, takže
+    paměť neroste s počtem IP adres, které se kdy zkoušely přihlásit.
+    """
+
+    def __init__(self, max_polozek: int = 100_000, interval_uklidu: float = 60.0):
+        self._buckety: Dict[str, Tuple[float, float, float]] = {}
+        self._lock = threading.Lock()
+        self._max_polozek = max_polozek
+        self._interval_uklidu = interval_uklidu
+        self._posledni_uklid = time.monotonic()
+
+    def consume(self, klic: str, kapacita: float, za_sekundu: float) -> float:
+        ted = time.monotonic()
+        with self._lock:
+            self._uklidit(ted)
+
+            tokeny, cas, _ = self._buckety.get(klic, (kapacita, ted, ted))
+            tokeny = _doplnit(tokeny, cas, kapacita, za_sekundu, ted)
+
+            if tokeny < 1:
+                self._buckety[klic] = (tokeny, ted, ted + (kapacita - tokeny) / za_sekundu)
+                return (1 - tokeny) / za_sekundu
+
+            tokeny -= 1
+            self._buckety[klic] = (tokeny, ted, ted + (kapacita - tokeny) / za_sekundu)
+            return 0.0
+
+    def reset(self, klic: str) -> None:
+        with self._lock:
+            self._buckety.pop(klic, None)
+
+    def _uklidit(self, ted: float) -> None:
+        """Smaže plně doplněné buckety. Volá se pod zámkem."""
+        if ted - self._posledni_uklid < self._interval_uklidu and len(self._buckety) < self._max_polozek:
+            return
+        self._posledni_uklid = ted
+
+        self._buckety = {k: v for k, v in self._buckety.items() if v[2] > ted}
+
+        if len(self._buckety) >= self._max_polozek:
+            serazene = sorted(self._buckety.items(), key=lambda polozka: polozka[1][2])
+            self._buckety = dict(serazene[len(serazene) // 2:])
+
+
+class SQLiteBackend:
+    """
+    Token buckety ve sdíleném SQLite souboru.
+
+    Stav je uložen mimo hlavní databázi, aby zápisy při přihlašování
+    neblokovaly zápisy hodnocení. Každé vlákno má vlastní spojení, změna
+    jednoho bucketu probíhá v transakci BEGIN IMMEDIATE.
+    """
+
+    def __init__(self, cesta: str, interval_uklidu: float = 60.0):
+        self._cesta = cesta
+        self._local = threading.local()
+        self._interval_uklidu = interval_uklidu
+        self._posledni_uklid = 0.0
+        Path(cesta).parent.mkdir(parents=True, exist_ok=True)
+        with self._spojeni() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS RATE_LIMIT ("
+                "klic TEXT PRIMARY KEY, tokeny REAL NOT NULL, cas REAL NOT NULL, plny_v REAL NOT NULL)"
+            )
+
+    def _spojeni(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._cesta, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def consume(self, klic: str, kapacita: float, za_sekundu: float) -> float:
+        ted = time.time()
+        conn = self._spojeni()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if ted - self._posledni_uklid >= self._interval_uklidu:
+                self._posledni_uklid = ted
+                conn.execute("DELETE FROM RATE_LIMIT WHERE plny_v <= ?", (ted,))
+
+            radek = conn.execute(
+                "SELECT tokeny, cas FROM RATE_LIMIT WHERE klic = ?", (klic,)
+            ).fetchone()
+            tokeny, cas = radek if radek else (kapacita, ted)
+            tokeny = _doplnit(tokeny, cas, kapacita, za_sekundu, ted)
+
+            cekani = 0.0
+            if tokeny < 1:
+                cekani = (1 - tokeny) / za_sekundu
+            else:
+                tokeny -= 1
+
+            conn.execute(
+                "INSERT OR REPLACE INTO RATE_LIMIT (klic, tokeny, cas, plny_v) VALUES (?, ?, ?, ?)",
+                (klic, tokeny, ted, ted + (kapacita - tokeny) / za_sekundu)
+            )
+            conn.execute("COMMIT")
+            return cekani
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def reset(self, klic: str) -> None:
+        self._spojeni().execute("DELETE FROM RATE_LIMIT WHERE klic = ?", (klic,))
+
+
+class LoginThrottle:
+    """
+    Omezení pokusů o přihlášení podle IP adresy a podle loginu.
+    Kontroluje se před jakýmkoliv dotazem do databáze a před ověřením hesla,
+    takže odmítnutý pokus nestojí žádný bcrypt výpočet.
+    """
+
+    def __init__(self, backend: RateLimitBackend):
+        self.backend = backend
+
+    def check(self, ip: str, login: str) -> float:
+        """
+        Započítá pokus o přihlášení.
+        Vrátí 0, pokud je pokus povolen, jinak počet sekund, po které je třeba počkat.
+        """
+        cekani_ip = self.backend.consume(
+            f"ip:{ip}",
+            settings.LOGIN_IP_KAPACITA,
+            settings.LOGIN_IP_ZA_MINUTU / 60
+        )
+        if cekani_ip:
+            return cekani_ip
+
+        return self.backend.consume(
+            f"login:{login.strip().lower()}",
+            settings.LOGIN_UZIVATEL_KAPACITA,
+            settings.LOGIN_UZIVATEL_ZA_MINUTU / 60
+        )
+
+    def success(self, login: str) -> None:
+        """Po úspěšném přihlášení vynuluje limit pro daný login."""
+        self.backend.reset(f"login:{login.strip().lower()}")
+
+
+def _vytvorit_backend() -> RateLimitBackend:
+    if settings.LOGIN_LIMIT_BACKEND == "sqlite":
+        return SQLiteBackend(settings.LOGIN_LIMIT_DB_PATH)
+    return MemoryBackend()
+
+
+login_throttle = LoginThrottle(_vytvorit_backend())
@@ -0,0 +1,34 @@
+import logging
+import threading
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodickaUloha:
+    """
+    Úloha spouštěná v pravidelném intervalu na pozadí (vlastní daemon vlákno).
+    Výjimka v jednom běhu se zaloguje a další běh proběhne normálně.
+    """
+
+    def __init__(self, nazev: str, interval: float, funkce: Callable[[], None]):
+        self.nazev = nazev
+        self.interval = interval
+        self.funkce = funkce
+        self._stop = threading.Event()
+        self._vlakno = threading.Thread(target=self._smycka, name=nazev, daemon=True)
+
+    def start(self) -> "PeriodickaUloha":
+        self._vlakno.start()
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._vlakno.join(timeout)
+
+    def _smycka(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.funkce()
+            except Exception:
+                logger.exception("Periodická úloha '%s' selhala", self.nazev)
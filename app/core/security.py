@@ -1,8 +1,17 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Callable, List, Optional
 from jose import jwt
+from starlette.responses import Response
 import bcrypt
+import hashlib
+import math
+import multiprocessing
+import os
+import secrets
+import threading
 from app.core.config import settings
+from app.core.souteze import aktualni_soutez
 
 def verify_password(plain_password, hashed_password):
     return bcrypt.checkpw(
@@ -16,6 +25,63 @@ def get_password_hash(password):
     hash = bcrypt.hashpw(pwd_bytes, salt)
     return hash.decode('utf-8')
 
+# Procesy pro hromadné hashování hesel, vytvoří se až při prvním použití
+_pool_hesel: Optional[ProcessPoolExecutor] = None
+_pool_hesel_lock = threading.Lock()
+
+def _pocet_procesu() -> int:
+    return settings.HESLA_PROCESY or os.cpu_count() or 1
+
+def _get_pool_hesel() -> ProcessPoolExecutor:
+    global _pool_hesel
+    with _pool_hesel_lock:
+        if _pool_hesel is None:
+            # 'spawn': aplikace běží ve více vláknech, fork by zdědil zamčené zámky
+            _pool_hesel = ProcessPoolExecutor(
+                max_workers=_pocet_procesu(),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool_hesel
+
+def _hashovat_davku(hesla: List[str]) -> List[str]:
+    return [get_password_hash(heslo) for heslo in hesla]
+
+def get_password_hashes(hesla: List[str], prubeh: Optional[Callable[[int], None]] = None) -> List[str]:
+    """
+    Zahashuje více hesel najednou v procesech na všech jádrech (HESLA_PROCESY).
+    bcrypt je záměrně pomalý, ve vláknech jednoho procesu by se hesla
+    hashovala po jednom. Hesla se posílají po malých dávkách, aby šel
+    hlásit průběh: 'prubeh' dostane počet hotových hesel po každé dávce.
+    Vrací hashe ve stejném pořadí jako hesla.
+    """
+    if not hesla:
+        return []
+    velikost = max(1, min(16, math.ceil(len(hesla) / (_pocet_procesu() * 4))))
+    pool = _get_pool_hesel()
+    davky = {
+        pool.submit(_hashovat_davku, hesla[zacatek:zacatek + velikost]): zacatek
+        for zacatek in range(0, len(hesla), velikost)
+    }
+
+    hashe: List[Optional[str]] = [None] * len(hesla)
+    hotovo = 0
+    for davka in as_completed(davky):
+        zacatek = davky[davka]
+        vysledek = davka.result()
+        hashe[zacatek:zacatek + len(vysledek)] = vysledek
+        hotovo += len(vysledek)
+        if prubeh:
+            prubeh(hotovo)
+    return hashe
+
+def ukoncit_hashovani() -> None:
+    """Ukončí procesy pro hashování hesel (při vypnutí aplikace)."""
+    global _pool_hesel
+    with _pool_hesel_lock:
+        if _pool_hesel is not None:
+            _pool_hesel.shutdown(wait=False, cancel_futures=True)
+            _pool_hesel = None
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     
@@ -25,6 +91,33 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = now_utc + expires_delta
     else:
         expire = now_utc + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # Token platí jen v soutěži, kde vznikl (každá má vlastní uživatele)
+    to_encode.update({"exp": expire, "soutez": aktualni_soutez()})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
+
+def create_refresh_token() -> str:
+    return secrets.token_urlsafe(32)
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+def set_auth_cookies(response: Response, access_token: str, refresh_token: Optional[str] = None) -> None:
+    """
+    Nastaví HttpOnly cookies s access tokenem a případně i s novým refresh tokenem.
+    """
+    response.set_cookie(
+        key="access_token",
+        value=f"Bearer {access_token}",
+        httponly=True,
+        samesite="lax",
+        max_age=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    )
+    if refresh_token:
+        response.set_cookie(
+            key="refresh_token",
+            value=refresh_token,
+            httponly=True,
+            samesite="lax",
+            max_age=settings.REFRESH_TOKEN_EXPIRE_HOURS * 3600
+        )
\ No newline at end of file
@@ -0,0 +1,117 @@
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+
+# Výchozí soutěž používá původní soubory (settings.db_path, ARCHIV_DB_PATH),
+# takže instalace s jedinou soutěží funguje beze změny
+VYCHOZI = "vychozi"
+
+SOUBOR_DATABAZE = "kost.db"
+SOUBOR_ARCHIVU = "archiv.db"
+
+# Název soutěže je zároveň subdoména a jméno adresáře, proto jen bezpečné znaky
+_PLATNY_NAZEV = re.compile(r"^[a-z0-9][a-z0-9-]{0,39}$")
+
+_aktualni: ContextVar[str] = ContextVar("soutez", default=VYCHOZI)
+
+
+class NeznamaSoutez(Exception):
+    """Soutěž s tímto názvem neexistuje (nemá založenou databázi)."""
+
+
+def aktualni_soutez() -> str:
+    """Název soutěže, jejíž požadavek (nebo úloha) právě běží."""
+    return _aktualni.get()
+
+@contextmanager
+def soutez_kontext(nazev: str) -> Iterator[None]:
+    """Spustí blok v kontextu dané soutěže (skripty, úlohy na pozadí)."""
+    token = _aktualni.set(nazev)
+    try:
+        yield
+    finally:
+        _aktualni.reset(token)
+
+def platny_nazev(nazev: str) -> bool:
+    return nazev == VYCHOZI or bool(_PLATNY_NAZEV.match(nazev))
+
+def cesta_databaze(nazev: Optional[str] = None) -> Path:
+    nazev = nazev or aktualni_soutez()
+    if nazev == VYCHOZI:
+        return Path(settings.db_path)
+    if not platny_nazev(nazev):
+        raise NeznamaSoutez(nazev)
+    return Path(settings.SOUTEZE_DIR) / nazev / SOUBOR_DATABAZE
+
+def cesta_archivu(nazev: Optional[str] = None) -> Path:
+    nazev = nazev or aktualni_soutez()
+    if nazev == VYCHOZI:
+        return Path(settings.ARCHIV_DB_PATH)
+    if not platny_nazev(nazev):
+        raise NeznamaSoutez(nazev)
+    return Path(settings.SOUTEZE_DIR) / nazev / SOUBOR_ARCHIVU
+
+def existuje(nazev: str) -> bool:
+    return platny_nazev(nazev) and (nazev == VYCHOZI or cesta_databaze(nazev).exists())
+
+def seznam_soutezi() -> List[str]:
+    """Výchozí soutěž a všechny soutěže se založenou databází v SOUTEZE_DIR."""
+    adresar = Path(settings.SOUTEZE_DIR)
+    dalsi = sorted(
+        cesta.parent.name
+        for cesta in adresar.glob(f"*/{SOUBOR_DATABAZE}")
+        if platny_nazev(cesta.parent.name)
+    ) if adresar.is_dir() else []
+    return [VYCHOZI, *dalsi]
+
+def soutez_z_hostu(host: str) -> str:
+    """
+    Určí soutěž podle hlavičky Host: 'vinobrani.kost.cz' je při
+    SOUTEZ_DOMENA='kost.cz' soutěž 'vinobrani'. Samotná doména a ostatní
+    hosty patří výchozí soutěži. Neexistující soutěž -> NeznamaSoutez.
+    """
+    domena = settings.SOUTEZ_DOMENA.lower().strip(".")
+    host = host.lower().split(":", 1)[0]
+    if not domena or not host.endswith("." + domena):
+        return VYCHOZI
+
+    nazev = host[: -len(domena) - 1]
+    if nazev == "www":
+        return VYCHOZI
+    if not existuje(nazev):
+        raise NeznamaSoutez(nazev)
+    return nazev
+
+
+class VyberSouteze:
+    """
+    ASGI middleware, které podle hostu nastaví soutěž požadavku. Všechno,
+    co během požadavku sahá do databáze nebo do cache (SessionLocal, Cache,
+    indexy našeptávače), pak pracuje s daty této soutěže.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        hlavicky = dict(scope.get("headers") or [])
+        try:
+            nazev = soutez_z_hostu(hlavicky.get(b"host", b"").decode("latin-1"))
+        except NeznamaSoutez:
+            if scope["type"] == "http":
+                await PlainTextResponse("Soutěž neexistuje.", status_code=404)(scope, receive, send)
+            return
+
+        with soutez_kontext(nazev):
+            await self.app(scope, receive, send)
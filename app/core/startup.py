@@ -0,0 +1,118 @@
+import logging
+import time
+from pathlib import Path
+from typing import Dict
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+from sqlalchemy import text
+from starlette.templating import Jinja2Templates
+
+from app.core.assets import asset_url
+from app.core.config import settings
+from app.core.obrazky import obrazek_url
+from app.core.database import engine, SessionLocal, zkontrolovat_verzi_dat
+from app.models.db import Vino
+from app.repositories.odrudy import get_indexy
+from app.repositories.hodnoceni import prepocitat_oznacene
+from app.repositories.poradi import zajistit_poradi
+from app.repositories.rocniky import get_rocniky_menu, get_nejnovejsi_rocnik
+from app.repositories.users import get_profil_vinare
+
+logger = logging.getLogger(__name__)
+
+ADRESAR_SABLON = "app/templates"
+
+
+def vytvorit_sablony() -> Jinja2Templates:
+    """
+    Vytvoří Jinja2 prostředí pro šablony.
+
+    V produkčním režimu (debug=False) se vypne kontrola změn souborů
+    při každém vykreslení a zkompilované šablony se ukládají do
+    perzistentní bytecode cache, takže se po restartu už neparsují.
+    """
+    bytecode_cache = None
+    if not settings.debug:
+        adresar = Path(settings.JINJA_CACHE_DIR)
+        adresar.mkdir(parents=True, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(str(adresar))
+
+    prostredi = Environment(
+        loader=FileSystemLoader(ADRESAR_SABLON),
+        autoescape=True,
+        auto_reload=settings.debug,
+        bytecode_cache=bytecode_cache,
+        cache_size=-1
+    )
+    prostredi.globals["asset_url"] = asset_url
+    prostredi.globals["obrazek_url"] = obrazek_url
+    return Jinja2Templates(env=prostredi)
+
+def predkompilovat_sablony(templates: Jinja2Templates) -> int:
+    """Načte (a tím zkompiluje) všechny šablony. Vrací jejich počet."""
+    nazvy = templates.env.list_templates(extensions=["html"])
+    for nazev in nazvy:
+        templates.env.get_template(nazev)
+    return len(nazvy)
+
+def predotevrit_spojeni() -> int:
+    """
+    Otevře předem spojení do poolu, aby první požadavky nečekaly
+    na otevření souboru a připojení archivu.
+    """
+    pocet = min(settings.DB_POOL_PREOPEN, engine.pool.size())
+    spojeni = [engine.connect() for _ in range(pocet)]
+    try:
+        for conn in spojeni:
+            conn.execute(text("SELECT 1"))
+    finally:
+        for conn in spojeni:
+            conn.close()
+    return pocet
+
+def zahrat_cache() -> None:
+    """
+    Naplní cache daty, která potřebuje skoro každá stránka: menu ročníků,
+    pořadí v aktuálním ročníku, profily vinařů, kteří v něm soutěží,
+    a indexy našeptávače. Nejdřív dožene přepočty pořadí, které zůstaly
+    označené po předchozím běhu (odložený přepočet nestihl doběhnout).
+    """
+    zkontrolovat_verzi_dat()
+    prepocitat_oznacene()
+    db = SessionLocal()
+    try:
+        get_rocniky_menu(db)
+        rocnik = get_nejnovejsi_rocnik(db)
+        if rocnik:
+            zajistit_poradi(db, rocnik.id)
+            vinari = db.query(Vino.vinar_id).filter(Vino.rocnik_id == rocnik.id).distinct()
+            for (vinar_id,) in vinari.all():
+                get_profil_vinare(db, vinar_id)
+    finally:
+        db.close()
+
+    for index in get_indexy().values():
+        index.naseptat("a")
+
+def zahrati(templates: Jinja2Templates) -> Dict[str, float]:
+    """
+    Provede zahřátí aplikace po startu a vrátí dobu jednotlivých kroků
+    v sekundách. Šablony se předkompilují jen v produkčním režimu,
+    v režimu debug by je stejně hned přepsal auto_reload.
+    """
+    casy: Dict[str, float] = {}
+    kroky = [
+        ("spojeni", predotevrit_spojeni),
+        ("cache", zahrat_cache),
+    ]
+    if not settings.debug:
+        kroky.insert(0, ("sablony", lambda: predkompilovat_sablony(templates)))
+
+    zacatek = time.monotonic()
+    for nazev, krok in kroky:
+        zacatek_kroku = time.monotonic()
+        krok()
+        casy[nazev] = round(time.monotonic() - zacatek_kroku, 3)
+    casy["celkem"] = round(time.monotonic() - zacatek, 3)
+
+    logger.info("Zahřátí aplikace dokončeno: %s", casy)
+    return casy
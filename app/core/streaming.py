@@ -0,0 +1,120 @@
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import anyio
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
+from starlette.templating import Jinja2Templates
+from starlette.types import Send
+
+logger = logging.getLogger(__name__)
+
+# Kolik znaků se nejvýš pošle v jednom kusu odpovědi
+VELIKOST_KUSU = 16 * 1024
+# Kolik kusů HTML smí vykreslování předběhnout odesílání
+MAX_FRONTA = 16
+# Jak dlouho nejvýš se drobné kousky HTML sbírají, než se odešlou (s)
+PRODLEVA = 0.02
+
+
+class StreamingTemplateResponse(StreamingResponse):
+    """
+    HTML odpověď, která se posílá průběžně už během vykreslování šablony.
+
+    Šablona se vykresluje pomocí Jinja 'generate()' ve vlákně výchozího
+    threadpoolu (anyio.to_thread, stejně jako synchronní endpointy, takže
+    požadavek drží nejvýš jedno vlákno) a kousky HTML se do smyčky událostí
+    předávají paměťovým streamem anyio, posbírané po nejvýš PRODLEVA
+    sekundách nebo VELIKOST_KUSU znacích. Když generátor čeká na
+    databázi, klient už má hlavičku a navigaci, tabulka pak přitéká po
+    řádcích. Plný stream vykreslování zbrzdí, odpojený klient ho zastaví.
+
+    Data pro tabulku mají v kontextu být generátory s vlastní session
+    (viz 'iterovat_v_session'), protože session požadavku se zavře dřív,
+    než se odpověď dopíše.
+    """
+
+    def __init__(
+        self,
+        templates: Jinja2Templates,
+        name: str,
+        context: Dict[str, Any],
+        status_code: int = 200,
+        headers: Optional[Dict[str, str]] = None,
+        background: Optional[BackgroundTask] = None
+    ):
+        self.template = templates.get_template(name)
+        self.context = context
+        # Obsah dodá až 'stream_response', tam vzniká stream i vykreslování
+        super().__init__(
+            (),
+            status_code=status_code,
+            headers=headers,
+            media_type="text/html",
+            background=background
+        )
+
+    async def stream_response(self, send: Send) -> None:
+        odesilac, prijimac = anyio.create_memory_object_stream(MAX_FRONTA)
+        async with anyio.create_task_group() as skupina:
+            skupina.start_soon(self._vykreslit, odesilac)
+            # Zavření příjemce (i při odpojení klienta) ukončí vykreslování
+            async with prijimac:
+                self.body_iterator = self._kusy(prijimac)
+                await super().stream_response(send)
+
+    async def _vykreslit(self, odesilac: MemoryObjectSendStream) -> None:
+        # Třídu zrušení zná jen smyčka událostí, vlákno ji dostane předem
+        odesel = (anyio.BrokenResourceError, anyio.ClosedResourceError, anyio.get_cancelled_exc_class())
+        async with odesilac:
+            await anyio.to_thread.run_sync(self._generovat, odesilac, odesel)
+
+    def _generovat(self, odesilac: MemoryObjectSendStream, odesel: Tuple[type, ...]) -> None:
+        """Běží ve vlákně, kousky i případnou chybu posílá do smyčky událostí."""
+        kusy = []
+        delka = 0
+        odeslano = time.monotonic()
+        try:
+            for kus in self.template.generate(self.context):
+                kusy.append(kus)
+                delka += len(kus)
+                # Každé předání do smyčky stojí její obrátku, drobné kousky
+                # se proto sbírají, dokud jich není dost nebo neuplyne PRODLEVA
+                if delka >= VELIKOST_KUSU or time.monotonic() - odeslano >= PRODLEVA:
+                    anyio.from_thread.run(odesilac.send, "".join(kusy))
+                    kusy, delka, odeslano = [], 0, time.monotonic()
+            if kusy:
+                anyio.from_thread.run(odesilac.send, "".join(kusy))
+        except odesel:
+            return  # klient odešel, zbytek stránky se nevykresluje
+        except Exception as chyba:
+            try:
+                if kusy:
+                    anyio.from_thread.run(odesilac.send, "".join(kusy))
+                anyio.from_thread.run(odesilac.send, chyba)
+            except odesel:
+                pass
+
+    async def _kusy(self, prijimac: MemoryObjectReceiveStream) -> AsyncIterator[str]:
+        async for kus in prijimac:
+            kusy = [kus]
+            delka = len(kus) if isinstance(kus, str) else 0
+            while delka < VELIKOST_KUSU:
+                try:
+                    kus = prijimac.receive_nowait()
+                except (anyio.WouldBlock, anyio.EndOfStream):
+                    break
+                kusy.append(kus)
+                if isinstance(kus, str):
+                    delka += len(kus)
+
+            text = []
+            for kus in kusy:
+                if isinstance(kus, Exception):
+                    logger.error("Chyba při vykreslování šablony %s", self.template.name, exc_info=kus)
+                    raise kus
+                text.append(kus)
+            if text:
+                yield "".join(text)
@@ -0,0 +1,246 @@
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from sqlalchemy import select, func
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.core.database import SessionLocal, zmena
+from app.core.kapacita import necinnost
+from app.core.souteze import aktualni_soutez, cesta_archivu, cesta_databaze, seznam_soutezi, soutez_kontext
+from app.core.prenos import oznamit_zmenu_poradi
+from app.repositories.hodnoceni import prepocitat_oznacene, procistit_zapisy_hodnoceni
+from app.repositories.zmeny import get_pozice, potvrdit_pozici, procistit_zmeny
+
+logger = logging.getLogger(__name__)
+
+# Údržba čte seznam změn jako každý jiný odběratel (app.repositories.zmeny),
+# počet změn od její pozice říká, jestli od minula proběhla hromadná změna
+ODBERATEL = "udrzba"
+
+# Hodnoty 'PRAGMA auto_vacuum'
+AUTO_VACUUM = {0: "none", 1: "full", 2: "incremental"}
+INKREMENTALNI = 2
+
+# Stav posledních běhů podle soutěže (jen v paměti procesu)
+_stav: Dict[str, dict] = {}
+_stav_lock = threading.Lock()
+
+
+def _soubory() -> Dict[str, Path]:
+    """Soubory aktuální soutěže, o které se údržba stará."""
+    return {"databaze": cesta_databaze(), "archiv": cesta_archivu()}
+
+def _spojeni(cesta: Path) -> sqlite3.Connection:
+    """
+    Samostatné spojení mimo engine aplikace: údržba nic nemění na datech,
+    takže nemá zvyšovat verzi dat a vyprazdňovat cache workerů.
+    """
+    return sqlite3.connect(cesta, isolation_level=None, timeout=settings.UDRZBA_BUSY_TIMEOUT)
+
+def _pragma(conn: sqlite3.Connection, nazev: str) -> int:
+    return conn.execute(f"PRAGMA {nazev}").fetchone()[0]
+
+def zapnout_inkrementalni_vacuum(cesta: Path) -> bool:
+    """
+    Přepne soubor na 'auto_vacuum=INCREMENTAL'. U existující databáze se
+    změna projeví až po úplném VACUUM, proto se volá jen z 'scripts/init_db.py'
+    (aplikace by při tom neměla běžet). Vrací, zda se soubor přepínal.
+    """
+    conn = sqlite3.connect(cesta, isolation_level=None)
+    try:
+        if _pragma(conn, "auto_vacuum") == INKREMENTALNI:
+            return False
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        return True
+    finally:
+        conn.close()
+
+def _statistiky_souboru(cesta: Path) -> dict:
+    conn = sqlite3.connect(f"{cesta.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        velikost_stranky = _pragma(conn, "page_size")
+        stranek = _pragma(conn, "page_count")
+        volnych = _pragma(conn, "freelist_count")
+        try:
+            tabulky = [
+                {"nazev": r[0], "stranek": r[1], "bajtu": r[2], "nevyuzito": r[3]}
+                for r in conn.execute(
+                    "SELECT name, pageno, pgsize, unused FROM dbstat WHERE aggregate = TRUE ORDER BY pgsize DESC"
+                )
+            ]
+        except sqlite3.OperationalError:
+            tabulky = None  # SQLite bez virtuální tabulky dbstat
+        auto_vacuum = _pragma(conn, "auto_vacuum")
+    finally:
+        conn.close()
+
+    vysledek = {
+        "velikost": cesta.stat().st_size,
+        "velikost_stranky": velikost_stranky,
+        "stranek": stranek,
+        "volnych_stranek": volnych,
+        "volne_procent": round(100 * volnych / stranek, 1) if stranek else 0.0,
+        "auto_vacuum": AUTO_VACUUM.get(auto_vacuum, str(auto_vacuum)),
+        "tabulky": tabulky,
+        "nevyuzito_procent": None,
+    }
+    if tabulky:
+        bajtu = sum(t["bajtu"] for t in tabulky)
+        vysledek["nevyuzito_procent"] = round(100 * sum(t["nevyuzito"] for t in tabulky) / bajtu, 1) if bajtu else 0.0
+    return vysledek
+
+def statistiky_databaze() -> Dict[str, dict]:
+    """
+    Velikost a fragmentace souborů aktuální soutěže: volné stránky (ty vrátí
+    incremental_vacuum) a nevyužité místo uvnitř stránek tabulek a indexů
+    (to vrátí jen úplný VACUUM). Čte celý soubor, je určené pro stránku údržby.
+    """
+    return {nazev: _statistiky_souboru(cesta) for nazev, cesta in _soubory().items() if cesta.exists()}
+
+def _nove_zmeny() -> Tuple[int, Optional[int]]:
+    """Počet změn od poslední údržby a nejvyšší verze mezi nimi."""
+    db = SessionLocal()
+    try:
+        pozice = get_pozice(db, ODBERATEL)
+        return tuple(db.execute(
+            select(func.count(), func.max(zmena.c.verze)).where(zmena.c.verze > pozice)
+        ).one())
+    finally:
+        db.close()
+
+def _potvrdit_zmeny(verze: Optional[int]) -> int:
+    """
+    Posune pozici údržby za zpracované změny a smaže ze seznamu změn ty,
+    které už zpracovali všichni odběratelé. Vrací počet smazaných změn.
+    """
+    db = SessionLocal()
+    try:
+        if verze:
+            potvrdit_pozici(db, ODBERATEL, verze)
+        pocet = procistit_zmeny(db)
+        db.commit()
+        return pocet
+    finally:
+        db.close()
+
+def _procistit_zapisy() -> int:
+    """Smaže staré záznamy přijatých změn hodnocení (viz 'procistit_zapisy_hodnoceni')."""
+    db = SessionLocal()
+    try:
+        pocet = procistit_zapisy_hodnoceni(db)
+        db.commit()
+        return pocet
+    finally:
+        db.close()
+
+def _analyzovat(conn: sqlite3.Connection, uplne: bool) -> None:
+    """
+    Úplný ANALYZE po hromadné změně, jinak 'PRAGMA optimize', které statistiky
+    obnoví jen u tabulek, kde se od posledního ANALYZE výrazně změnil počet
+    řádků (0x10000 = kontrolovat všechny tabulky, nejen ty, na které se toto
+    spojení ptalo). analysis_limit drží dobu běhu krátkou i u velkých tabulek.
+    """
+    conn.execute(f"PRAGMA analysis_limit={int(settings.UDRZBA_ANALYSIS_LIMIT)}")
+    if uplne:
+        conn.execute("ANALYZE")
+    else:
+        conn.execute("PRAGMA optimize=0x10002")
+
+def _uvolnit_stranky(conn: sqlite3.Connection, vynutit: bool) -> int:
+    """
+    Vrátí volné stránky systému po krocích nejvýš UDRZBA_VACUUM_STRANEK.
+    Každý krok je krátká zápisová transakce, mezi kroky se čeká a znovu
+    ověří, že proces pořád nic neobsluhuje. Vrací počet uvolněných stránek.
+    """
+    if _pragma(conn, "auto_vacuum") != INKREMENTALNI:
+        return 0
+    puvodne = volnych = _pragma(conn, "freelist_count")
+    for _ in range(settings.UDRZBA_VACUUM_MAX_KROKU):
+        if not volnych:
+            break
+        if not vynutit and necinnost() < settings.UDRZBA_NECINNOST_SEKUND:
+            break
+        # Každý krok příkazu uvolní jednu stránku a execute() udělá u příkazu
+        # bez sloupců jen jeden krok, executescript ho nechá doběhnout celý
+        conn.executescript(f"PRAGMA incremental_vacuum({min(volnych, int(settings.UDRZBA_VACUUM_STRANEK))})")
+        volnych = _pragma(conn, "freelist_count")
+        time.sleep(settings.UDRZBA_VACUUM_PAUZA)
+    return puvodne - volnych
+
+def udrzovat(vynutit: bool = False) -> dict:
+    """
+    Jeden běh údržby aktuální soutěže (hlavní databáze i archivu).
+
+    Po UDRZBA_PRAH_ZMEN a více změnách v seznamu změn (např. smazaný ročník
+    nebo uživatel se všemi víny) se statistiky plánovače přepočítají celé,
+    jinak jen 'PRAGMA optimize'. Volné stránky se uvolňují, jen když proces
+    aspoň UDRZBA_NECINNOST_SEKUND neobsluhoval žádný požadavek. Při 'vynutit'
+    (spuštění z administrace) proběhne úplný ANALYZE a uvolnění bez čekání na klid.
+    Každý běh také smaže staré záznamy přijatých změn hodnocení (ZAPIS_HODNOCENI)
+    a změny, které už zpracovali všichni odběratelé seznamu změn, a dožene
+    přepočty pořadí, které po změně hodnocení zůstaly označené.
+    """
+    zacatek = time.monotonic()
+    zmen, verze = _nove_zmeny()
+    uplne = vynutit or zmen >= settings.UDRZBA_PRAH_ZMEN
+    vysledek = {
+        "cas": datetime.now(),
+        "zmen": zmen,
+        "analyze": uplne,
+        "uvolneno_stranek": 0,
+        "procisteno_zapisu": 0,
+        "procisteno_zmen": 0,
+        "chyba": None,
+    }
+    try:
+        # Přepočty pořadí, jejichž časovač nedoběhl (worker mezitím skončil)
+        for rocnik_id in prepocitat_oznacene():
+            oznamit_zmenu_poradi(rocnik_id)
+        vysledek["procisteno_zapisu"] = _procistit_zapisy()
+        for cesta in _soubory().values():
+            if not cesta.exists():
+                continue
+            conn = _spojeni(cesta)
+            try:
+                _analyzovat(conn, uplne)
+                vysledek["uvolneno_stranek"] += _uvolnit_stranky(conn, vynutit)
+            finally:
+                conn.close()
+        vysledek["procisteno_zmen"] = _potvrdit_zmeny(verze)
+    except (sqlite3.OperationalError, OperationalError) as e:
+        # Typicky zamčená databáze: dlouhý zápis jiného workeru, zkusí se příště
+        vysledek["chyba"] = str(e)
+        logger.warning("Údržba soutěže %s nedoběhla: %s", aktualni_soutez(), e)
+    vysledek["trvani_s"] = round(time.monotonic() - zacatek, 2)
+
+    with _stav_lock:
+        stav = _stav.setdefault(aktualni_soutez(), {})
+        stav["posledni_beh"] = vysledek
+        if uplne and not vysledek["chyba"]:
+            stav["posledni_analyze"] = vysledek["cas"]
+    return vysledek
+
+def stav_udrzby() -> dict:
+    """Poslední běh a poslední úplný ANALYZE aktuální soutěže v tomto procesu."""
+    with _stav_lock:
+        return dict(_stav.get(aktualni_soutez(), {}))
+
+def udrzovat_vse() -> None:
+    """
+    Vstupní bod pro plánovač, projde postupně všechny soutěže. Při více
+    workerech běží v každém z nich: klid se posuzuje jen podle vlastního
+    procesu, ale každý krok je krátký a pozice v seznamu změn je společná,
+    takže úplný ANALYZE po hromadné změně zpravidla proběhne jen jednou.
+    """
+    for soutez in seznam_soutezi():
+        with soutez_kontext(soutez):
+            try:
+                udrzovat()
+            except Exception:
+                logger.exception("Údržba soutěže %s selhala", soutez)
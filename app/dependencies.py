@@ -1,43 +1,82 @@
-from fastapi import Request, Depends, Cookie, status, HTTPException
+import math
+from fastapi import Request, Depends, Cookie, Form, status, HTTPException
 from sqlalchemy.orm import Session
 from typing import Optional, Dict, Any
 from jose import jwt, JWTError
 
 from app.core.config import settings
 from app.core.database import get_db
+from app.core.ratelimit import login_throttle
+from app.core.security import create_access_token
+from app.core.souteze import VYCHOZI, aktualni_soutez
 from app.repositories.users import get_user_roles, get_user_by_login
-from app.repositories.rocniky import get_vsechny_rocniky, get_aktivni_rocnik
+from app.repositories.rocniky import get_rocniky_menu, get_aktivni_rocnik_info
+from app.repositories.tokens import obnovit_refresh_token
 from app.models.db import Users
 
+def _login_z_tokenu(access_token: Optional[str]) -> Optional[str]:
+    """Vrátí login z platného access tokenu, jinak None."""
+    if not access_token:
+        return None
+    try:
+        scheme, _, param = access_token.partition(" ")
+        token_str = param if scheme.lower() == "bearer" else access_token
+        
+        payload = jwt.decode(token_str, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        if payload.get("soutez", VYCHOZI) != aktualni_soutez():
+            return None
+        return payload.get("sub")
+            
+    except (JWTError, ValueError):
+        return None
+
+def require_login_z_tokenu(access_token: Optional[str] = Cookie(None)) -> str:
+    """
+    Login přihlášeného uživatele jen z podpisu access tokenu, bez databáze
+    (bez kontroly verze dat, dotazu na uživatele i obnovy tokenu). Pro velmi
+    časté požadavky, jako je našeptávač při psaní. Bez platného access
+    tokenu vrací 401, přihlášení si tiše obnoví příští běžná stránka.
+    """
+    username = _login_z_tokenu(access_token)
+    if not username:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Nepřihlášený uživatel")
+    return username
+
 def get_current_user_data(
     request: Request,
     access_token: Optional[str] = Cookie(None),
+    refresh_token: Optional[str] = Cookie(None),
     db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Získá základní data o přihlášeném uživateli z JWT tokenu v cookies.
     Pokud je uživatel přihlášen vrací jeho login a role.
     Pokud není uživatel přihlášen vrací prázdná data.
+
+    Pokud access token vypršel, ale prohlížeč má platný refresh token,
+    přihlášení se tiše obnoví bez zadávání hesla. Nové tokeny se uloží do
+    'request.state.obnovene_tokeny' a middleware je nastaví do cookies odpovědi.
     """
     user_info = {
         "user": None,
         "roles": []
     }
     
-    if access_token:
-        try:
-            scheme, _, param = access_token.partition(" ")
-            token_str = param if scheme.lower() == "bearer" else access_token
-            
-            payload = jwt.decode(token_str, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-            username = payload.get("sub")
-            
-            if username:
-                user_info["user"] = username
-                user_info["roles"] = get_user_roles(db, username)
-                
-        except (JWTError, ValueError):
-            pass
+    username = _login_z_tokenu(access_token)
+
+    if not username and refresh_token:
+        obnoveni = obnovit_refresh_token(db, refresh_token)
+        if obnoveni:
+            user, novy_refresh_token = obnoveni
+            username = user.login
+            request.state.obnovene_tokeny = (
+                create_access_token(data={"sub": username}),
+                novy_refresh_token
+            )
+
+    if username:
+        user_info["user"] = username
+        user_info["roles"] = get_user_roles(db, username)
             
     return user_info
 
@@ -54,13 +93,16 @@ def get_template_context(
     2. Informacím o uživateli.
     3. Seznamu ročníků (pro vykreslení navigačního menu).
     4. Informaci o tom, který ročník je právě aktivní.
+
+    Ročníky i role se berou z cache, takže běžná stránka kvůli menu
+    nemusí do databáze vůbec sahat.
     """
     return {
         "request": request,
         "user": user_data["user"],
         "roles": user_data["roles"],
-        "all_rocniky": get_vsechny_rocniky(db),
-        "active_rocnik": get_aktivni_rocnik(db)
+        "all_rocniky": get_rocniky_menu(db),
+        "active_rocnik": get_aktivni_rocnik_info(db)
     }
 
 def require_admin(user_data: dict = Depends(get_current_user_data)) -> dict:
@@ -97,4 +139,40 @@ def get_current_user(
             status_code=status.HTTP_303_SEE_OTHER,
             headers={"Location": "/auth/login"}
         )
-    return user
\ No newline at end of file
+    return user
+
+def get_current_user_api(
+    user_data: dict = Depends(get_current_user_data),
+    db: Session = Depends(get_db)
+) -> Users:
+    """
+    Jako 'get_current_user', ale pro požadavky ze skriptu (fetch): bez
+    přihlášení vrací 401 místo přesměrování. Přesměrování by fetch tiše
+    následoval a přihlašovací stránku s kódem 200 považoval za úspěch.
+    """
+    username = user_data.get("user")
+    user = get_user_by_login(db, username) if username else None
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Přihlášení vypršelo.")
+    return user
+
+def check_login_throttle(
+    request: Request,
+    username: str = Form(...)
+) -> str:
+    """
+    Omezí počet pokusů o přihlášení z jedné IP adresy a na jeden login.
+    Musí být uvedena jako první závislost přihlašovacího endpointu, aby
+    odmítnutý pokus skončil dřív, než se sáhne do databáze nebo na bcrypt.
+    Při překročení limitu vrací 429 Too Many Requests s hlavičkou Retry-After.
+    """
+    ip = request.client.host if request.client else "unknown"
+    cekani = login_throttle.check(ip, username)
+
+    if cekani:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Příliš mnoho pokusů o přihlášení. Zkuste to prosím později.",
+            headers={"Retry-After": str(math.ceil(cekani))}
+        )
+    return username
\ No newline at end of file
@@ -1,8 +1,62 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
-from starlette.templating import Jinja2Templates
 
 from app.api.routers import register_routers
+from app.core.assets import nacist_manifest
+from app.core.backup import zalohovat_pokud_je_cas
+from app.core.config import settings
+from app.core.kapacita import RizeniKapacity, nastavit_threadpool
+from app.core.scheduler import PeriodickaUloha
+from app.core.security import set_auth_cookies, ukoncit_hashovani
+from app.core.souteze import VyberSouteze
+from app.core.startup import vytvorit_sablony, zahrati
+from app.core.udrzba import udrzovat_vse
+from app.repositories.hodnoceni import dokoncit_odlozene_prepocty
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Spustí úlohy na pozadí při startu aplikace a ukončí je při vypnutí.
+
+    Zahřátí (šablony, spojení, cache) běží ve vlákně, takže liveness
+    odpovídá hned. Readiness ('/health/ready') se přepne až po jeho dokončení.
+    """
+    app.state.pripraveno = False
+    app.state.casy_startu = {}
+    nastavit_threadpool()
+
+    async def zahrat():
+        try:
+            app.state.casy_startu = await asyncio.to_thread(zahrati, app.state.templates)
+        except Exception:
+            logger.exception("Zahřátí aplikace selhalo")
+            return
+        app.state.pripraveno = True
+
+    zahrivani = asyncio.create_task(zahrat())
+
+    ulohy = []
+    if settings.BACKUP_INTERVAL_MINUTES > 0:
+        ulohy.append(PeriodickaUloha(
+            "zalohovani", settings.BACKUP_INTERVAL_MINUTES * 60, zalohovat_pokud_je_cas
+        ).start())
+    if settings.UDRZBA_INTERVAL_MINUTES > 0:
+        ulohy.append(PeriodickaUloha(
+            "udrzba", settings.UDRZBA_INTERVAL_MINUTES * 60, udrzovat_vse
+        ).start())
+
+    yield
+
+    zahrivani.cancel()
+    for uloha in ulohy:
+        uloha.stop()
+    await asyncio.to_thread(dokoncit_odlozene_prepocty)
+    ukoncit_hashovani()
 
 def create_app() -> FastAPI:
     """
@@ -10,20 +64,39 @@ def create_app() -> FastAPI:
 
     Postup inicializace:
     1. Vytvoření instance FastAPI s metadaty (titulek).
-    2. Připojení statických souborů (CSS, obrázky) na cestu `/static`.
-    3. Inicializace Jinja2 šablon a jejich uložení do `app.state`.
+    2. Sestavení assetů s otiskem obsahu (servíruje `/assets`) a připojení
+       původních statických souborů na cestu `/static`.
+    3. Inicializace Jinja2 šablon (v produkci bez auto_reload a s bytecode cache)
+       a jejich uložení do `app.state`.
     4. Registrace všech routerů (URL endpointů) z modulu `api`.
+    5. Middleware, který do odpovědi zapíše tiše obnovené přihlašovací tokeny.
+    6. Řízení kapacity: oddělené limity pro admin, auth a veřejný provoz,
+       při dlouhém čekání odpověď 503 s Retry-After.
+    7. Výběr soutěže podle hostu: každá soutěž má vlastní databázi.
 
     Returns:
         FastAPI: Plně nakonfigurovaná instance aplikace připravená ke spuštění.
     """
     
-    app = FastAPI(title="Kost vin")
+    app = FastAPI(title="Kost vin", lifespan=lifespan)
     
+    nacist_manifest()
     app.mount("/static", StaticFiles(directory="app/static"), name="static")
-    app.state.templates = Jinja2Templates(directory="app/templates")
+    app.state.templates = vytvorit_sablony()
     
     register_routers(app)
+
+    @app.middleware("http")
+    async def nastavit_obnovene_tokeny(request: Request, call_next):
+        response = await call_next(request)
+        obnovene_tokeny = getattr(request.state, "obnovene_tokeny", None)
+        if obnovene_tokeny:
+            set_auth_cookies(response, *obnovene_tokeny)
+        return response
+
+    app.add_middleware(RizeniKapacity)
+    app.add_middleware(VyberSouteze)
+
     return app
 
 app = create_app()
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, Text
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, Text, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
@@ -20,26 +20,34 @@ class Users(Base):
     telefon = Column(String(20))
     email = Column(String(100), unique=True, nullable=False)
     
-    role = relationship("Role", secondary="USERROLE", back_populates="users")
-    vina = relationship("Vino", back_populates="vinar", cascade="all, delete-orphan")
-    hodnoceni = relationship("Hodnoceni", back_populates="hodnotitel", cascade="all, delete-orphan")
+    # Závislé řádky maže databáze (ON DELETE CASCADE), ORM je kvůli smazání nenačítá
+    role = relationship("Role", secondary="USERROLE", back_populates="users", passive_deletes=True)
+    vina = relationship("Vino", back_populates="vinar", cascade="all, delete-orphan", passive_deletes=True)
+    hodnoceni = relationship("Hodnoceni", back_populates="hodnotitel", cascade="all, delete-orphan", passive_deletes=True)
+    refresh_tokeny = relationship("RefreshToken", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    lety = relationship("LetHodnotitel", back_populates="hodnotitel", cascade="all, delete-orphan", passive_deletes=True)
 
 class UserRole(Base):
     __tablename__ = "USERROLE"
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("USERS.id"), nullable=False)
-    role_id = Column(Integer, ForeignKey("ROLE.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("USERS.id", ondelete="CASCADE"), nullable=False, index=True)
+    role_id = Column(Integer, ForeignKey("ROLE.id", ondelete="CASCADE"), nullable=False)
 
 class Rocnik(Base):
     __tablename__ = "ROCNIK"
     id = Column(Integer, primary_key=True, index=True)
     rok = Column(Integer, unique=True, nullable=False)
     is_active = Column(Boolean, default=False)
+    # Vína a hodnocení archivovaného ročníku leží v souboru archivu (app.core.archiv)
+    is_archived = Column(Boolean, default=False, server_default="0", nullable=False)
     
-    vina = relationship("Vino", back_populates="rocnik", cascade="all, delete-orphan")
+    vina = relationship("Vino", back_populates="rocnik", cascade="all, delete-orphan", passive_deletes=True)
+    lety = relationship("DegustacniLet", back_populates="rocnik", cascade="all, delete-orphan", passive_deletes=True)
 
 class Vino(Base):
     __tablename__ = "VINO"
+    # AUTOINCREMENT: ID vín přesunutých do archivu se nesmí znovu použít
+    __table_args__ = {"sqlite_autoincrement": True}
     id = Column(Integer, primary_key=True, index=True)
     nazev = Column(String(100), nullable=False)
     barva = Column(String(20))
@@ -47,22 +55,156 @@ class Vino(Base):
     privlastek = Column(String(50))
     sladkost = Column(String(20))
     rok_sklizne = Column(Integer)
+    # Otisk (SHA-256) obrázku etikety v úložišti app.core.obrazky
+    etiketa = Column(String(64))
     
-    vinar_id = Column(Integer, ForeignKey("USERS.id"), nullable=False)
-    rocnik_id = Column(Integer, ForeignKey("ROCNIK.id"), nullable=False)
+    # Indexy na cizích klíčích: kaskádové mazání podle nich hledá závislé řádky
+    vinar_id = Column(Integer, ForeignKey("USERS.id", ondelete="CASCADE"), nullable=False, index=True)
+    rocnik_id = Column(Integer, ForeignKey("ROCNIK.id", ondelete="CASCADE"), nullable=False, index=True)
     
     vinar = relationship("Users", back_populates="vina")
     rocnik = relationship("Rocnik", back_populates="vina")
-    hodnoceni = relationship("Hodnoceni", back_populates="vino", cascade="all, delete-orphan")
+    hodnoceni = relationship("Hodnoceni", back_populates="vino", cascade="all, delete-orphan", passive_deletes=True)
+    umisteni = relationship("Umisteni", back_populates="vino", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
+    zarazeni_do_letu = relationship("LetVino", back_populates="vino", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
 
 class Hodnoceni(Base):
     __tablename__ = "HODNOCENI"
+    __table_args__ = {"sqlite_autoincrement": True}
     id = Column(Integer, primary_key=True, index=True)
     body = Column(Integer)
     poznamka = Column(Text)
+    # Kdy hodnotitel hodnocení naposledy změnil (UTC), pro last-writer-wins při synchronizaci
+    zmeneno = Column(DateTime)
     
-    vino_id = Column(Integer, ForeignKey("VINO.id"), nullable=False)
-    hodnotitel_id = Column(Integer, ForeignKey("USERS.id"), nullable=False)
+    vino_id = Column(Integer, ForeignKey("VINO.id", ondelete="CASCADE"), nullable=False, index=True)
+    hodnotitel_id = Column(Integer, ForeignKey("USERS.id", ondelete="CASCADE"), nullable=False, index=True)
     
     vino = relationship("Vino", back_populates="hodnoceni")
-    hodnotitel = relationship("Users", back_populates="hodnoceni")
\ No newline at end of file
+    hodnotitel = relationship("Users", back_populates="hodnoceni")
+
+class ZapisHodnoceni(Base):
+    """
+    Změna hodnocení přijatá offline synchronizací (app.repositories.hodnoceni).
+    Klíč idempotence pozná opakovaně odeslanou změnu a čas změny zůstává
+    i po smazání hodnocení, takže starší změna ho neobnoví.
+    Bez cizích klíčů: záznam má přežít smazání vína i hodnotitele.
+    """
+    __tablename__ = "ZAPIS_HODNOCENI"
+    __table_args__ = (Index("ix_zapis_hodnoceni_vino", "hodnotitel_id", "vino_id"),)
+    hodnotitel_id = Column(Integer, primary_key=True)
+    klic = Column(String(64), primary_key=True)
+    vino_id = Column(Integer, nullable=False)
+    cas = Column(DateTime, nullable=False)
+    prijato = Column(DateTime, nullable=False, index=True)
+
+class VerzePoradi(Base):
+    """
+    Počítadlo přepočtů pořadí ročníku (app.repositories.poradi). Živý přenos
+    podle něj pozná, že je stránka diváka starší než poslední změna pořadí;
+    verze dat se mění i při zápisech, které s pořadím nesouvisí.
+    """
+    __tablename__ = "VERZE_PORADI"
+    rocnik_id = Column(Integer, primary_key=True)
+    verze = Column(Integer, nullable=False, default=0)
+
+class PrepocetPoradi(Base):
+    """
+    Barva ročníku, jejíž pořadí se po změně hodnocení ještě nepřepočítalo
+    (odložený přepočet, app.repositories.hodnoceni). Značka vzniká ve stejné
+    transakci jako hodnocení a maže se ve stejné transakci jako přepočet.
+    """
+    __tablename__ = "PREPOCET_PORADI"
+    rocnik_id = Column(Integer, primary_key=True)
+    barva = Column(String(20), primary_key=True)  # "" = víno bez barvy
+
+class UlohaImportu(Base):
+    """
+    Stav importu uživatelů běžícího na pozadí (app.repositories.import_uzivatelu).
+    Drží se v databázi, aby průběh ukázal kterýkoli worker, nejen ten, ve kterém
+    import běží. Zapisuje se mimo ORM a nemění verzi dat.
+    """
+    __tablename__ = "ULOHA_IMPORTU"
+    id = Column(String(32), primary_key=True)
+    stav = Column(String(20), nullable=False)
+    celkem = Column(Integer, nullable=False)
+    zahashovano = Column(Integer, nullable=False, default=0)
+    vlozeno = Column(Integer, nullable=False, default=0)
+    chyby = Column(Text, nullable=False)  # JSON: seznam ChybaRadku
+    zprava = Column(Text)
+    zacatek = Column(DateTime, nullable=False)
+    konec = Column(DateTime, index=True)
+
+class Umisteni(Base):
+    """
+    Vypočítané oficiální umístění vína v ročníku.
+    Tabulku plní app.repositories.poradi, ručně se do ní nezapisuje.
+    """
+    __tablename__ = "UMISTENI"
+    vino_id = Column(Integer, ForeignKey("VINO.id", ondelete="CASCADE"), primary_key=True)
+    rocnik_id = Column(Integer, ForeignKey("ROCNIK.id", ondelete="CASCADE"), nullable=False, index=True)
+    barva = Column(String(20))
+    privlastek = Column(String(50))
+    prumer_body = Column(Float)
+    pocet_hodnoceni = Column(Integer, nullable=False, default=0)
+    rozptyl = Column(Integer)
+    medaile = Column(String(20))
+    poradi_barva = Column(Integer)
+    poradi_privlastek = Column(Integer)
+
+    vino = relationship("Vino", back_populates="umisteni")
+
+
+class DegustacniLet(Base):
+    """
+    Degustační let: vína jedné kategorie (barva, sladkost, přívlastek),
+    která hodnotí společně jeden panel hodnotitelů.
+    Lety plánuje app.repositories.degustace.
+    """
+    __tablename__ = "DEGUSTACNI_LET"
+    id = Column(Integer, primary_key=True)
+    rocnik_id = Column(Integer, ForeignKey("ROCNIK.id", ondelete="CASCADE"), nullable=False, index=True)
+    poradi = Column(Integer, nullable=False)
+    barva = Column(String(20))
+    sladkost = Column(String(20))
+    privlastek = Column(String(50))
+
+    rocnik = relationship("Rocnik", back_populates="lety")
+    vina = relationship("LetVino", back_populates="let", cascade="all, delete-orphan", passive_deletes=True)
+    panel = relationship("LetHodnotitel", back_populates="let", cascade="all, delete-orphan", passive_deletes=True)
+
+class LetVino(Base):
+    """Zařazení vína do letu (každé víno je nejvýš v jednom letu)."""
+    __tablename__ = "LET_VINO"
+    vino_id = Column(Integer, ForeignKey("VINO.id", ondelete="CASCADE"), primary_key=True)
+    let_id = Column(Integer, ForeignKey("DEGUSTACNI_LET.id", ondelete="CASCADE"), nullable=False, index=True)
+
+    vino = relationship("Vino", back_populates="zarazeni_do_letu")
+    let = relationship("DegustacniLet", back_populates="vina")
+
+class LetHodnotitel(Base):
+    """Člen panelu, který hodnotí daný let."""
+    __tablename__ = "LET_HODNOTITEL"
+    let_id = Column(Integer, ForeignKey("DEGUSTACNI_LET.id", ondelete="CASCADE"), primary_key=True)
+    hodnotitel_id = Column(Integer, ForeignKey("USERS.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+    let = relationship("DegustacniLet", back_populates="panel")
+    hodnotitel = relationship("Users", back_populates="lety")
+
+
+class RefreshToken(Base):
+    """
+    Dlouhodobý refresh token pro tiché obnovení přihlášení.
+    V databázi je jen SHA-256 hash tokenu. Při každém použití se token
+    zneplatní a nahradí novým ze stejné rodiny (rotace).
+    """
+    __tablename__ = "REFRESH_TOKEN"
+    id = Column(Integer, primary_key=True)
+    token_hash = Column(String(64), unique=True, nullable=False)
+    rodina = Column(String(32), nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime)
+
+    user_id = Column(Integer, ForeignKey("USERS.id", ondelete="CASCADE"), nullable=False, index=True)
+
+    user = relationship("Users", back_populates="refresh_tokeny")
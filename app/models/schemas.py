@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr, ConfigDict
-from typing import Optional
+from typing import Optional, List
 from enum import Enum
 
 class UserBase(BaseModel):
@@ -20,6 +20,14 @@ class UserRead(UserBase):
     id: int
     model_config = ConfigDict(from_attributes=True) 
 
+class RocnikRead(BaseModel):
+    """Ročník v podobě vhodné pro cache a šablony (menu, záhlaví)."""
+    id: int
+    rok: int
+    is_active: bool = False
+    is_archived: bool = False
+    model_config = ConfigDict(from_attributes=True)
+
 class BarvaVina(str, Enum):
     cervene = "Červené"
     bile = "Bílé"
@@ -42,6 +50,11 @@ class PrivlastekVina(str, Enum):
     zemskevino = "Zemské víno"
     voc = "VOC"
 
+class Medaile(str, Enum):
+    zlata = "Zlatá"
+    stribrna = "Stříbrná"
+    bronzova = "Bronzová"
+
 class VinoBase(BaseModel):
     """Společné atributy pro Víno."""
     nazev: str = Field(..., max_length=100)
@@ -55,11 +68,22 @@ class VinoCreate(VinoBase):
     """Použije se při vkládání nového vína."""
     rocnik_id: int
 
+class ChybaRadku(BaseModel):
+    """Chyby jednoho řádku hromadného importu vín."""
+    radek: int
+    chyby: List[str]
+
+class VysledekImportu(BaseModel):
+    """Výsledek hromadného importu: počet vložených vín a odmítnuté řádky."""
+    pocet_vlozenych: int = 0
+    chyby: List[ChybaRadku] = []
+
 class VinoRead(VinoBase):
     """Kompletní model vína vč. IDček, jak je v databázi."""
     id: int
     vinar_id: int
     rocnik_id: int
+    etiketa: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -72,4 +96,141 @@ class VinoWithStats(VinoDetail):
     Dědí z VinoDetail, takže obsahuje i vnořený objekt 'vinar'.
     """
     prumer_body: float = 0.0
-    pocet_hodnoceni: int = 0
\ No newline at end of file
+    pocet_hodnoceni: int = 0
+    rozptyl: Optional[int] = None
+    medaile: Optional[Medaile] = None
+    poradi_barva: Optional[int] = None
+    poradi_privlastek: Optional[int] = None
+
+class VinoHistorie(VinoBase):
+    """Jeden řádek historie vinaře napříč ročníky (víno + výsledek)."""
+    id: int
+    rocnik_id: int
+    rok: int
+    prumer_body: float = 0.0
+    pocet_hodnoceni: int = 0
+    medaile: Optional[Medaile] = None
+    poradi_barva: Optional[int] = None
+    poradi_privlastek: Optional[int] = None
+
+class VysledekHledani(BaseModel):
+    """Jedno nalezené víno ve fulltextovém hledání (z kteréhokoli ročníku)."""
+    id: int
+    nazev: str
+    odruda: Optional[str] = None
+    barva: Optional[str] = None
+    rocnik_id: int
+    rok: int
+    vinar_id: int
+    vinar_jmeno: Optional[str] = None
+    medaile: Optional[Medaile] = None
+    uryvek: Optional[str] = None
+
+class StrankaHledani(BaseModel):
+    """Jedna stránka výsledků hledání."""
+    dotaz: str
+    strana: int = 1
+    pocet_stran: int = 0
+    celkem: int = 0
+    vysledky: List[VysledekHledani] = []
+
+class UzivatelSpravy(BaseModel):
+    """
+    Uživatel v přehledu správy uživatelů i s názvy svých rolí. E-mail se
+    tu neověřuje, přehled musí ukázat i účty se starými neplatnými adresami.
+    """
+    id: int
+    login: str
+    jmeno: str
+    email: str
+    adresa: Optional[str] = None
+    telefon: Optional[str] = None
+    is_active: bool = True
+    role: List[str] = []
+
+class StrankaUzivatelu(BaseModel):
+    """Jedna stránka přehledu uživatelů (hledání, filtr role, řazení)."""
+    dotaz: str = ""
+    role_id: Optional[int] = None
+    razeni: str = "id"
+    sestupne: bool = False
+    strana: int = 1
+    pocet_stran: int = 0
+    celkem: int = 0
+    uzivatele: List[UzivatelSpravy] = []
+
+class ZmenaRead(BaseModel):
+    """Jeden záznam seznamu změn (entita = název tabulky, operace I/U/D/A)."""
+    verze: int
+    entita: str
+    entita_id: int
+    operace: str
+    model_config = ConfigDict(from_attributes=True)
+
+class DavkaZmen(BaseModel):
+    """Dávka změn pro odběratele a verze, od které se má číst příště."""
+    zmeny: List[ZmenaRead] = []
+    dalsi_verze: int = 0
+
+class VinarProfil(BaseModel):
+    """Veřejný profil vinaře včetně všech jeho vín ve všech ročnících."""
+    id: int
+    jmeno: str
+    email: Optional[str] = None
+    telefon: Optional[str] = None
+    adresa: Optional[str] = None
+    vina: List[VinoHistorie] = []
+class ZmenaHodnoceni(BaseModel):
+    """
+    Jedna změna hodnocení z offline archu hodnotitele. 'klic' je klíč
+    idempotence vygenerovaný v prohlížeči, 'cas' čas změny v zařízení
+    (ms od epochy). Prázdné 'body' hodnocení smaže.
+    """
+    klic: str = Field(..., min_length=8, max_length=64)
+    vino_id: int
+    body: Optional[int] = Field(None, ge=0, le=100)
+    poznamka: Optional[str] = Field(None, max_length=2000)
+    cas: int
+
+class StavZmenyHodnoceni(str, Enum):
+    ULOZENA = "ulozena"
+    ZASTARALA = "zastarala"
+    DUPLICITNI = "duplicitni"
+    ODMITNUTA = "odmitnuta"
+
+class VysledekZmenyHodnoceni(BaseModel):
+    """Jak server naložil se změnou a jaké hodnocení teď platí."""
+    klic: str
+    vino_id: int
+    stav: StavZmenyHodnoceni
+    body: Optional[int] = None
+    poznamka: Optional[str] = None
+
+class DavkaHodnoceni(BaseModel):
+    zmeny: List[ZmenaHodnoceni]
+
+class VysledekSynchronizace(BaseModel):
+    vysledky: List[VysledekZmenyHodnoceni] = []
+
+class LetRead(BaseModel):
+    """Degustační let hodnotitele s jeho postupem (kolik vín už ohodnotil)."""
+    id: int
+    poradi: int
+    barva: Optional[str] = None
+    sladkost: Optional[str] = None
+    privlastek: Optional[str] = None
+    pocet_vin: int = 0
+    pocet_hodnocenych: int = 0
+
+    @property
+    def nazev(self) -> str:
+        kategorie = " · ".join(k for k in (self.barva, self.sladkost, self.privlastek) if k)
+        return f"Let {self.poradi}: {kategorie or 'bez kategorie'}"
+
+    @property
+    def hotovo(self) -> bool:
+        return self.pocet_hodnocenych >= self.pocet_vin
+
+class LetPrehled(LetRead):
+    """Let v přehledu pro administrátora včetně složení panelu."""
+    panel: List[str] = []
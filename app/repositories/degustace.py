@@ -0,0 +1,284 @@
+import heapq
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import select, insert, func, and_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.db import Vino, Hodnoceni, Users, Role, DegustacniLet, LetVino, LetHodnotitel
+from app.models.schemas import BarvaVina, SladkostVina, PrivlastekVina, LetRead, LetPrehled
+
+# Pořadí kategorií při degustaci: od bílých k červeným, od suchých ke sladkým
+PORADI_BAREV = [BarvaVina.bile.value, BarvaVina.ruzove.value, BarvaVina.cervene.value]
+PORADI_SLADKOSTI = [s.value for s in SladkostVina]
+PORADI_PRIVLASTKU = [p.value for p in PrivlastekVina]
+
+Kategorie = Tuple[Optional[str], Optional[str], Optional[str]]
+
+
+def _index(poradi: List[str], hodnota: Optional[str]) -> int:
+    """Pozice hodnoty v pořadí, neznámé a prázdné hodnoty jdou na konec."""
+    try:
+        return poradi.index(hodnota)
+    except ValueError:
+        return len(poradi)
+
+def _poradi_kategorie(kategorie: Kategorie) -> tuple:
+    barva, sladkost, privlastek = kategorie
+    return (
+        _index(PORADI_BAREV, barva),
+        _index(PORADI_SLADKOSTI, sladkost),
+        _index(PORADI_PRIVLASTKU, privlastek),
+        tuple(k or "" for k in kategorie)
+    )
+
+def _rozdelit_rovnomerne(vina: list, max_vin: int) -> List[list]:
+    """Rozdělí vína na nejmenší počet částí o nejvýš 'max_vin', velikosti se liší nejvýš o 1."""
+    pocet = math.ceil(len(vina) / max_vin)
+    zaklad, zbytek = divmod(len(vina), pocet)
+    casti, zacatek = [], 0
+    for i in range(pocet):
+        konec = zacatek + zaklad + (1 if i < zbytek else 0)
+        casti.append(vina[zacatek:konec])
+        zacatek = konec
+    return casti
+
+def rozdelit_do_letu(vina: Sequence, max_vin: int) -> List[Tuple[Kategorie, list]]:
+    """
+    Rozdělí vína do letů. Víno má atributy id, vinar_id, barva, sladkost
+    a privlastek. Lety jsou v pořadí, v jakém se degustují.
+
+    Velká kategorie (barva, sladkost, přívlastek) se rozdělí na co nejmenší
+    počet letů o nejvýš 'max_vin' vínech se stejně velkými lety. Malé
+    kategorie se stejnou barvou a sladkostí se spojují do společného letu,
+    dokud se do něj vejdou (přívlastek takového letu je pak None).
+    """
+    kategorie: Dict[Kategorie, list] = defaultdict(list)
+    for vino in vina:
+        kategorie[(vino.barva, vino.sladkost, vino.privlastek)].append(vino)
+
+    lety: List[Tuple[Kategorie, list]] = []
+    otevreny: Optional[Tuple[Kategorie, list]] = None
+
+    def uzavrit():
+        nonlocal otevreny
+        if otevreny:
+            lety.append(otevreny)
+            otevreny = None
+
+    for klic in sorted(kategorie, key=_poradi_kategorie):
+        vina_kategorie = sorted(kategorie[klic], key=lambda v: v.id)
+        barva, sladkost, _ = klic
+
+        if len(vina_kategorie) > max_vin:
+            uzavrit()
+            lety.extend((klic, cast) for cast in _rozdelit_rovnomerne(vina_kategorie, max_vin))
+            continue
+
+        if otevreny and otevreny[0][:2] == (barva, sladkost) and len(otevreny[1]) + len(vina_kategorie) <= max_vin:
+            otevreny = ((barva, sladkost, None), otevreny[1] + vina_kategorie)
+        else:
+            uzavrit()
+            otevreny = (klic, vina_kategorie)
+
+    uzavrit()
+    return lety
+
+def priradit_panely(
+    lety: List[Tuple[Kategorie, list]],
+    hodnotitele: Sequence[int],
+    velikost_panelu: int
+) -> List[List[int]]:
+    """
+    Každému letu přiřadí panel nejvýš 'velikost_panelu' hodnotitelů.
+
+    Hodnotitelé jsou v haldě podle zatížení (počet vín, která už mají
+    ohodnotit). Lety se obsazují od největšího a pro každý se z haldy
+    berou nejméně zatížení hodnotitelé, kteří v letu nemají vlastní víno
+    (střet zájmů). Složitost je O(L · (P + S) · log H) pro L letů,
+    panel P, S vyřazených kvůli střetu zájmů a H hodnotitelů.
+    """
+    halda = [(0, poradi, hodnotitel_id) for poradi, hodnotitel_id in enumerate(hodnotitele)]
+    heapq.heapify(halda)
+    panely: List[List[int]] = [[] for _ in lety]
+
+    for index in sorted(range(len(lety)), key=lambda i: -len(lety[i][1])):
+        vina_letu = lety[index][1]
+        vinari = {v.vinar_id for v in vina_letu}
+        vybrani, odlozeni = [], []
+
+        while halda and len(vybrani) < velikost_panelu:
+            polozka = heapq.heappop(halda)
+            (odlozeni if polozka[2] in vinari else vybrani).append(polozka)
+
+        for zatizeni, poradi, hodnotitel_id in vybrani:
+            heapq.heappush(halda, (zatizeni + len(vina_letu), poradi, hodnotitel_id))
+        for polozka in odlozeni:
+            heapq.heappush(halda, polozka)
+
+        panely[index] = sorted(h for _, _, h in vybrani)
+
+    return panely
+
+def naplanovat_lety(db: Session, rocnik_id: int) -> dict:
+    """
+    Rozdělí vína ročníku do degustačních letů a přiřadí jim panely
+    aktivních hodnotitelů (předchozí plán ročníku se zahodí). Uložení
+    je hromadné (INSERT s více řádky). Necommituje.
+
+    Vrací souhrn: počet letů, vín, hodnotitelů, cílovou velikost panelu
+    a počet letů, které plný panel kvůli střetu zájmů nedostaly.
+    """
+    vina = db.execute(
+        select(Vino.id, Vino.vinar_id, Vino.barva, Vino.sladkost, Vino.privlastek)
+        .where(Vino.rocnik_id == rocnik_id)
+    ).all()
+    hodnotitele = db.scalars(
+        select(Users.id)
+        .join(Users.role)
+        .where(Role.nazev == "Hodnotitel", Users.is_active == True)
+        .order_by(Users.id)
+    ).all()
+
+    smazat_lety(db, rocnik_id)
+
+    velikost_panelu = min(settings.LET_HODNOCENI_NA_VINO, len(hodnotitele))
+    lety = rozdelit_do_letu(vina, settings.LET_MAX_VIN) if vina else []
+    panely = priradit_panely(lety, hodnotitele, velikost_panelu)
+
+    zaznamy = [
+        DegustacniLet(rocnik_id=rocnik_id, poradi=poradi, barva=barva, sladkost=sladkost, privlastek=privlastek)
+        for poradi, ((barva, sladkost, privlastek), _) in enumerate(lety, start=1)
+    ]
+    db.add_all(zaznamy)
+    db.flush()
+
+    vina_letu = [
+        {"let_id": zaznam.id, "vino_id": vino.id}
+        for zaznam, (_, vina_v_letu) in zip(zaznamy, lety)
+        for vino in vina_v_letu
+    ]
+    clenove = [
+        {"let_id": zaznam.id, "hodnotitel_id": hodnotitel_id}
+        for zaznam, panel in zip(zaznamy, panely)
+        for hodnotitel_id in panel
+    ]
+    if vina_letu:
+        db.execute(insert(LetVino), vina_letu)
+    if clenove:
+        db.execute(insert(LetHodnotitel), clenove)
+
+    return {
+        "pocet_letu": len(lety),
+        "pocet_vin": len(vina),
+        "pocet_hodnotitelu": len(hodnotitele),
+        "velikost_panelu": velikost_panelu,
+        "neuplne_panely": sum(1 for panel in panely if len(panel) < velikost_panelu),
+    }
+
+def smazat_lety(db: Session, rocnik_id: int) -> None:
+    """Smaže plán letů ročníku (lety, jejich vína i panely). Necommituje."""
+    db.flush()
+    lety_rocniku = select(DegustacniLet.id).where(DegustacniLet.rocnik_id == rocnik_id)
+    db.query(LetHodnotitel).filter(LetHodnotitel.let_id.in_(lety_rocniku)).delete(synchronize_session=False)
+    db.query(LetVino).filter(LetVino.let_id.in_(lety_rocniku)).delete(synchronize_session=False)
+    db.query(DegustacniLet).filter(DegustacniLet.rocnik_id == rocnik_id).delete(synchronize_session=False)
+
+def get_lety_hodnotitele(db: Session, rocnik_id: int, hodnotitel_id: int) -> List[LetRead]:
+    """
+    Vrátí lety ročníku, v jejichž panelu hodnotitel je, seřazené podle
+    pořadí degustace, i s počtem vín a počtem vín, která už ohodnotil.
+    """
+    dotaz = (
+        select(
+            DegustacniLet.id,
+            DegustacniLet.poradi,
+            DegustacniLet.barva,
+            DegustacniLet.sladkost,
+            DegustacniLet.privlastek,
+            func.count(LetVino.vino_id).label("pocet_vin"),
+            func.count(Hodnoceni.id).label("pocet_hodnocenych")
+        )
+        .join(LetHodnotitel, and_(
+            LetHodnotitel.let_id == DegustacniLet.id,
+            LetHodnotitel.hodnotitel_id == hodnotitel_id
+        ))
+        .join(LetVino, LetVino.let_id == DegustacniLet.id)
+        .outerjoin(Hodnoceni, and_(
+            Hodnoceni.vino_id == LetVino.vino_id,
+            Hodnoceni.hodnotitel_id == hodnotitel_id,
+            Hodnoceni.body.is_not(None)
+        ))
+        .where(DegustacniLet.rocnik_id == rocnik_id)
+        .group_by(DegustacniLet.id)
+        .order_by(DegustacniLet.poradi)
+    )
+    return [LetRead.model_validate(dict(radek)) for radek in db.execute(dotaz).mappings()]
+
+def existuji_lety(db: Session, rocnik_id: int) -> bool:
+    """Zjistí, zda má ročník naplánované degustační lety."""
+    return db.scalar(select(DegustacniLet.id).where(DegustacniLet.rocnik_id == rocnik_id).limit(1)) is not None
+
+def get_vina_panelu(db: Session, rocnik_id: int, hodnotitel_id: int, vino_ids: Iterable[int]) -> Optional[Set[int]]:
+    """
+    Která z vín 'vino_ids' smí hodnotitel podle plánu letů hodnotit: vína
+    letů, v jejichž panelu je. None, pokud ročník lety nemá (hodnotí se
+    všechna cizí vína ročníku).
+    """
+    if not existuji_lety(db, rocnik_id):
+        return None
+    return set(db.scalars(
+        select(LetVino.vino_id)
+        .join(LetHodnotitel, LetHodnotitel.let_id == LetVino.let_id)
+        .where(LetHodnotitel.hodnotitel_id == hodnotitel_id, LetVino.vino_id.in_(list(vino_ids)))
+    ))
+
+def vybrat_aktualni_let(lety: List[LetRead]) -> Optional[LetRead]:
+    """Aktuální let je první, který hodnotitel ještě nedohodnotil (jinak poslední)."""
+    if not lety:
+        return None
+    return next((let for let in lety if not let.hotovo), lety[-1])
+
+def get_prehled_letu(db: Session, rocnik_id: int) -> List[LetPrehled]:
+    """Vrátí všechny lety ročníku s počtem vín a jmény členů panelu."""
+    pocty = dict(db.execute(
+        select(LetVino.let_id, func.count())
+        .join(DegustacniLet, DegustacniLet.id == LetVino.let_id)
+        .where(DegustacniLet.rocnik_id == rocnik_id)
+        .group_by(LetVino.let_id)
+    ).all())
+
+    panely: Dict[int, List[str]] = defaultdict(list)
+    for let_id, jmeno in db.execute(
+        select(LetHodnotitel.let_id, Users.jmeno)
+        .join(Users, Users.id == LetHodnotitel.hodnotitel_id)
+        .join(DegustacniLet, DegustacniLet.id == LetHodnotitel.let_id)
+        .where(DegustacniLet.rocnik_id == rocnik_id)
+        .order_by(Users.jmeno)
+    ):
+        panely[let_id].append(jmeno)
+
+    lety = db.scalars(
+        select(DegustacniLet).where(DegustacniLet.rocnik_id == rocnik_id).order_by(DegustacniLet.poradi)
+    ).all()
+    return [
+        LetPrehled(
+            id=let.id,
+            poradi=let.poradi,
+            barva=let.barva,
+            sladkost=let.sladkost,
+            privlastek=let.privlastek,
+            pocet_vin=pocty.get(let.id, 0),
+            panel=panely[let.id]
+        )
+        for let in lety
+    ]
+
+def get_pocet_nezarazenych_vin(db: Session, rocnik_id: int) -> int:
+    """Počet vín ročníku, která nejsou v žádném letu (přibyla po naplánování)."""
+    return db.scalar(
+        select(func.count(Vino.id))
+        .outerjoin(LetVino, LetVino.vino_id == Vino.id)
+        .where(Vino.rocnik_id == rocnik_id, LetVino.let_id.is_(None))
+    )
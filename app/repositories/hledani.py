@@ -0,0 +1,113 @@
+import math
+import re
+from typing import Dict, List, Optional
+from markupsafe import escape
+from sqlalchemy import select, text, union_all
+from sqlalchemy.orm import Session
+
+from app.core.archiv import VinoArchiv, UmisteniArchiv
+from app.core.fulltext import TABULKA
+from app.models.db import Vino, Umisteni, Rocnik, Users
+from app.models.schemas import VysledekHledani, StrankaHledani
+
+NA_STRANU = 20
+MAX_SLOV = 8
+
+# Váhy sloupců pro bm25: název, odrůda, vinař, poznámky hodnotitelů
+VAHY = (10.0, 5.0, 3.0, 1.0)
+
+_ZACATEK, _KONEC = "\x02", "\x03"
+
+
+def sestavit_dotaz(dotaz: str) -> Optional[str]:
+    """
+    Převede text z vyhledávacího pole na dotaz FTS5: každé slovo jako
+    předpona ('ryzl' najde 'Ryzlink'), všechna slova musí být nalezena.
+    Uvozovky a operátory FTS5 z textu nepropadnou, bere se jen slovo.
+    """
+    slova = re.findall(r"\w+", dotaz or "")[:MAX_SLOV]
+    if not slova:
+        return None
+    return " ".join(f'"{slovo}"*' for slovo in slova)
+
+def _uryvek(surovy: Optional[str]) -> Optional[str]:
+    """Úryvek poznámek jako bezpečné HTML se zvýrazněnými shodami, jen pokud shoda v poznámkách je."""
+    if not surovy or _ZACATEK not in surovy:
+        return None
+    return str(escape(surovy)).replace(_ZACATEK, "<mark>").replace(_KONEC, "</mark>")
+
+def _detaily_vin(db: Session, ids: List[int]) -> Dict[int, dict]:
+    """Název, ročník, vinař a medaile vín podle id z hlavní databáze i z archivu."""
+    def vyber(VinoT, UmisteniT):
+        return (
+            select(
+                VinoT.id,
+                VinoT.nazev,
+                VinoT.odruda,
+                VinoT.barva,
+                VinoT.rocnik_id,
+                Rocnik.rok,
+                VinoT.vinar_id,
+                Users.jmeno.label("vinar_jmeno"),
+                UmisteniT.medaile
+            )
+            .join(Rocnik, Rocnik.id == VinoT.rocnik_id)
+            .outerjoin(Users, Users.id == VinoT.vinar_id)
+            .outerjoin(UmisteniT, UmisteniT.vino_id == VinoT.id)
+            .where(VinoT.id.in_(ids))
+        )
+
+    dotaz = union_all(vyber(Vino, Umisteni), vyber(VinoArchiv, UmisteniArchiv))
+    return {radek["id"]: dict(radek) for radek in db.execute(dotaz).mappings()}
+
+def hledat_vina(db: Session, dotaz: str, strana: int = 1) -> StrankaHledani:
+    """
+    Fulltextově vyhledá vína ve všech ročnících (i v archivu) podle názvu,
+    odrůdy, jména vinaře a poznámek hodnotitelů. Diakritika ani velikost
+    písmen nerozhodují. Výsledky jsou seřazené podle relevance (bm25,
+    shoda v názvu váží nejvíc) a stránkované po NA_STRANU.
+    """
+    strana = max(strana, 1)
+    vyraz = sestavit_dotaz(dotaz)
+    if vyraz is None:
+        return StrankaHledani(dotaz=dotaz or "", strana=strana)
+
+    celkem = db.execute(
+        text(f'SELECT count(*) FROM "{TABULKA}" WHERE "{TABULKA}" MATCH :vyraz'),
+        {"vyraz": vyraz}
+    ).scalar()
+    pocet_stran = math.ceil(celkem / NA_STRANU)
+    strana = min(strana, max(pocet_stran, 1))
+
+    radky = db.execute(
+        text(f"""
+            SELECT rowid AS id,
+                   snippet("{TABULKA}", 3, :zacatek, :konec, '…', 12) AS uryvek
+            FROM "{TABULKA}"
+            WHERE "{TABULKA}" MATCH :vyraz
+            ORDER BY bm25("{TABULKA}", {", ".join(map(str, VAHY))})
+            LIMIT :limit OFFSET :offset
+        """),
+        {
+            "vyraz": vyraz,
+            "zacatek": _ZACATEK,
+            "konec": _KONEC,
+            "limit": NA_STRANU,
+            "offset": (strana - 1) * NA_STRANU,
+        }
+    ).all()
+
+    detaily = _detaily_vin(db, [radek.id for radek in radky])
+    vysledky = [
+        VysledekHledani(**detaily[radek.id], uryvek=_uryvek(radek.uryvek))
+        for radek in radky
+        if radek.id in detaily
+    ]
+
+    return StrankaHledani(
+        dotaz=dotaz,
+        strana=strana,
+        pocet_stran=pocet_stran,
+        celkem=celkem,
+        vysledky=vysledky
+    )
@@ -0,0 +1,269 @@
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import event, select, delete, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal, NEMENI_CACHE
+from app.core.prenos import oznamit_zmenu_poradi
+from app.core.souteze import aktualni_soutez, soutez_kontext
+from app.models.db import Vino, Hodnoceni, ZapisHodnoceni, PrepocetPoradi
+from app.models.schemas import ZmenaHodnoceni, StavZmenyHodnoceni, VysledekZmenyHodnoceni
+from app.repositories.degustace import get_vina_panelu
+from app.repositories.poradi import prepocitat_poradi
+
+logger = logging.getLogger(__name__)
+
+# (soutěž, ročník), pro které už běží časovač odloženého přepočtu pořadí
+_odlozene: Set[Tuple[str, int]] = set()
+_odlozene_lock = threading.Lock()
+# Ročníky, jejichž přepočet se naplánuje po commitu transakce (session.info)
+_PREPOCITAT = "prepocitat_poradi"
+_prepocet = PrepocetPoradi.__table__
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _cas_zmeny(zmena: ZmenaHodnoceni, ted: datetime) -> datetime:
+    """
+    Čas změny z hodin zařízení, nejvýš však aktuální čas serveru:
+    zařízení s hodinami napřed by jinak vyhrálo každý souboj o zápis.
+    """
+    try:
+        cas = datetime.fromtimestamp(zmena.cas / 1000, timezone.utc).replace(tzinfo=None)
+    except (OverflowError, OSError, ValueError):
+        return ted
+    return min(cas, ted)
+
+def synchronizovat_hodnoceni(
+    db: Session,
+    hodnotitel_id: int,
+    rocnik_id: int,
+    zmeny: List[ZmenaHodnoceni]
+) -> List[VysledekZmenyHodnoceni]:
+    """
+    Zapíše dávku změn hodnocení z offline archu hodnotitele (necommituje).
+
+    - Změna s už přijatým klíčem se přeskočí (opakované odeslání dávky).
+    - Platí poslední zápis: změna se uplatní, jen pokud je novější než
+      poslední známá změna hodnocení (z archu i z formuláře).
+    - Vína mimo ročník 'rocnik_id' a vlastní vína hodnotitele se odmítnou.
+      Má-li ročník naplánované lety, odmítnou se i vína mimo lety, v jejichž
+      panelu hodnotitel je (vyvážený počet hodnocení na víno).
+
+    Vrací výsledek každé změny v pořadí dávky i s hodnocením, které po
+    dávce platí, aby si prohlížeč mohl srovnat svůj stav.
+
+    Pořadí se nepřepočítává v transakci zápisu: změna bodů naplánuje po
+    commitu odložený přepočet barvy (viz 'odlozit_prepocet_poradi'), změna
+    jen poznámky přepočet nepotřebuje vůbec.
+    """
+    ted = _utcnow()
+    vino_ids = {z.vino_id for z in zmeny}
+
+    prijate: Set[str] = set(db.scalars(
+        select(ZapisHodnoceni.klic).where(
+            ZapisHodnoceni.hodnotitel_id == hodnotitel_id,
+            ZapisHodnoceni.klic.in_([z.klic for z in zmeny])
+        )
+    ))
+    vina: Dict[int, Vino] = {
+        v.id: v for v in db.scalars(select(Vino).where(Vino.id.in_(vino_ids)))
+    }
+    hodnoceni: Dict[int, Hodnoceni] = {
+        h.vino_id: h for h in db.scalars(
+            select(Hodnoceni).where(
+                Hodnoceni.hodnotitel_id == hodnotitel_id,
+                Hodnoceni.vino_id.in_(vino_ids)
+            )
+        )
+    }
+    panel = get_vina_panelu(db, rocnik_id, hodnotitel_id, vino_ids)
+    posledni: Dict[int, Optional[datetime]] = dict(db.execute(
+        select(ZapisHodnoceni.vino_id, func.max(ZapisHodnoceni.cas))
+        .where(ZapisHodnoceni.hodnotitel_id == hodnotitel_id, ZapisHodnoceni.vino_id.in_(vino_ids))
+        .group_by(ZapisHodnoceni.vino_id)
+    ).all())
+
+    stavy: Dict[str, StavZmenyHodnoceni] = {}
+    zmenene_barvy = set()
+
+    # Změny téhož vína v jedné dávce se uplatní v pořadí, v jakém vznikly
+    for zmena in sorted(zmeny, key=lambda z: z.cas):
+        if zmena.klic in prijate or zmena.klic in stavy:
+            stavy.setdefault(zmena.klic, StavZmenyHodnoceni.DUPLICITNI)
+            continue
+
+        vino = vina.get(zmena.vino_id)
+        if (not vino or vino.rocnik_id != rocnik_id or vino.vinar_id == hodnotitel_id
+                or (panel is not None and vino.id not in panel)):
+            stavy[zmena.klic] = StavZmenyHodnoceni.ODMITNUTA
+            continue
+
+        cas = _cas_zmeny(zmena, ted)
+        stavajici = hodnoceni.get(zmena.vino_id)
+        reference = max(
+            (c for c in (posledni.get(zmena.vino_id), stavajici.zmeneno if stavajici else None) if c),
+            default=None
+        )
+
+        if reference and cas <= reference:
+            stavy[zmena.klic] = StavZmenyHodnoceni.ZASTARALA
+        else:
+            poznamka = (zmena.poznamka or "").strip()
+            if zmena.body is None:
+                if stavajici:
+                    db.delete(stavajici)
+                    del hodnoceni[zmena.vino_id]
+                    zmenene_barvy.add(vino.barva)
+            elif stavajici:
+                if stavajici.body != zmena.body:
+                    zmenene_barvy.add(vino.barva)
+                stavajici.body = zmena.body
+                stavajici.poznamka = poznamka
+                stavajici.zmeneno = cas
+            else:
+                hodnoceni[zmena.vino_id] = Hodnoceni(
+                    body=zmena.body,
+                    poznamka=poznamka,
+                    zmeneno=cas,
+                    vino_id=zmena.vino_id,
+                    hodnotitel_id=hodnotitel_id
+                )
+                db.add(hodnoceni[zmena.vino_id])
+                zmenene_barvy.add(vino.barva)
+            posledni[zmena.vino_id] = cas
+            stavy[zmena.klic] = StavZmenyHodnoceni.ULOZENA
+
+        db.add(ZapisHodnoceni(
+            hodnotitel_id=hodnotitel_id,
+            klic=zmena.klic,
+            vino_id=zmena.vino_id,
+            cas=cas,
+            prijato=ted
+        ))
+
+    # Samotná hodnocení žádná cache nedrží (profily vinařů se zahazují
+    # lokálně po commitu), verzi dat zvýší až odložený přepočet pořadí
+    db.info[NEMENI_CACHE] = True
+    odlozit_prepocet_poradi(db, rocnik_id, zmenene_barvy)
+
+    vysledky = []
+    for zmena in zmeny:
+        platne = hodnoceni.get(zmena.vino_id)
+        vysledky.append(VysledekZmenyHodnoceni(
+            klic=zmena.klic,
+            vino_id=zmena.vino_id,
+            stav=stavy[zmena.klic],
+            body=platne.body if platne else None,
+            poznamka=platne.poznamka if platne else None
+        ))
+    return vysledky
+
+def odlozit_prepocet_poradi(db: Session, rocnik_id: int, barvy: Iterable[Optional[str]]) -> None:
+    """
+    Označí barvy 'barvy' k přepočtu pořadí (tabulka PREPOCET_PORADI, ve
+    stejné transakci jako zápis hodnocení) a po commitu naplánuje přepočet
+    za PORADI_ODLOZENI sekund. Uložení, která přijdou během čekání, se
+    sloučí do jednoho přepočtu, takže automatické ukládání jednotlivých
+    hodnocení nepřepočítává celou barvu a nezvyšuje verzi dat při každém
+    úhozu. Značky přežijí i pád workeru, než časovač doběhne: zbylé
+    přepočítá start aplikace a údržba (viz 'prepocitat_oznacene').
+    """
+    barvy = set(barvy)
+    if not barvy:
+        return
+    db.connection().execute(
+        sqlite_insert(_prepocet).on_conflict_do_nothing(),
+        [{"rocnik_id": rocnik_id, "barva": barva or ""} for barva in barvy]
+    )
+    db.info.setdefault(_PREPOCITAT, set()).add(rocnik_id)
+
+@event.listens_for(Session, "after_commit")
+def _naplanovat_prepocty(session: Session) -> None:
+    for rocnik_id in session.info.pop(_PREPOCITAT, ()):
+        klic = (aktualni_soutez(), rocnik_id)
+        with _odlozene_lock:
+            if klic in _odlozene:
+                continue
+            _odlozene.add(klic)
+        casovac = threading.Timer(settings.PORADI_ODLOZENI, _prepocitat_odlozene, args=(klic,))
+        casovac.daemon = True
+        casovac.start()
+
+@event.listens_for(Session, "after_rollback")
+def _zahodit_prepocty(session: Session) -> None:
+    session.info.pop(_PREPOCITAT, None)
+
+def prepocitat_oznacene(rocnik_id: Optional[int] = None) -> Set[int]:
+    """
+    Přepočítá pořadí barev označených k přepočtu (v ročníku 'rocnik_id',
+    bez něj ve všech) a značky smaže v téže transakci. Značky se mažou
+    jako první příkaz, takže transakce hned drží zámek pro zápis a značka
+    z hodnocení uloženého během přepočtu se neztratí. Vrací ID přepočítaných
+    ročníků.
+    """
+    db = SessionLocal()
+    try:
+        dotaz = delete(_prepocet).returning(_prepocet.c.rocnik_id, _prepocet.c.barva)
+        if rocnik_id is not None:
+            dotaz = dotaz.where(_prepocet.c.rocnik_id == rocnik_id)
+        oznacene: Dict[int, Set[Optional[str]]] = defaultdict(set)
+        for oznaceny_rocnik, barva in db.connection().execute(dotaz).all():
+            oznacene[oznaceny_rocnik].add(barva or None)
+
+        for oznaceny_rocnik, barvy in oznacene.items():
+            prepocitat_poradi(db, oznaceny_rocnik, barvy)
+        db.commit()
+        return set(oznacene)
+    finally:
+        db.close()
+
+def _prepocitat_odlozene(klic: Tuple[str, int]) -> None:
+    with _odlozene_lock:
+        if klic not in _odlozene:
+            return
+        _odlozene.discard(klic)
+
+    soutez, rocnik_id = klic
+    with soutez_kontext(soutez):
+        try:
+            prepocitane = prepocitat_oznacene(rocnik_id)
+        except Exception:
+            # Značky zůstaly, přepočet dožene údržba
+            logger.exception("Odložený přepočet pořadí ročníku %s selhal", rocnik_id)
+            return
+        if prepocitane:
+            oznamit_zmenu_poradi(rocnik_id)
+
+def dokoncit_odlozene_prepocty() -> None:
+    """Hned provede přepočty, které ještě čekají na časovač (při ukončení aplikace)."""
+    with _odlozene_lock:
+        klice = list(_odlozene)
+    for klic in klice:
+        _prepocitat_odlozene(klic)
+
+def procistit_zapisy_hodnoceni(db: Session) -> int:
+    """
+    Smaže záznamy přijatých změn hodnocení starší než SYNC_UCHOVAT_DNI.
+    Nejnovější záznam každého vína a hodnotitele zůstává: nese čas poslední
+    změny (i smazání hodnocení), podle kterého se odmítne starší změna
+    z fronty zařízení. Necommituje a nemění verzi dat. Vrací počet smazaných.
+    """
+    zapis = ZapisHodnoceni.__table__
+    novejsi = zapis.alias()
+    hranice = _utcnow() - timedelta(days=settings.SYNC_UCHOVAT_DNI)
+    return db.connection().execute(
+        delete(zapis).where(
+            zapis.c.prijato < hranice,
+            zapis.c.cas < select(func.max(novejsi.c.cas)).where(
+                novejsi.c.hodnotitel_id == zapis.c.hodnotitel_id,
+                novejsi.c.vino_id == zapis.c.vino_id
+            ).scalar_subquery()
+        )
+    ).rowcount
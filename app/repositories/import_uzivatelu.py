@@ -0,0 +1,267 @@
+import contextvars
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert, select, update, delete, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal, get_engine, zaznamenat_zmeny, VLOZENI
+from app.core.security import get_password_hashes
+from app.models.db import Users, Role, UserRole, UlohaImportu
+from app.models.schemas import UserCreate, ChybaRadku
+from app.repositories.import_vin import Radek, _bez_diakritiky, _popis_chyby
+
+logger = logging.getLogger(__name__)
+
+# Názvy sloupců v souboru (bez diakritiky, malými písmeny) -> pole uživatele
+SLOUPCE = {
+    "login": "login",
+    "uzivatel": "login",
+    "heslo": "password",
+    "password": "password",
+    "jmeno": "jmeno",
+    "email": "email",
+    "e-mail": "email",
+    "telefon": "telefon",
+    "adresa": "adresa",
+    "role": "role",
+}
+
+# Více rolí v jedné buňce: "Vinař, Hodnotitel" nebo "Vinař|Hodnotitel"
+_ODDELOVAC_ROLI = re.compile(r"[,|]")
+
+# Kolik dokončených importů zůstává v databázi pro stránku s průběhem
+MAX_ULOH = 20
+# Nejvýš jednou za tolik sekund se do databáze zapíše průběh hashování
+PRUBEH_INTERVAL = 0.5
+# Nedokončený import starší než tohle už neběží (worker mezitím skončil)
+MAX_TRVANI = timedelta(hours=1)
+
+Kandidat = Tuple[int, UserCreate, List[int]]
+
+_uloha = UlohaImportu.__table__
+
+
+def _klic_role(nazev: str) -> str:
+    return _bez_diakritiky(nazev).strip().lower()
+
+def validovat_radky(db: Session, radky: List[Radek]) -> Tuple[List[Kandidat], List[ChybaRadku]]:
+    """
+    Ověří řádky proti UserCreate (délky, e-mail, heslo) a přeloží názvy
+    rolí na jejich ID. Vrací platné uživatele (číslo řádku, data, role)
+    a seznam chyb po řádcích.
+    """
+    role = {_klic_role(r.nazev): r.id for r in db.query(Role)}
+    platni: List[Kandidat] = []
+    chyby: List[ChybaRadku] = []
+
+    for cislo, data in radky:
+        data = dict(data)
+        problemy = []
+        role_ids: List[int] = []
+        for nazev in _ODDELOVAC_ROLI.split(str(data.pop("role", None) or "")):
+            if not nazev.strip():
+                continue
+            role_id = role.get(_klic_role(nazev))
+            if role_id is None:
+                problemy.append(f"role: neznámá role '{nazev.strip()}'")
+            elif role_id not in role_ids:
+                role_ids.append(role_id)
+
+        try:
+            uzivatel = UserCreate.model_validate({pole: hodnota for pole, hodnota in data.items() if hodnota is not None})
+        except ValidationError as chyba:
+            problemy.extend(_popis_chyby(c) for c in chyba.errors())
+            uzivatel = None
+
+        if problemy:
+            chyby.append(ChybaRadku(radek=cislo, chyby=problemy))
+        else:
+            platni.append((cislo, uzivatel, role_ids))
+
+    return platni, chyby
+
+def odfiltrovat_duplicity(db: Session, kandidati: List[Kandidat]) -> Tuple[List[Kandidat], List[ChybaRadku]]:
+    """
+    Vyřadí uživatele, jejichž login nebo e-mail se v souboru opakuje nebo
+    už v databázi existuje. Existující účty se zjistí jediným dotazem
+    pro celý soubor. E-maily se porovnávají bez ohledu na velikost písmen.
+    """
+    existujici_loginy = set()
+    existujici_emaily = set()
+    if kandidati:
+        for login, email in db.execute(
+            select(Users.login, Users.email).where(or_(
+                Users.login.in_({u.login for _, u, _ in kandidati}),
+                func.lower(Users.email).in_({u.email.lower() for _, u, _ in kandidati})
+            ))
+        ):
+            existujici_loginy.add(login)
+            existujici_emaily.add(email.lower())
+
+    platni: List[Kandidat] = []
+    chyby: List[ChybaRadku] = []
+    loginy: Dict[str, int] = {}
+    emaily: Dict[str, int] = {}
+    for cislo, uzivatel, role_ids in kandidati:
+        email = uzivatel.email.lower()
+        problemy = []
+        if uzivatel.login in existujici_loginy:
+            problemy.append(f"login: uživatel '{uzivatel.login}' už existuje")
+        elif uzivatel.login in loginy:
+            problemy.append(f"login: '{uzivatel.login}' je už na řádku {loginy[uzivatel.login]}")
+        if email in existujici_emaily:
+            problemy.append(f"email: adresa '{uzivatel.email}' už patří jinému uživateli")
+        elif email in emaily:
+            problemy.append(f"email: '{uzivatel.email}' je už na řádku {emaily[email]}")
+
+        loginy.setdefault(uzivatel.login, cislo)
+        emaily.setdefault(email, cislo)
+        if problemy:
+            chyby.append(ChybaRadku(radek=cislo, chyby=problemy))
+        else:
+            platni.append((cislo, uzivatel, role_ids))
+
+    return platni, chyby
+
+def pripravit_import(db: Session, radky: List[Radek]) -> Tuple[List[Kandidat], List[ChybaRadku]]:
+    """Ověří řádky souboru a vyřadí duplicity. Chyby vrací seřazené podle řádku."""
+    if len(radky) > settings.IMPORT_MAX_RADKU:
+        raise ValueError(f"Najednou lze importovat nejvýš {settings.IMPORT_MAX_RADKU} uživatelů.")
+
+    platni, chyby = validovat_radky(db, radky)
+    platni, duplicity = odfiltrovat_duplicity(db, platni)
+    return platni, sorted(chyby + duplicity, key=lambda c: c.radek)
+
+def vlozit_uzivatele(db: Session, kandidati: List[Kandidat], hashe: List[str]) -> int:
+    """
+    Vloží uživatele jedním hromadným INSERTem a jejich role druhým.
+    'hashe' jsou hashe hesel ve stejném pořadí jako kandidáti. Necommituje.
+    Vrací počet vložených uživatelů.
+    """
+    if not kandidati:
+        return 0
+
+    ids = dict(db.execute(
+        insert(Users).returning(Users.login, Users.id),
+        [
+            {
+                **uzivatel.model_dump(exclude={"password"}),
+                "password_hash": password_hash,
+            }
+            for (_, uzivatel, _), password_hash in zip(kandidati, hashe)
+        ]
+    ).all())
+
+    vazby = [
+        {"user_id": ids[uzivatel.login], "role_id": role_id}
+        for _, uzivatel, role_ids in kandidati
+        for role_id in role_ids
+    ]
+    if vazby:
+        db.execute(insert(UserRole), vazby)
+    zaznamenat_zmeny(db, Users.__tablename__, ids.values(), VLOZENI)
+    return len(ids)
+
+def _aktualizovat(uloha_id: str, **zmeny) -> None:
+    # Vlastní krátká transakce mimo ORM: nezvyšuje verzi dat, takže
+    # hlášení průběhu nezahazuje cache ostatních workerů
+    with get_engine().begin() as conn:
+        conn.execute(update(_uloha).where(_uloha.c.id == uloha_id).values(**zmeny))
+
+def _provest(uloha_id: str, kandidati: List[Kandidat]) -> None:
+    posledni_prubeh = 0.0
+
+    def prubeh(hotovo: int) -> None:
+        nonlocal posledni_prubeh
+        if hotovo < len(kandidati) and time.monotonic() - posledni_prubeh < PRUBEH_INTERVAL:
+            return
+        posledni_prubeh = time.monotonic()
+        _aktualizovat(uloha_id, zahashovano=hotovo)
+
+    try:
+        hashe = get_password_hashes([uzivatel.password for _, uzivatel, _ in kandidati], prubeh=prubeh)
+        _aktualizovat(uloha_id, stav="ukladani")
+
+        db = SessionLocal()
+        try:
+            vlozeno = vlozit_uzivatele(db, kandidati, hashe)
+            db.commit()
+        finally:
+            db.close()
+        _aktualizovat(uloha_id, stav="hotovo", vlozeno=vlozeno, konec=datetime.now())
+    except IntegrityError:
+        _aktualizovat(
+            uloha_id,
+            stav="chyba",
+            zprava="Mezi kontrolou a uložením vznikl účet se stejným loginem nebo e-mailem. "
+                   "Nic se neuložilo, naimportujte soubor znovu.",
+            konec=datetime.now()
+        )
+    except Exception:
+        logger.exception("Import uživatelů %s selhal", uloha_id)
+        _aktualizovat(uloha_id, stav="chyba", zprava="Import selhal, nic se neuložilo.", konec=datetime.now())
+
+def spustit_import(kandidati: List[Kandidat], chyby: List[ChybaRadku]) -> str:
+    """
+    Založí úlohu v tabulce ULOHA_IMPORTU a spustí na pozadí hashování
+    hesel a uložení uživatelů, vrátí ID úlohy. Průběh vrací 'stav_importu'
+    v kterémkoli workeru. Dokončené úlohy nad MAX_ULOH se smažou.
+    """
+    uloha_id = uuid.uuid4().hex
+    with get_engine().begin() as conn:
+        nejnovejsi = (
+            select(_uloha.c.id)
+            .where(_uloha.c.konec.is_not(None))
+            .order_by(_uloha.c.konec.desc())
+            .limit(MAX_ULOH - 1)
+        )
+        conn.execute(delete(_uloha).where(_uloha.c.konec.is_not(None), _uloha.c.id.not_in(nejnovejsi)))
+        conn.execute(insert(_uloha).values(
+            id=uloha_id,
+            stav="hashovani",
+            celkem=len(kandidati),
+            zahashovano=0,
+            vlozeno=0,
+            chyby=json.dumps([c.model_dump() for c in chyby], ensure_ascii=False),
+            zacatek=datetime.now()
+        ))
+
+    # Vlákno přebírá kontext požadavku (soutěž), aby zapisovalo do správné databáze
+    threading.Thread(
+        target=contextvars.copy_context().run,
+        args=(_provest, uloha_id, kandidati),
+        name=f"import-uzivatelu-{uloha_id[:8]}",
+        daemon=True
+    ).start()
+    return uloha_id
+
+def stav_importu(uloha_id: str) -> Optional[dict]:
+    """
+    Stav úlohy importu aktuální soutěže (None, pokud neexistuje). Úloha,
+    která nedoběhla do MAX_TRVANI, se hlásí jako přerušená: worker, ve
+    kterém běžela, mezitím skončil.
+    """
+    with get_engine().connect() as conn:
+        radek = conn.execute(select(_uloha).where(_uloha.c.id == uloha_id)).mappings().first()
+    if radek is None:
+        return None
+
+    uloha = dict(radek)
+    uloha["chyby"] = [ChybaRadku.model_validate(c) for c in json.loads(uloha["chyby"])]
+    if uloha["konec"] is None and datetime.now() - uloha["zacatek"] > MAX_TRVANI:
+        uloha.update(
+            stav="chyba",
+            zprava="Import byl přerušen (aplikace se mezitím restartovala). "
+                   "Zkontrolujte založené uživatele a chybějící naimportujte znovu.",
+            konec=datetime.now()
+        )
+    return uloha
@@ -0,0 +1,203 @@
+import csv
+import io
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import zaznamenat_zmeny, VLOZENI
+from app.models.db import Vino
+from app.models.schemas import (
+    VinoCreate, BarvaVina, SladkostVina, PrivlastekVina, ChybaRadku, VysledekImportu
+)
+from app.repositories.odrudy import sjednotit_odrudu, oznacit_nove_hodnoty
+from app.repositories.poradi import prepocitat_poradi
+from app.repositories.users import oznacit_zmenene_vinare
+
+try:
+    import openpyxl
+except ImportError:  # volitelná závislost, bez ní jde importovat jen CSV a JSON
+    openpyxl = None
+
+# Názvy sloupců v souboru (bez diakritiky, malými písmeny) -> pole vína
+SLOUPCE = {
+    "nazev": "nazev",
+    "nazev_vina": "nazev",
+    "odruda": "odruda",
+    "barva": "barva",
+    "sladkost": "sladkost",
+    "privlastek": "privlastek",
+    "rok": "rok_sklizne",
+    "rok_sklizne": "rok_sklizne",
+    "rocnik_sklizne": "rok_sklizne",
+}
+
+_VYCTY = {"barva": BarvaVina, "sladkost": SladkostVina, "privlastek": PrivlastekVina}
+
+Radek = Tuple[int, Dict[str, Any]]
+
+
+class _CsvStrednik(csv.excel):
+    """Výchozí dialekt, když oddělovač nejde rozpoznat (český Excel používá středník)."""
+    delimiter = ";"
+
+
+def _bez_diakritiky(text: str) -> str:
+    return "".join(
+        znak for znak in unicodedata.normalize("NFKD", text) if not unicodedata.combining(znak)
+    )
+
+def _pole_sloupce(nazev: Any, sloupce: Dict[str, str]) -> Optional[str]:
+    if nazev is None:
+        return None
+    klic = _bez_diakritiky(str(nazev)).strip().lower().replace(" ", "_")
+    return sloupce.get(klic)
+
+def _hodnota(hodnota: Any) -> Any:
+    """Prázdné buňky převede na None, u textu ořízne mezery."""
+    if isinstance(hodnota, str):
+        hodnota = hodnota.strip()
+        return hodnota or None
+    return hodnota
+
+def _radky_tabulky(
+    hlavicka: Iterable[Any],
+    radky: Iterable[Tuple[int, Iterable[Any]]],
+    sloupce: Dict[str, str],
+    povinne: str
+) -> List[Radek]:
+    """Spáruje řádky tabulky s hlavičkou, neznámé sloupce a prázdné řádky vynechá."""
+    pole = [_pole_sloupce(nazev, sloupce) for nazev in hlavicka]
+    if povinne not in pole:
+        raise ValueError(f"V hlavičce chybí sloupec '{povinne}'.")
+
+    vysledek = []
+    for cislo, bunky in radky:
+        data = {
+            klic: _hodnota(hodnota)
+            for klic, hodnota in zip(pole, bunky)
+            if klic is not None
+        }
+        if any(hodnota is not None for hodnota in data.values()):
+            vysledek.append((cislo, data))
+    return vysledek
+
+def nacist_csv(obsah: bytes, sloupce: Dict[str, str] = SLOUPCE, povinne: str = "nazev") -> List[Radek]:
+    """
+    Načte řádky z CSV. Kódování je UTF-8 (i s BOM z Excelu), jinak
+    Windows-1250. Oddělovač (středník, čárka, tabulátor) se rozpozná sám.
+    Vrací dvojice (číslo řádku v souboru, hodnoty podle pole vína, případně
+    podle jiného mapování 'sloupce', kde sloupec 'povinne' nesmí chybět).
+    """
+    try:
+        text = obsah.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = obsah.decode("cp1250", errors="replace")
+
+    try:
+        dialekt = csv.Sniffer().sniff(text[:4096], delimiters=";,\t")
+    except csv.Error:
+        dialekt = _CsvStrednik
+
+    ctenar = csv.reader(io.StringIO(text), dialekt)
+    hlavicka = next(ctenar, None)
+    if hlavicka is None:
+        raise ValueError("Soubor je prázdný.")
+    return _radky_tabulky(hlavicka, ((ctenar.line_num, bunky) for bunky in ctenar), sloupce, povinne)
+
+def nacist_xlsx(obsah: bytes, sloupce: Dict[str, str] = SLOUPCE, povinne: str = "nazev") -> List[Radek]:
+    """Načte řádky z prvního listu sešitu XLSX (vyžaduje balíček openpyxl)."""
+    if openpyxl is None:
+        raise ValueError("Import z XLSX není k dispozici (chybí balíček openpyxl), použijte CSV.")
+
+    try:
+        sesit = openpyxl.load_workbook(io.BytesIO(obsah), read_only=True, data_only=True)
+    except Exception:
+        raise ValueError("Soubor není platný sešit XLSX.")
+
+    try:
+        radky = sesit.worksheets[0].iter_rows(values_only=True)
+        hlavicka = next(radky, None)
+        if hlavicka is None:
+            raise ValueError("Sešit je prázdný.")
+        return _radky_tabulky(hlavicka, enumerate(radky, start=2), sloupce, povinne)
+    finally:
+        sesit.close()
+
+def nacist_soubor(
+    nazev_souboru: str,
+    obsah: bytes,
+    sloupce: Dict[str, str] = SLOUPCE,
+    povinne: str = "nazev"
+) -> List[Radek]:
+    """Podle přípony vybere čtení CSV nebo XLSX."""
+    if (nazev_souboru or "").lower().endswith(".xlsx"):
+        return nacist_xlsx(obsah, sloupce, povinne)
+    return nacist_csv(obsah, sloupce, povinne)
+
+def _sjednotit_vycet(pole: str, hodnota: Any) -> Any:
+    """Hodnotu výčtu najde bez ohledu na velikost písmen a diakritiku ('cervene' -> 'Červené')."""
+    if not isinstance(hodnota, str) or pole not in _VYCTY:
+        return hodnota
+    hledana = _bez_diakritiky(hodnota).lower()
+    for polozka in _VYCTY[pole]:
+        if _bez_diakritiky(polozka.value).lower() == hledana:
+            return polozka.value
+    return hodnota
+
+def _popis_chyby(chyba: dict) -> str:
+    pole = ".".join(str(cast) for cast in chyba["loc"])
+    return f"{pole}: {chyba['msg']}" if pole else chyba["msg"]
+
+def validovat_radky(radky: List[Radek], rocnik_id: int) -> Tuple[List[VinoCreate], List[ChybaRadku]]:
+    """
+    Ověří všechny řádky proti VinoCreate (délky textů, výčty barvy,
+    sladkosti a přívlastku, rozsah roku sklizně). Vrací platná vína
+    a seznam chyb po řádcích.
+    """
+    platna: List[VinoCreate] = []
+    chyby: List[ChybaRadku] = []
+
+    for cislo, data in radky:
+        if not isinstance(data, dict):
+            chyby.append(ChybaRadku(radek=cislo, chyby=["Řádek musí být objekt s poli vína."]))
+            continue
+        data = {pole: _sjednotit_vycet(pole, _hodnota(hodnota)) for pole, hodnota in data.items()}
+        try:
+            platna.append(VinoCreate.model_validate({**data, "rocnik_id": rocnik_id}))
+        except ValidationError as chyba:
+            chyby.append(ChybaRadku(radek=cislo, chyby=[_popis_chyby(c) for c in chyba.errors()]))
+
+    return platna, chyby
+
+def importovat_vina(db: Session, radky: List[Radek], vinar_id: int, rocnik_id: int) -> VysledekImportu:
+    """
+    Hromadně vloží vína vinaře do ročníku.
+
+    Nejdřív se ověří všechny řádky, platné se pak vloží jediným
+    hromadným INSERTem, neplatné se vrátí s popisem chyb. Odrůdy se
+    převedou na kanonický zápis. Pořadí se přepočítá jen pro dotčené barvy. Necommituje, volající
+    vše uloží jedním commitem.
+    """
+    if len(radky) > settings.IMPORT_MAX_RADKU:
+        raise ValueError(f"Najednou lze importovat nejvýš {settings.IMPORT_MAX_RADKU} vín.")
+
+    platna, chyby = validovat_radky(radky, rocnik_id)
+    if platna:
+        hodnoty = [
+            {
+                **vino.model_dump(mode="json"),
+                "odruda": sjednotit_odrudu(vino.odruda),
+                "vinar_id": vinar_id,
+            }
+            for vino in platna
+        ]
+        ids = db.scalars(insert(Vino).returning(Vino.id), hodnoty).all()
+        zaznamenat_zmeny(db, Vino.__tablename__, ids, VLOZENI)
+        oznacit_nove_hodnoty(db, hodnoty)
+        prepocitat_poradi(db, rocnik_id, {vino.barva.value if vino.barva else None for vino in platna})
+        oznacit_zmenene_vinare(db, [vinar_id])
+
+    return VysledekImportu(pocet_vlozenych=len(platna), chyby=chyby)
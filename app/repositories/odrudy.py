@@ -0,0 +1,144 @@
+import threading
+from typing import Dict, List, Tuple
+from sqlalchemy import event, select, func, union_all, inspect
+from sqlalchemy.orm import Session
+
+from app.core.archiv import archiv_vino
+from app.core.database import SessionLocal, SMAZANE_ENTITY
+from app.core.naseptavac import IndexNaseptavace
+from app.core.souteze import aktualni_soutez
+from app.models.db import Vino
+
+# Odrůdy registrované v ČR, nabízí se jejich zápis jako kanonický
+KANONICKE_ODRUDY = [
+    # bílé
+    "Aurelius", "Chardonnay", "Hibernal", "Irsai Oliver", "Kerner", "Malverina",
+    "Muškát moravský", "Muškát Ottonel", "Müller Thurgau", "Neuburské", "Pálava",
+    "Rulandské bílé", "Rulandské šedé", "Ryzlink rýnský", "Ryzlink vlašský",
+    "Sauvignon", "Savilon", "Solaris", "Sylvánské zelené", "Tramín červený",
+    "Veltlínské červené rané", "Veltlínské zelené", "Johanniter", "Souvignier gris",
+    # modré
+    "Alibernet", "André", "Cabernet Cortis", "Cabernet Moravia", "Cabernet Sauvignon",
+    "Dornfelder", "Frankovka", "Laurot", "Merlot", "Modrý Portugal", "Neronet",
+    "Regent", "Rulandské modré", "Svatovavřinecké", "Zweigeltrebe", "Nativa",
+    "Rosa", "Agni",
+]
+
+# Běžné zkratky z katalogů a etiket
+ZKRATKY_ODRUD = {
+    "RR": "Ryzlink rýnský",
+    "RV": "Ryzlink vlašský",
+    "VZ": "Veltlínské zelené",
+    "MT": "Müller Thurgau",
+    "MM": "Muškát moravský",
+    "RB": "Rulandské bílé",
+    "RŠ": "Rulandské šedé",
+    "RM": "Rulandské modré",
+    "TČ": "Tramín červený",
+    "SV": "Svatovavřinecké",
+    "FR": "Frankovka",
+    "ZW": "Zweigeltrebe",
+    "MP": "Modrý Portugal",
+    "CS": "Cabernet Sauvignon",
+    "CM": "Cabernet Moravia",
+    "CH": "Chardonnay",
+    "SZ": "Sylvánské zelené",
+}
+
+_NOVE_HODNOTY = "naseptavac_nove_hodnoty"
+# Upravené víno změnilo název nebo odrůdu, stará hodnota mohla z databáze zmizet
+_PREJMENOVANO = "naseptavac_prejmenovano"
+
+
+def _nacist_hodnoty(sloupec_vino, sloupec_archiv) -> List[Tuple[str, int]]:
+    """Rozdílné hodnoty sloupce s počtem vín z hlavní databáze i z archivu."""
+    hodnoty = union_all(
+        select(sloupec_vino.label("hodnota")).where(sloupec_vino.is_not(None)),
+        select(sloupec_archiv.label("hodnota")).where(sloupec_archiv.is_not(None))
+    ).subquery()
+    db = SessionLocal()
+    try:
+        return db.execute(
+            select(hodnoty.c.hodnota, func.count()).group_by(hodnoty.c.hodnota)
+        ).all()
+    finally:
+        db.close()
+
+def _vytvorit_indexy() -> Dict[str, IndexNaseptavace]:
+    return {
+        "odruda": IndexNaseptavace(
+            "odrudy",
+            lambda: _nacist_hodnoty(Vino.odruda, archiv_vino.c.odruda),
+            kanonicke=KANONICKE_ODRUDY,
+            aliasy=ZKRATKY_ODRUD
+        ),
+        "nazev": IndexNaseptavace(
+            "nazvy_vin",
+            lambda: _nacist_hodnoty(Vino.nazev, archiv_vino.c.nazev)
+        ),
+    }
+
+_indexy_soutezi: Dict[str, Dict[str, IndexNaseptavace]] = {}
+_indexy_lock = threading.Lock()
+
+def get_indexy() -> Dict[str, IndexNaseptavace]:
+    """Indexy našeptávače (podle pole vína) aktuální soutěže, vzniknou při prvním použití."""
+    soutez = aktualni_soutez()
+    with _indexy_lock:
+        if soutez not in _indexy_soutezi:
+            _indexy_soutezi[soutez] = _vytvorit_indexy()
+        return _indexy_soutezi[soutez]
+
+
+def sjednotit_odrudu(odruda: str) -> str:
+    """
+    Převede zápis odrůdy na kanonický tvar, pokud jde o známou odrůdu
+    nebo její zkratku ('ryzlink rynsky', 'RR' -> 'Ryzlink rýnský').
+    Neznámé odrůdy se uloží tak, jak je vinař napsal.
+    """
+    return get_indexy()["odruda"].kanonicky_tvar(odruda)
+
+@event.listens_for(Session, "after_flush")
+def _sledovat_nove_hodnoty(session: Session, flush_context) -> None:
+    """Zapamatuje si názvy a odrůdy nově uložených či upravených vín."""
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Vino):
+            continue
+        stav = inspect(obj)
+        nove = session.info.setdefault(_NOVE_HODNOTY, {"odruda": set(), "nazev": set()})
+        for pole in nove:
+            hodnota = getattr(obj, pole)
+            historie = stav.attrs[pole].history
+            if hodnota and (obj in session.new or historie.has_changes()):
+                nove[pole].add(hodnota)
+            if obj not in session.new and any(historie.deleted):
+                session.info[_PREJMENOVANO] = True
+
+def oznacit_nove_hodnoty(db: Session, vina: List[dict]) -> None:
+    """Zapamatuje si hodnoty z hromadného INSERTu, který ORM události nezachytí."""
+    nove = db.info.setdefault(_NOVE_HODNOTY, {"odruda": set(), "nazev": set()})
+    for vino in vina:
+        for pole in nove:
+            if vino.get(pole):
+                nove[pole].add(vino[pole])
+
+@event.listens_for(Session, "after_commit")
+def _doplnit_indexy(session: Session) -> None:
+    """
+    Nové hodnoty se do indexů jen doplní. Když nějaká hodnota mohla zmizet
+    (smazané víno, hromadně i kaskádou, nebo přejmenované víno), indexy se
+    označí k přestavbě na pozadí.
+    """
+    nove = session.info.pop(_NOVE_HODNOTY, {})
+    smazane = session.info.pop(SMAZANE_ENTITY, set())
+    if session.info.pop(_PREJMENOVANO, False) or "VINO" in smazane:
+        for index in get_indexy().values():
+            index.clear()
+        return
+    for pole, hodnoty in nove.items():
+        get_indexy()[pole].pridat(hodnoty)
+
+@event.listens_for(Session, "after_rollback")
+def _zahodit_nove_hodnoty(session: Session) -> None:
+    session.info.pop(_NOVE_HODNOTY, None)
+    session.info.pop(_PREJMENOVANO, None)
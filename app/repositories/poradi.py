@@ -0,0 +1,147 @@
+from typing import Iterable, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, delete, func, case, or_, exists
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.core.config import settings
+from app.models.db import Vino, Hodnoceni, Umisteni, VerzePoradi
+from app.models.schemas import Medaile
+from app.repositories.users import oznacit_zmenene_vinare
+
+
+def _filtr_barev(sloupec, barvy: Iterable[Optional[str]]):
+    """
+    Sestaví podmínku na sloupec s barvou. Víno bez barvy (NULL) tvoří
+    vlastní kategorii, proto ho nelze zachytit obyčejným IN.
+    """
+    barvy = set(barvy)
+    podminky = []
+    vyplnene = [b for b in barvy if b is not None]
+    if vyplnene:
+        podminky.append(sloupec.in_(vyplnene))
+    if None in barvy:
+        podminky.append(sloupec.is_(None))
+    return or_(*podminky)
+
+
+def prepocitat_poradi(
+    db: Session,
+    rocnik_id: int,
+    barvy: Optional[Iterable[Optional[str]]] = None
+) -> None:
+    """
+    Přepočítá oficiální umístění vín v ročníku a uloží je do tabulky UMISTENI.
+
+    Celý výpočet běží v jediném dotazu INSERT ... SELECT s okenními funkcemi:
+    - průměr bodů se zaokrouhluje už v SQL na jedno desetinné místo,
+    - medaile se přidělují podle prahů v nastavení (MEDAILE_*),
+    - pořadí je hustý rank (DENSE_RANK) v rámci barvy a v rámci přívlastku
+      dané barvy, shoda se rozhoduje počtem hodnocení (více je lépe)
+      a rozptylem bodů (menší je lépe).
+
+    Pokud je zadán seznam 'barvy', přepočítají se jen tyto kategorie. Všechna
+    pořadí jsou dělena podle barvy, takže ostatní kategorie se změna netýká.
+    Funkce necommituje, volající ji pouští ve stejné transakci jako změnu hodnocení.
+    Změna pořadí se promítne i do profilů vinařů soutěžících v dotčených kategoriích
+    a zvýší verzi pořadí ročníku ('get_verze_poradi').
+    """
+    db.flush()
+
+    podminka_vina = [Vino.rocnik_id == rocnik_id]
+    podminka_umisteni = [Umisteni.rocnik_id == rocnik_id]
+    if barvy is not None:
+        barvy = set(barvy)
+        if not barvy:
+            return
+        podminka_vina.append(_filtr_barev(Vino.barva, barvy))
+        podminka_umisteni.append(_filtr_barev(Umisteni.barva, barvy))
+
+    statistiky = (
+        select(
+            Vino.id.label("vino_id"),
+            Vino.rocnik_id.label("rocnik_id"),
+            Vino.barva.label("barva"),
+            Vino.privlastek.label("privlastek"),
+            func.round(func.avg(Hodnoceni.body), 1).label("prumer_body"),
+            func.count(Hodnoceni.id).label("pocet_hodnoceni"),
+            (func.max(Hodnoceni.body) - func.min(Hodnoceni.body)).label("rozptyl")
+        )
+        .outerjoin(Hodnoceni, Hodnoceni.vino_id == Vino.id)
+        .where(*podminka_vina)
+        .group_by(Vino.id)
+        .subquery()
+    )
+
+    s = statistiky.c
+    razeni = (s.prumer_body.desc(), s.pocet_hodnoceni.desc(), s.rozptyl.asc())
+    hodnoceno = s.pocet_hodnoceni > 0
+
+    medaile = case(
+        (s.prumer_body >= settings.MEDAILE_ZLATA, Medaile.zlata.value),
+        (s.prumer_body >= settings.MEDAILE_STRIBRNA, Medaile.stribrna.value),
+        (s.prumer_body >= settings.MEDAILE_BRONZOVA, Medaile.bronzova.value),
+        else_=None
+    )
+
+    vypocet = select(
+        s.vino_id,
+        s.rocnik_id,
+        s.barva,
+        s.privlastek,
+        s.prumer_body,
+        s.pocet_hodnoceni,
+        s.rozptyl,
+        medaile,
+        case((hodnoceno, func.dense_rank().over(partition_by=s.barva, order_by=razeni))),
+        case((hodnoceno, func.dense_rank().over(partition_by=(s.barva, s.privlastek), order_by=razeni)))
+    )
+
+    db.execute(delete(Umisteni).where(*podminka_umisteni))
+    db.execute(
+        insert(Umisteni).from_select(
+            [
+                Umisteni.vino_id,
+                Umisteni.rocnik_id,
+                Umisteni.barva,
+                Umisteni.privlastek,
+                Umisteni.prumer_body,
+                Umisteni.pocet_hodnoceni,
+                Umisteni.rozptyl,
+                Umisteni.medaile,
+                Umisteni.poradi_barva,
+                Umisteni.poradi_privlastek
+            ],
+            vypocet
+        )
+    )
+
+    oznacit_zmenene_vinare(
+        db, db.execute(select(Vino.vinar_id).where(*podminka_vina).distinct()).scalars()
+    )
+    db.execute(
+        sqlite_insert(VerzePoradi)
+        .values(rocnik_id=rocnik_id, verze=1)
+        .on_conflict_do_update(
+            index_elements=[VerzePoradi.rocnik_id],
+            set_={"verze": VerzePoradi.verze + 1}
+        )
+    )
+
+def get_verze_poradi(db: Session, rocnik_id: int) -> int:
+    """Kolikrát se pořadí ročníku přepočítalo (verze pro živý přenos pořadí)."""
+    return db.scalar(select(VerzePoradi.verze).where(VerzePoradi.rocnik_id == rocnik_id)) or 0
+
+
+def zajistit_poradi(db: Session, rocnik_id: int) -> None:
+    """
+    Dopočítá umístění pro ročník, který ještě nemá vyplněnou tabulku UMISTENI
+    (např. data vložená před zavedením výpočtu pořadí).
+    """
+    chybi = db.query(
+        exists().where(Vino.rocnik_id == rocnik_id)
+        & ~exists().where(Umisteni.rocnik_id == rocnik_id)
+    ).scalar()
+
+    if chybi:
+        prepocitat_poradi(db, rocnik_id)
+        db.commit()
@@ -1,6 +1,13 @@
 from sqlalchemy.orm import Session
-from app.models.db import Rocnik
-from typing import List, Optional
+from sqlalchemy import select, delete, func, union_all
+from app.core.archiv import VinoArchiv, presunout_rocnik
+from app.core.cache import Cache
+from app.core.database import zaznamenat_zmeny, zaznamenat_zmeny_dotazem, SMAZANI
+from app.models.db import Rocnik, Vino, Hodnoceni
+from app.models.schemas import RocnikRead
+from typing import Dict, List, Optional
+
+rocniky_cache = Cache("rocniky")
 
 def get_aktivni_rocnik(db: Session) -> Optional[Rocnik]:
     """Vrátí aktuálně aktivní ročník."""
@@ -10,6 +17,33 @@ def get_vsechny_rocniky(db: Session) -> List[Rocnik]:
     """Vrátí všechny ročníky seřazené sestupně (nejnovější nahoře)."""
     return db.query(Rocnik).order_by(Rocnik.rok.desc()).all()
 
+def get_rocniky_menu(db: Session) -> List[RocnikRead]:
+    """
+    Vrátí všechny ročníky (nejnovější nahoře) pro navigační menu.
+    Výsledek je v cache, protože se čte na každé stránce.
+    """
+    return rocniky_cache.get_or_set(
+        "vsechny",
+        lambda: [RocnikRead.model_validate(r) for r in get_vsechny_rocniky(db)]
+    )
+
+def get_aktivni_rocnik_info(db: Session) -> Optional[RocnikRead]:
+    """Vrátí aktivní ročník z menu v cache (bez dalšího dotazu do databáze)."""
+    return next((r for r in get_rocniky_menu(db) if r.is_active), None)
+
+def je_archivovany(db: Session, rocnik_id: int) -> bool:
+    """Zjistí z menu v cache, zda data ročníku leží v archivu."""
+    return any(r.id == rocnik_id and r.is_archived for r in get_rocniky_menu(db))
+
+def get_pocty_vin(db: Session) -> Dict[int, int]:
+    """Vrátí počet vín v jednotlivých ročnících (hlavní databáze i archiv)."""
+    pocty = union_all(
+        select(Vino.rocnik_id, func.count().label("pocet")).group_by(Vino.rocnik_id),
+        select(VinoArchiv.rocnik_id, func.count().label("pocet")).group_by(VinoArchiv.rocnik_id)
+    ).subquery()
+    dotaz = select(pocty.c.rocnik_id, func.sum(pocty.c.pocet)).group_by(pocty.c.rocnik_id)
+    return {rocnik_id: pocet for rocnik_id, pocet in db.execute(dotaz)}
+
 def get_rocnik_by_id(db: Session, rocnik_id: int) -> Optional[Rocnik]:
     """Najde ročník podle ID."""
     return db.query(Rocnik).filter(Rocnik.id == rocnik_id).first()
@@ -22,7 +56,8 @@ def set_active_rocnik_logic(db: Session, rocnik_id: int) -> None:
     """
     Nastaví vybraný ročník jako aktivní a VŠECHNY ostatní deaktivuje.
     """
-    db.query(Rocnik).update({Rocnik.is_active: False})
+    for rocnik in db.query(Rocnik).filter(Rocnik.is_active == True, Rocnik.id != rocnik_id):
+        rocnik.is_active = False
     
     rocnik = db.query(Rocnik).filter(Rocnik.id == rocnik_id).first()
     if rocnik:
@@ -38,4 +73,32 @@ def deactivate_rocnik_logic(db: Session, rocnik_id: int) -> None:
     rocnik = db.query(Rocnik).filter(Rocnik.id == rocnik_id).first()
     if rocnik:
         rocnik.is_active = False
-        db.commit()
\ No newline at end of file
+        db.commit()
+
+def archivovat_rocnik_logic(db: Session, rocnik_id: int) -> bool:
+    """
+    Přesune vína a hodnocení deaktivovaného ročníku do archivu.
+    Aktivní ročník ani nejnovější ročník (ten lze znovu aktivovat)
+    archivovat nelze. Vrací, zda se archivace provedla.
+    """
+    rocnik = get_rocnik_by_id(db, rocnik_id)
+    nejnovejsi = get_nejnovejsi_rocnik(db)
+
+    if not rocnik or rocnik.is_active or rocnik.is_archived or rocnik.id == nejnovejsi.id:
+        return False
+
+    presunout_rocnik(rocnik_id)
+    db.expire_all()
+    return True
+
+def smazat_rocnik_logic(db: Session, rocnik_id: int) -> None:
+    """
+    Smaže ročník jedním příkazem. Vína, hodnocení, umístění a lety ročníku
+    smaže databáze kaskádou (ON DELETE CASCADE), do session se nic nenačítá.
+    Mazaná vína a hodnocení se předem zapíšou do seznamu změn. Necommituje.
+    """
+    vina = select(Vino.id).where(Vino.rocnik_id == rocnik_id)
+    zaznamenat_zmeny_dotazem(db, "HODNOCENI", select(Hodnoceni.id).where(Hodnoceni.vino_id.in_(vina)), SMAZANI)
+    zaznamenat_zmeny_dotazem(db, "VINO", vina, SMAZANI)
+    db.execute(delete(Rocnik).where(Rocnik.id == rocnik_id))
+    zaznamenat_zmeny(db, "ROCNIK", [rocnik_id], SMAZANI)
@@ -0,0 +1,90 @@
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import NEMENI_CACHE
+from app.core.security import create_refresh_token, hash_token
+from app.models.db import RefreshToken, Users
+
+
+def _ted() -> datetime:
+    """Aktuální čas v UTC bez časové zóny (tak ho ukládá SQLite)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def vydat_refresh_token(db: Session, user: Users, rodina: Optional[str] = None) -> str:
+    """
+    Vytvoří nový refresh token pro uživatele a vrátí ho v čitelné podobě
+    (do databáze se ukládá jen hash). Zároveň smaže uživatelovy prošlé tokeny.
+    Necommituje.
+
+    Tokeny žádná cache nedrží, přihlášení ani tichá obnova proto nezvyšují
+    verzi dat (jinak by každé přihlášení vyprázdnilo cache všech workerů).
+    """
+    ted = _ted()
+    db.info[NEMENI_CACHE] = True
+
+    db.query(RefreshToken).filter(
+        RefreshToken.user_id == user.id,
+        RefreshToken.expires_at < ted
+    ).delete(synchronize_session=False)
+
+    token = create_refresh_token()
+    db.add(RefreshToken(
+        token_hash=hash_token(token),
+        rodina=rodina or secrets.token_hex(16),
+        expires_at=ted + timedelta(hours=settings.REFRESH_TOKEN_EXPIRE_HOURS),
+        user_id=user.id
+    ))
+    return token
+
+def obnovit_refresh_token(db: Session, token: str) -> Optional[Tuple[Users, Optional[str]]]:
+    """
+    Ověří refresh token a provede jeho rotaci.
+
+    Vrací dvojici (uživatel, nový refresh token), nebo None, pokud token
+    neplatí. Pokud přijde token, který byl zneplatněn jen před chvílí
+    (souběžné požadavky z jednoho prohlížeče), uživatel se pustí dál, ale
+    nový refresh token se nevydá. Starší zneplatněný token znamená jeho
+    odcizení, proto se zneplatní celá rodina tokenů.
+    Změny rovnou commituje.
+    """
+    ted = _ted()
+    zaznam = db.query(RefreshToken).filter(RefreshToken.token_hash == hash_token(token)).first()
+
+    if not zaznam or zaznam.expires_at < ted or not zaznam.user.is_active:
+        return None
+
+    if zaznam.revoked_at:
+        rodina_plati = db.query(RefreshToken.id).filter(
+            RefreshToken.rodina == zaznam.rodina,
+            RefreshToken.revoked_at.is_(None)
+        ).first()
+        if rodina_plati and ted - zaznam.revoked_at <= timedelta(seconds=settings.REFRESH_TOKEN_GRACE_SECONDS):
+            return zaznam.user, None
+
+        zrusit_rodinu(db, zaznam.rodina)
+        db.commit()
+        return None
+
+    zaznam.revoked_at = ted
+    novy_token = vydat_refresh_token(db, zaznam.user, zaznam.rodina)
+    db.commit()
+
+    return zaznam.user, novy_token
+
+def zrusit_rodinu(db: Session, rodina: str) -> None:
+    """Zneplatní všechny dosud platné tokeny z jedné rodiny. Necommituje a nemění verzi dat."""
+    db.info[NEMENI_CACHE] = True
+    db.query(RefreshToken).filter(
+        RefreshToken.rodina == rodina,
+        RefreshToken.revoked_at.is_(None)
+    ).update({RefreshToken.revoked_at: _ted()}, synchronize_session=False)
+
+def zrusit_refresh_token(db: Session, token: str) -> None:
+    """Při odhlášení zneplatní celou rodinu, do které token patří."""
+    zaznam = db.query(RefreshToken).filter(RefreshToken.token_hash == hash_token(token)).first()
+    if zaznam:
+        zrusit_rodinu(db, zaznam.rodina)
+        db.commit()
@@ -1,25 +1,246 @@
-from typing import Optional, List
-from sqlalchemy.orm import Session
-from app.models.db import Users, Role
+import math
+from typing import Optional, List, Iterable, Set, Tuple
+from sqlalchemy import event, select, delete, insert, update, exists, func, literal, or_
+from sqlalchemy.orm import Session, selectinload
+from app.core.cache import Cache
+from app.core.database import zaznamenat_zmeny_dotazem, SMAZANI, UPRAVA
+from app.models.db import Users, Role, UserRole, Vino, Hodnoceni
+from app.models.schemas import VinarProfil, StrankaUzivatelu, UzivatelSpravy
+from app.repositories.vina import get_historie_vinare
+
+profily_vinaru = Cache("profily_vinaru")
+role_uzivatelu = Cache("role_uzivatelu")
+
+_ZMENENI_VINARI = "zmeneni_vinari"
+
+UZIVATELU_NA_STRANU = 50
+
+# Sloupce, podle kterých lze přehled uživatelů řadit (klíč = parametr 'razeni')
+RAZENI_UZIVATELU = {
+    "id": Users.id,
+    "login": Users.login,
+    "jmeno": Users.jmeno,
+    "email": Users.email,
+    "stav": Users.is_active,
+}
 
 def get_user_by_login(db: Session, login: str) -> Optional[Users]:
     return db.query(Users).filter(Users.login == login).first()
 
 def get_user_roles(db: Session, login: str)-> List[str]:
-    user = get_user_by_login(db, login)
-    if user:
-        return [role.nazev for role in user.role]
-    return []
+    """Vrátí názvy rolí uživatele. Výsledek se drží v cache podle loginu."""
+    def nacist() -> List[str]:
+        user = get_user_by_login(db, login)
+        if user:
+            return [role.nazev for role in user.role]
+        return []
+
+    return role_uzivatelu.get_or_set(login, nacist)
 
 def get_public_user_detail(db: Session, user_id: int) -> Optional[Users]:
     return db.query(Users).filter(Users.id == user_id).first()
 
-def get_all_users(db: Session) -> List[Users]:
-    """Vrátí seznam všech uživatelů seřazený podle ID."""
-    return db.query(Users).order_by(Users.id).all()
+def get_profil_vinare(db: Session, vinar_id: int) -> Optional[VinarProfil]:
+    """
+    Vrátí veřejný profil vinaře s historií vín ze všech ročníků.
+    Výsledek se drží v cache, dokud se nezmění vína vinaře, jejich hodnocení
+    nebo umístění (viz 'oznacit_zmenene_vinare').
+    """
+    def nacist() -> Optional[VinarProfil]:
+        vinar = get_public_user_detail(db, vinar_id)
+        if not vinar:
+            return None
+        return VinarProfil(
+            id=vinar.id,
+            jmeno=vinar.jmeno,
+            email=vinar.email,
+            telefon=vinar.telefon,
+            adresa=vinar.adresa,
+            vina=get_historie_vinare(db, vinar_id)
+        )
+
+    return profily_vinaru.get_or_set(vinar_id, nacist)
+
+def oznacit_zmenene_vinare(db: Session, vinar_ids: Iterable[int]) -> None:
+    """
+    Poznamená vinaře, jejichž profil je potřeba po commitu zahodit z cache.
+    Volá se u hromadných SQL příkazů, které ORM události nezachytí.
+    """
+    db.info.setdefault(_ZMENENI_VINARI, set()).update(vinar_ids)
+
+@event.listens_for(Session, "after_flush")
+def _sledovat_zmeny_vinaru(session: Session, flush_context) -> None:
+    """Po každém flushi zjistí, kterých vinařů se změna týká."""
+    vinari = set()
+    vina_hodnoceni = set()
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Vino):
+            vinari.add(obj.vinar_id)
+        elif isinstance(obj, Hodnoceni):
+            vina_hodnoceni.add(obj.vino_id)
+        elif isinstance(obj, Users) and obj not in session.new:
+            vinari.add(obj.id)
+
+    vina_hodnoceni.discard(None)
+    if vina_hodnoceni:
+        vinari.update(session.connection().execute(
+            select(Vino.vinar_id).where(Vino.id.in_(vina_hodnoceni))
+        ).scalars())
+
+    vinari.discard(None)
+    if vinari:
+        oznacit_zmenene_vinare(session, vinari)
+
+@event.listens_for(Session, "after_commit")
+def _zneplatnit_profily(session: Session) -> None:
+    for vinar_id in session.info.pop(_ZMENENI_VINARI, ()):
+        profily_vinaru.invalidate(vinar_id)
+
+@event.listens_for(Session, "after_rollback")
+def _zahodit_zmeny_vinaru(session: Session) -> None:
+    session.info.pop(_ZMENENI_VINARI, None)
+
+def _escapovat_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def hledat_uzivatele(
+    db: Session,
+    dotaz: str = "",
+    role_id: Optional[int] = None,
+    razeni: str = "id",
+    sestupne: bool = False,
+    strana: int = 1
+) -> StrankaUzivatelu:
+    """
+    Jedna stránka přehledu uživatelů pro správu. Hledá se podřetězec
+    v loginu, jménu a e-mailu, filtruje podle role a řadí podle sloupce
+    z RAZENI_UZIVATELU. Vše dělá databáze, načte se jen UZIVATELU_NA_STRANU
+    řádků a role k nim jedním dalším dotazem.
+    """
+    dotaz = (dotaz or "").strip()
+    if razeni not in RAZENI_UZIVATELU:
+        razeni = "id"
+
+    podminky = []
+    if dotaz:
+        vzor = f"%{_escapovat_like(dotaz)}%"
+        podminky.append(or_(*(
+            sloupec.ilike(vzor, escape="\\") for sloupec in (Users.login, Users.jmeno, Users.email)
+        )))
+    if role_id is not None:
+        podminky.append(exists().where(UserRole.user_id == Users.id, UserRole.role_id == role_id))
+
+    celkem = db.scalar(select(func.count(Users.id)).where(*podminky))
+    pocet_stran = math.ceil(celkem / UZIVATELU_NA_STRANU)
+    strana = min(max(strana, 1), max(pocet_stran, 1))
+
+    sloupec = RAZENI_UZIVATELU[razeni]
+    uzivatele = db.scalars(
+        select(Users)
+        .options(selectinload(Users.role))
+        .where(*podminky)
+        .order_by(sloupec.desc() if sestupne else sloupec.asc(), Users.id)
+        .offset((strana - 1) * UZIVATELU_NA_STRANU)
+        .limit(UZIVATELU_NA_STRANU)
+    )
+
+    return StrankaUzivatelu(
+        dotaz=dotaz,
+        role_id=role_id,
+        razeni=razeni,
+        sestupne=sestupne,
+        strana=strana,
+        pocet_stran=pocet_stran,
+        celkem=celkem,
+        uzivatele=[
+            UzivatelSpravy(
+                id=u.id,
+                login=u.login,
+                jmeno=u.jmeno,
+                email=u.email,
+                adresa=u.adresa,
+                telefon=u.telefon,
+                is_active=bool(u.is_active),
+                role=[r.nazev for r in u.role]
+            )
+            for u in uzivatele
+        ]
+    )
 
 def get_user_by_id(db: Session, user_id: int) -> Optional[Users]:
     return db.query(Users).filter(Users.id == user_id).first()
 
 def get_all_roles(db: Session) -> List[Role]:
-    return db.query(Role).all()
\ No newline at end of file
+    return db.query(Role).all()
+
+def smazat_uzivatele_logic(db: Session, user_id: int) -> Set[int]:
+    """
+    Smaže uživatele jedním příkazem. Jeho vína, hodnocení (vlastní i jeho
+    vín), role, tokeny a členství v panelech smaže databáze kaskádou
+    (ON DELETE CASCADE), do session se nic nenačítá. Mazaná vína a hodnocení
+    se předem zapíšou do seznamu změn. Necommituje.
+
+    Vrací ID ročníků, kterým se změnila hodnocení, aby šlo přepočítat pořadí.
+    """
+    return smazat_uzivatele_hromadne(db, [user_id])[1]
+
+def smazat_uzivatele_hromadne(db: Session, user_ids: Iterable[int]) -> Tuple[int, Set[int]]:
+    """
+    Jako 'smazat_uzivatele_logic', ale pro více uživatelů stejnými příkazy.
+    Vrací počet opravdu smazaných uživatelů a ID dotčených ročníků.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0, set()
+    smazani = select(Users.id).where(Users.id.in_(user_ids))
+    vina = select(Vino.id).where(Vino.vinar_id.in_(user_ids))
+    hodnocena_vina = select(Hodnoceni.vino_id).where(Hodnoceni.hodnotitel_id.in_(user_ids))
+
+    dotcene_rocniky = set(db.scalars(
+        select(Vino.rocnik_id).where(or_(Vino.vinar_id.in_(user_ids), Vino.id.in_(hodnocena_vina))).distinct()
+    ))
+    oznacit_zmenene_vinare(db, [*user_ids, *db.scalars(
+        select(Vino.vinar_id).where(Vino.id.in_(hodnocena_vina)).distinct()
+    )])
+
+    zaznamenat_zmeny_dotazem(
+        db,
+        "HODNOCENI",
+        select(Hodnoceni.id).where(or_(Hodnoceni.hodnotitel_id.in_(user_ids), Hodnoceni.vino_id.in_(vina))),
+        SMAZANI
+    )
+    zaznamenat_zmeny_dotazem(db, "VINO", vina, SMAZANI)
+    zaznamenat_zmeny_dotazem(db, "USERS", smazani, SMAZANI)
+    smazano = db.execute(delete(Users).where(Users.id.in_(user_ids))).rowcount
+    return smazano, dotcene_rocniky
+
+def nastavit_aktivitu(db: Session, user_ids: Iterable[int], aktivni: bool) -> int:
+    """
+    Aktivuje nebo deaktivuje uživatele jedním příkazem UPDATE. Do seznamu
+    změn se zapíšou jen ti, kterým se stav opravdu mění. Necommituje.
+    Vrací počet změněných uživatelů.
+    """
+    podminka = (Users.id.in_(list(user_ids)), Users.is_active.is_not(aktivni))
+    zaznamenat_zmeny_dotazem(db, "USERS", select(Users.id).where(*podminka), UPRAVA)
+    return db.execute(update(Users).where(*podminka).values(is_active=aktivni)).rowcount
+
+def pridat_roli(db: Session, user_ids: Iterable[int], role_id: int) -> int:
+    """
+    Přidá roli uživatelům, kteří ji ještě nemají, jedním INSERT ... SELECT.
+    Necommituje. Vrací počet přidaných vazeb.
+    """
+    vyber = (
+        select(Users.id, literal(role_id))
+        .where(
+            Users.id.in_(list(user_ids)),
+            ~exists().where(UserRole.user_id == Users.id, UserRole.role_id == role_id)
+        )
+    )
+    return db.execute(insert(UserRole).from_select([UserRole.user_id, UserRole.role_id], vyber)).rowcount
+
+def odebrat_roli(db: Session, user_ids: Iterable[int], role_id: int) -> int:
+    """Odebere roli uživatelům jedním příkazem DELETE. Necommituje. Vrací počet odebraných vazeb."""
+    return db.execute(
+        delete(UserRole).where(UserRole.user_id.in_(list(user_ids)), UserRole.role_id == role_id)
+    ).rowcount
@@ -1,40 +1,60 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, desc
-from typing import List, Tuple, Optional
+from sqlalchemy.orm import Session, joinedload, contains_eager, aliased
+from sqlalchemy import select, func, union_all
+from typing import Iterator, List, Tuple, Optional
 
-from app.models.db import Vino, Hodnoceni, Users
-from app.models.schemas import VinoCreate, VinoWithStats
+from app.core.archiv import VinoArchiv, HodnoceniArchiv, UmisteniArchiv
+from app.models.db import Vino, Hodnoceni, Users, Umisteni, Rocnik, LetVino
+from app.models.schemas import VinoCreate, VinoWithStats, VinoHistorie, Medaile
+from app.repositories.rocniky import je_archivovany
 
-def get_vina_by_rocnik(
+DAVKA_RADKU = 100
+
+def iter_vina_by_rocnik(
     db: Session,
     rocnik_id: int
-) -> List[VinoWithStats]:
+) -> Iterator[VinoWithStats]:
     """
-    Vrátí seznam vín pro daný ročník seřazený podle hodnocení.
+    Postupně vrací vína daného ročníku seřazená podle oficiálního umístění.
+    Statistiky i pořadí se čtou z předpočítané tabulky UMISTENI.
+    U archivovaného ročníku se stejný dotaz položí nad tabulkami archivu.
+    Řádky se z databáze načítají po dávkách (yield_per), ne všechny najednou.
     """
+    if je_archivovany(db, rocnik_id):
+        VinoT, UmisteniT = VinoArchiv, UmisteniArchiv
+    else:
+        VinoT, UmisteniT = Vino, Umisteni
+
     vyber_vin = (
-        db.query(
-            Vino,
-            func.avg(Hodnoceni.body).label("prumer_body"),
-            func.count(Hodnoceni.id).label("pocet_hodnoceni")
+        db.query(VinoT, UmisteniT)
+        .outerjoin(UmisteniT, UmisteniT.vino_id == VinoT.id)
+        .options(joinedload(VinoT.vinar))
+        .filter(VinoT.rocnik_id == rocnik_id)
+        .order_by(
+            UmisteniT.prumer_body.desc(),
+            UmisteniT.pocet_hodnoceni.desc(),
+            UmisteniT.rozptyl,
+            VinoT.nazev
         )
-        .outerjoin(Vino.hodnoceni)
-        .options(joinedload(Vino.vinar))
-        .filter(Vino.rocnik_id == rocnik_id)
-        .group_by(Vino.id)
-        .order_by(desc("prumer_body"), Vino.nazev)
+        .yield_per(DAVKA_RADKU)
     )
     
-    results = vyber_vin.all()
-    
-    hodnocena_vina = []
-    for vino, avg, count in results:
+    for vino, umisteni in vyber_vin:
         vino_dto = VinoWithStats.model_validate(vino)
-        vino_dto.prumer_body = round(avg, 1) if avg else 0.0
-        vino_dto.pocet_hodnoceni = count
-        hodnocena_vina.append(vino_dto)
-        
-    return hodnocena_vina
+        if umisteni:
+            vino_dto.prumer_body = umisteni.prumer_body or 0.0
+            vino_dto.pocet_hodnoceni = umisteni.pocet_hodnoceni
+            vino_dto.rozptyl = umisteni.rozptyl
+            vino_dto.medaile = Medaile(umisteni.medaile) if umisteni.medaile else None
+            vino_dto.poradi_barva = umisteni.poradi_barva
+            vino_dto.poradi_privlastek = umisteni.poradi_privlastek
+        yield vino_dto
+
+def get_vina_by_rocnik(
+    db: Session,
+    rocnik_id: int
+) -> List[VinoWithStats]:
+    """Vrátí celý seznam vín ročníku (viz iter_vina_by_rocnik)."""
+    return list(iter_vina_by_rocnik(db, rocnik_id))
 
 def get_vino_detail(
     db: Session,
@@ -42,6 +62,7 @@ def get_vino_detail(
 ) -> Tuple[Optional[Vino], List[Hodnoceni]]:
     """
     Vrátí objekt vína a seznam hodnocení.
+    Víno, které není v hlavní databázi, se ještě hledá v archivu.
     """
     vino = (
         db.query(Vino)
@@ -54,12 +75,109 @@ def get_vino_detail(
     )
     
     if not vino:
-        return None, []
+        return _get_vino_detail_z_archivu(db, vino_id)
     
     sorted_ratings = sorted(vino.hodnoceni, key=lambda x: x.body or 0, reverse=True)
     
     return vino, sorted_ratings
 
+def _get_vino_detail_z_archivu(
+    db: Session,
+    vino_id: int
+) -> Tuple[Optional[VinoArchiv], List[HodnoceniArchiv]]:
+    vino = (
+        db.query(VinoArchiv)
+        .options(joinedload(VinoArchiv.vinar))
+        .filter(VinoArchiv.id == vino_id)
+        .first()
+    )
+
+    if not vino:
+        return None, []
+
+    hodnoceni = (
+        db.query(HodnoceniArchiv)
+        .options(joinedload(HodnoceniArchiv.hodnotitel))
+        .filter(HodnoceniArchiv.vino_id == vino_id)
+        .order_by(HodnoceniArchiv.body.desc())
+        .all()
+    )
+
+    return vino, hodnoceni
+
+def _vina_k_hodnoceni(db: Session, dotaz, rocnik_id: int, hodnotitel_id: int, let_id: Optional[int]):
+    dotaz = dotaz.filter(Vino.rocnik_id == rocnik_id, Vino.vinar_id != hodnotitel_id)
+    if let_id is not None:
+        dotaz = dotaz.join(LetVino, LetVino.vino_id == Vino.id).filter(LetVino.let_id == let_id)
+    return dotaz
+
+def existuji_vina_k_hodnoceni(
+    db: Session,
+    rocnik_id: int,
+    hodnotitel_id: int,
+    let_id: Optional[int] = None
+) -> bool:
+    """Zjistí, zda jsou v ročníku (případně v letu) cizí vína, která může hodnotitel hodnotit."""
+    return db.query(
+        _vina_k_hodnoceni(db, db.query(Vino.id), rocnik_id, hodnotitel_id, let_id).exists()
+    ).scalar()
+
+def iter_vina_k_hodnoceni(
+    db: Session,
+    rocnik_id: int,
+    hodnotitel_id: int,
+    let_id: Optional[int] = None
+) -> Iterator[dict]:
+    """
+    Postupně vrací cizí vína ročníku seřazená podle názvu spolu
+    s hodnocením, které jim hodnotitel už dal (nebo None).
+    Pokud je zadán degustační let, vrací jen vína z něj.
+    """
+    MojeHodnoceni = aliased(Hodnoceni)
+
+    vysledky = (
+        _vina_k_hodnoceni(db, db.query(Vino, MojeHodnoceni), rocnik_id, hodnotitel_id, let_id)
+        .join(Vino.vinar)
+        .outerjoin(MojeHodnoceni, (MojeHodnoceni.vino_id == Vino.id) & (MojeHodnoceni.hodnotitel_id == hodnotitel_id))
+        .options(contains_eager(Vino.vinar))
+        .order_by(Vino.nazev)
+        .yield_per(DAVKA_RADKU)
+    )
+
+    for vino, hodnoceni in vysledky:
+        yield {
+            "vino": vino,
+            "hodnoceni": hodnoceni
+        }
+
+def get_vino_k_hodnoceni(
+    db: Session,
+    vino_id: int,
+    hodnotitel_id: int
+) -> Optional[dict]:
+    """
+    Jedno víno s hodnocením, které mu hodnotitel dal (nebo None), ve stejném
+    tvaru jako iter_vina_k_hodnoceni. Slouží k překreslení jednoho řádku archu.
+    """
+    MojeHodnoceni = aliased(Hodnoceni)
+
+    radek = (
+        db.query(Vino, MojeHodnoceni)
+        .join(Vino.vinar)
+        .outerjoin(MojeHodnoceni, (MojeHodnoceni.vino_id == Vino.id) & (MojeHodnoceni.hodnotitel_id == hodnotitel_id))
+        .options(contains_eager(Vino.vinar))
+        .filter(Vino.id == vino_id)
+        .first()
+    )
+    if not radek:
+        return None
+
+    vino, hodnoceni = radek
+    return {
+        "vino": vino,
+        "hodnoceni": hodnoceni
+    }
+
 def get_vina_by_vinar(
     db: Session,
     rocnik_id: int,
@@ -73,4 +191,54 @@ def get_vina_by_vinar(
         .filter(Vino.rocnik_id == rocnik_id, Vino.vinar_id == vinar_id)
         .order_by(Vino.nazev)
         .all()
-    )
\ No newline at end of file
+    )
+
+def get_historie_vinare(
+    db: Session,
+    vinar_id: int
+) -> List[VinoHistorie]:
+    """
+    Vrátí všechna vína vinaře ze všech ročníků včetně průměru bodů,
+    počtu hodnocení, medaile a umístění.
+
+    Vše se načte jedním agregačním dotazem (víno + ročník + hodnocení + umístění),
+    bez postupného donačítání přes relace 'Users.vina' a 'Vino.hodnoceni'.
+    Stejný výběr nad hlavní databází a nad archivem se spojí přes UNION ALL.
+    """
+    def vyber(VinoT, HodnoceniT, UmisteniT):
+        return (
+            select(
+                VinoT.id,
+                VinoT.nazev,
+                VinoT.barva,
+                VinoT.odruda,
+                VinoT.privlastek,
+                VinoT.sladkost,
+                VinoT.rok_sklizne,
+                VinoT.rocnik_id,
+                Rocnik.rok,
+                func.coalesce(func.round(func.avg(HodnoceniT.body), 1), 0.0).label("prumer_body"),
+                func.count(HodnoceniT.id).label("pocet_hodnoceni"),
+                UmisteniT.medaile,
+                UmisteniT.poradi_barva,
+                UmisteniT.poradi_privlastek
+            )
+            .join(Rocnik, Rocnik.id == VinoT.rocnik_id)
+            .outerjoin(HodnoceniT, HodnoceniT.vino_id == VinoT.id)
+            .outerjoin(UmisteniT, UmisteniT.vino_id == VinoT.id)
+            .where(VinoT.vinar_id == vinar_id)
+            .group_by(VinoT.id)
+        )
+
+    vsechna = union_all(
+        vyber(Vino, Hodnoceni, Umisteni),
+        vyber(VinoArchiv, HodnoceniArchiv, UmisteniArchiv)
+    ).subquery()
+
+    dotaz = select(vsechna).order_by(
+        vsechna.c.rok.desc(),
+        vsechna.c.poradi_barva.nulls_last(),
+        vsechna.c.nazev
+    )
+
+    return [VinoHistorie.model_validate(dict(radek)) for radek in db.execute(dotaz).mappings()]
\ No newline at end of file
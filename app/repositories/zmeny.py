@@ -0,0 +1,57 @@
+from typing import Optional
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import zmena, odberatel_zmen
+from app.models.schemas import ZmenaRead, DavkaZmen
+
+
+def nacist_zmeny(db: Session, od_verze: int, limit: Optional[int] = None) -> DavkaZmen:
+    """
+    Vrátí nejvýš 'limit' změn s verzí vyšší než 'od_verze' v pořadí, v jakém
+    vznikly, a verzi, od které se má číst příště.
+    """
+    limit = limit or settings.ZMENY_DAVKA
+    radky = db.execute(
+        select(zmena).where(zmena.c.verze > od_verze).order_by(zmena.c.verze).limit(limit)
+    ).mappings().all()
+    zmeny = [ZmenaRead.model_validate(dict(radek)) for radek in radky]
+    return DavkaZmen(zmeny=zmeny, dalsi_verze=zmeny[-1].verze if zmeny else od_verze)
+
+def get_pozice(db: Session, odberatel: str) -> int:
+    """Poslední verze, kterou odběratel zpracoval (nový odběratel začíná od nuly)."""
+    return db.scalar(select(odberatel_zmen.c.verze).where(odberatel_zmen.c.nazev == odberatel)) or 0
+
+def potvrdit_pozici(db: Session, odberatel: str, verze: int) -> None:
+    """
+    Uloží, že odběratel zpracoval změny až po 'verze'. Pozice se nikdy
+    nevrací zpět, opakované potvrzení starší dávky nic nezmění. Necommituje.
+
+    Zapisuje se přímo přes spojení, ne přes session, aby posun pozice
+    nezvýšil verzi dat a nevyprázdnil cache všech workerů.
+    """
+    db.connection().execute(
+        sqlite_insert(odberatel_zmen)
+        .values(nazev=odberatel, verze=verze)
+        .on_conflict_do_update(
+            index_elements=[odberatel_zmen.c.nazev],
+            set_={"verze": func.max(odberatel_zmen.c.verze, verze)}
+        )
+    )
+
+def get_davka_odberatele(db: Session, odberatel: str, limit: Optional[int] = None) -> DavkaZmen:
+    """Další dávka změn od uložené pozice odběratele (pozici neposouvá)."""
+    return nacist_zmeny(db, get_pozice(db, odberatel), limit)
+
+def procistit_zmeny(db: Session) -> int:
+    """
+    Smaže změny, které už zpracovali všichni registrovaní odběratelé.
+    Bez odběratelů se nemaže nic. Necommituje. Vrací počet smazaných.
+    Stejně jako posun pozice nemění verzi dat (data se nemění).
+    """
+    nejnizsi = db.scalar(select(func.min(odberatel_zmen.c.verze)))
+    if not nejnizsi:
+        return 0
+    return db.connection().execute(delete(zmena).where(zmena.c.verze <= nejnizsi)).rowcount
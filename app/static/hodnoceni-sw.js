@@ -0,0 +1,71 @@
+// Service worker offline archu hodnocení. Drží v cache stránku hodnocení
+// a assety, které potřebuje, aby se arch otevřel i bez připojení.
+// Neuložené změny hodnocení nejsou tady, ale v IndexedDB (hodnoceni.js).
+var CACHE = 'kost-hodnoceni-v1';
+var PREDPONA_CACHE = 'kost-hodnoceni-';
+
+self.addEventListener('install', function () {
+    self.skipWaiting();
+});
+
+self.addEventListener('activate', function (udalost) {
+    udalost.waitUntil(
+        caches.keys()
+            .then(function (nazvy) {
+                return Promise.all(nazvy
+                    .filter(function (nazev) { return nazev.indexOf(PREDPONA_CACHE) === 0 && nazev !== CACHE; })
+                    .map(function (nazev) { return caches.delete(nazev); }));
+            })
+            .then(function () { return self.clients.claim(); })
+    );
+});
+
+// Assety mají v názvu otisk obsahu a nikdy se nemění: nejdřív cache.
+function nejdrivCache(pozadavek) {
+    return caches.open(CACHE).then(function (cache) {
+        return cache.match(pozadavek).then(function (ulozena) {
+            return ulozena || fetch(pozadavek).then(function (odpoved) {
+                if (odpoved.ok) {
+                    cache.put(pozadavek, odpoved.clone());
+                }
+                return odpoved;
+            });
+        });
+    });
+}
+
+// Stránka hodnocení: nejdřív síť (aktuální stav), bez sítě poslední uložená kopie.
+function nejdrivSit(pozadavek) {
+    return caches.open(CACHE).then(function (cache) {
+        return fetch(pozadavek)
+            .then(function (odpoved) {
+                if (odpoved.ok && !odpoved.redirected) {
+                    cache.put(pozadavek, odpoved.clone());
+                }
+                return odpoved;
+            })
+            .catch(function () {
+                return cache.match(pozadavek).then(function (ulozena) {
+                    return ulozena || cache.match(pozadavek, { ignoreSearch: true });
+                }).then(function (ulozena) {
+                    return ulozena || Response.error();
+                });
+            });
+    });
+}
+
+self.addEventListener('fetch', function (udalost) {
+    var pozadavek = udalost.request;
+    if (pozadavek.method !== 'GET') {
+        return;
+    }
+    var url = new URL(pozadavek.url);
+    if (url.origin !== self.location.origin) {
+        return;
+    }
+    if (url.pathname.indexOf('/assets/') === 0) {
+        udalost.respondWith(nejdrivCache(pozadavek));
+    } else if (url.pathname === '/vina/hodnoceni') {
+        udalost.respondWith(nejdrivSit(pozadavek));
+    }
+});
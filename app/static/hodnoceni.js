@@ -0,0 +1,329 @@
+// Offline arch hodnotitele. Každá změna bodů nebo poznámky se hned uloží
+// do IndexedDB v prohlížeči a odešle: jednotlivá změna na adresu svého
+// řádku (vrátí jen ten řádek), nahromaděné změny po dávkách na
+// /vina/hodnoceni/sync.
+// Bez připojení se dá hodnotit dál, změny odejdou, jakmile je síť zpět.
+// Bez JavaScriptu funguje arch jako obyčejný formulář.
+(function () {
+    var formular = document.getElementById('rating-form');
+    if (!formular || !window.indexedDB || !window.fetch || !window.Promise) {
+        return;
+    }
+
+    var ZAZNAMENAT_PO_MS = 400;
+    var ODESLAT_PO_MS = 1500;
+    var OPAKOVAT_MS = 30000;
+    var DAVKA = 100;
+
+    var stav = document.getElementById('stav-synchronizace');
+    var databaze = null;
+    var odesilane = {};
+    var probiha = false;
+    var casovacOdeslani = null;
+    var casovaceZaznamu = {};
+
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker
+            .register('/vina/hodnoceni/sw.js', { scope: '/vina/hodnoceni' })
+            .catch(function () { /* bez service workeru jen nepůjde otevřít stránku offline */ });
+    }
+
+    function zobrazit(text) {
+        if (stav) {
+            stav.textContent = text;
+        }
+    }
+
+    function otevrit() {
+        if (databaze) {
+            return Promise.resolve(databaze);
+        }
+        return new Promise(function (hotovo, chyba) {
+            var pozadavek = indexedDB.open('kost-hodnoceni-' + formular.dataset.hodnotitel, 1);
+            pozadavek.onupgradeneeded = function () {
+                pozadavek.result.createObjectStore('zmeny', { keyPath: 'klic' });
+            };
+            pozadavek.onsuccess = function () {
+                databaze = pozadavek.result;
+                hotovo(databaze);
+            };
+            pozadavek.onerror = function () { chyba(pozadavek.error); };
+        });
+    }
+
+    function ulozeneZmeny() {
+        return otevrit().then(function (db) {
+            return new Promise(function (hotovo, chyba) {
+                var pozadavek = db.transaction('zmeny').objectStore('zmeny').getAll();
+                pozadavek.onsuccess = function () {
+                    hotovo(pozadavek.result.sort(function (a, b) { return a.cas - b.cas; }));
+                };
+                pozadavek.onerror = function () { chyba(pozadavek.error); };
+            });
+        });
+    }
+
+    // V jedné transakci vloží nové změny a smaže změny podle klíčů
+    function zapsat(vlozit, smazat) {
+        return otevrit().then(function (db) {
+            return new Promise(function (hotovo, chyba) {
+                var transakce = db.transaction('zmeny', 'readwrite');
+                var sklad = transakce.objectStore('zmeny');
+                (smazat || []).forEach(function (klic) { sklad.delete(klic); });
+                (vlozit || []).forEach(function (zmena) { sklad.put(zmena); });
+                transakce.oncomplete = function () { hotovo(); };
+                transakce.onerror = function () { chyba(transakce.error); };
+            });
+        });
+    }
+
+    function novyKlic() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2) + Math.random().toString(36).slice(2);
+    }
+
+    function pole(vinoId) {
+        return {
+            body: formular.querySelector('[name="body_' + vinoId + '"]'),
+            poznamka: formular.querySelector('[name="poznamka_' + vinoId + '"]')
+        };
+    }
+
+    function zaznamenat(vinoId) {
+        var vstupy = pole(vinoId);
+        var text = vstupy.body.value.trim();
+        var body = text === '' ? null : Math.max(0, Math.min(100, parseInt(text, 10)));
+        if (body !== null && isNaN(body)) {
+            return Promise.resolve();
+        }
+        var zmena = {
+            klic: novyKlic(),
+            vino_id: vinoId,
+            body: body,
+            poznamka: vstupy.poznamka ? vstupy.poznamka.value.trim() : '',
+            cas: Date.now()
+        };
+        // Starší neodeslané změny téhož vína nahradí ta nová, dávky zůstanou malé
+        return ulozeneZmeny().then(function (zmeny) {
+            var nahrazene = zmeny
+                .filter(function (z) { return z.vino_id === vinoId && !odesilane[z.klic]; })
+                .map(function (z) { return z.klic; });
+            return zapsat([zmena], nahrazene);
+        }).then(function () {
+            zobrazit('Neodesláno: změny jsou uložené v zařízení.');
+            naplanovat(ODESLAT_PO_MS);
+        });
+    }
+
+    function naplanovat(za) {
+        clearTimeout(casovacOdeslani);
+        casovacOdeslani = setTimeout(synchronizovat, za);
+    }
+
+    function prevzitStavServeru(vysledek, zbyvajici) {
+        var cekaJesteZmena = zbyvajici.some(function (z) { return z.vino_id === vysledek.vino_id; });
+        if ((vysledek.stav !== 'zastarala' && vysledek.stav !== 'odmitnuta') || cekaJesteZmena) {
+            return;
+        }
+        var vstupy = pole(vysledek.vino_id);
+        if (vstupy.body) {
+            vstupy.body.value = vysledek.body === null ? '' : vysledek.body;
+        }
+        if (vstupy.poznamka) {
+            vstupy.poznamka.value = vysledek.poznamka || '';
+        }
+    }
+
+    // Odpověď, která dávku nepřijala: výpadek nebo přihlášení se zkusí znovu,
+    // dávku, kterou server odmítá jako celek, nemá smysl posílat znovu.
+    // Přesměrování (redirect: 'manual') znamená vypršelé přihlášení, jinak
+    // by fetch došel na přihlašovací stránku a její 200 vypadalo jako úspěch.
+    function neuspech(odpoved, davka) {
+        var prihlaseni = odpoved.type === 'opaqueredirect' || odpoved.status === 401;
+        if (prihlaseni || odpoved.status === 403 || odpoved.status >= 500) {
+            var chyba = new Error('Server změny zatím nepřijal (' + odpoved.status + ').');
+            chyba.prihlaseni = prihlaseni;
+            throw chyba;
+        }
+        return {
+            klice: davka.map(function (z) { return z.klic; }),
+            odmitnuto: odpoved.status
+        };
+    }
+
+    function odeslatDavku(davka) {
+        return fetch('/vina/hodnoceni/sync', {
+            method: 'POST',
+            credentials: 'same-origin',
+            redirect: 'manual',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ zmeny: davka })
+        }).then(function (odpoved) {
+            if (!odpoved.ok) {
+                return neuspech(odpoved, davka);
+            }
+            return odpoved.json().then(function (data) {
+                return {
+                    klice: data.vysledky.map(function (v) { return v.klic; }),
+                    prevzit: function (zbyvajici) {
+                        data.vysledky.forEach(function (v) { prevzitStavServeru(v, zbyvajici); });
+                    }
+                };
+            });
+        });
+    }
+
+    // Jednotlivou změnu uloží přes /vina/hodnoceni/vino/{id}, odpovědí je
+    // jen překreslený řádek tabulky, který nahradí ten ve stránce
+    function odeslatRadek(zmena, radek) {
+        var data = new URLSearchParams();
+        data.append('klic', zmena.klic);
+        data.append('cas', zmena.cas);
+        data.append('body', zmena.body === null ? '' : zmena.body);
+        data.append('poznamka', zmena.poznamka || '');
+
+        return fetch(radek.dataset.ulozit, {
+            method: 'POST',
+            credentials: 'same-origin',
+            redirect: 'manual',
+            headers: { 'Accept': 'text/html' },
+            body: data
+        }).then(function (odpoved) {
+            if (!odpoved.ok) {
+                return neuspech(odpoved, [zmena]);
+            }
+            return odpoved.text().then(function (html) {
+                return {
+                    klice: [zmena.klic],
+                    prevzit: function (zbyvajici) { nahraditRadek(zmena.vino_id, html, zbyvajici); }
+                };
+            });
+        });
+    }
+
+    // Dokud hodnotitel v řádku píše nebo na odeslání čeká jeho novější změna,
+    // vymění se jen buňka se stavem, jinak celý řádek (i se stavem ze serveru)
+    function nahraditRadek(vinoId, html, zbyvajici) {
+        var radek = document.getElementById('vino-' + vinoId);
+        var sablona = document.createElement('template');
+        sablona.innerHTML = html;
+        var novy = sablona.content.querySelector('tr');
+        if (!radek || !novy) {
+            return;
+        }
+        var rozpracovany = radek.contains(document.activeElement)
+            || casovaceZaznamu[vinoId]
+            || zbyvajici.some(function (z) { return z.vino_id === vinoId; });
+        if (!rozpracovany) {
+            radek.parentNode.replaceChild(novy, radek);
+            return;
+        }
+        var stavRadku = radek.querySelector('.stav-radku');
+        var novyStav = novy.querySelector('.stav-radku');
+        if (stavRadku && novyStav) {
+            stavRadku.parentNode.replaceChild(novyStav, stavRadku);
+        }
+    }
+
+    function synchronizovat() {
+        if (probiha) {
+            return Promise.resolve();
+        }
+        probiha = true;
+
+        return ulozeneZmeny().then(function (zmeny) {
+            var davka = zmeny.filter(function (z) { return !odesilane[z.klic]; }).slice(0, DAVKA);
+            if (!davka.length) {
+                probiha = false;
+                zobrazit(zmeny.length ? '' : 'Všechna hodnocení jsou uložena.');
+                return;
+            }
+            davka.forEach(function (z) { odesilane[z.klic] = true; });
+            zobrazit('Odesílám hodnocení…');
+
+            var radek = davka.length === 1 ? document.getElementById('vino-' + davka[0].vino_id) : null;
+            var odeslani = radek && radek.dataset.ulozit ? odeslatRadek(davka[0], radek) : odeslatDavku(davka);
+
+            return odeslani.then(function (vysledek) {
+                return zapsat([], vysledek.klice).then(ulozeneZmeny).then(function (zbyvajici) {
+                    if (vysledek.odmitnuto) {
+                        zobrazit('Server část hodnocení odmítl (' + vysledek.odmitnuto + ').');
+                        return -1;
+                    }
+                    vysledek.prevzit(zbyvajici);
+                    return zbyvajici.length;
+                });
+            }).then(function (zbyva) {
+                davka.forEach(function (z) { delete odesilane[z.klic]; });
+                probiha = false;
+                if (zbyva > 0) {
+                    return synchronizovat();
+                }
+                if (zbyva === 0) {
+                    zobrazit('Všechna hodnocení jsou uložena.');
+                }
+            }, function (chyba) {
+                davka.forEach(function (z) { delete odesilane[z.klic]; });
+                probiha = false;
+                zobrazit(chyba && chyba.prihlaseni
+                    ? 'Přihlášení vypršelo: změny jsou uložené v zařízení, přihlaste se znovu.'
+                    : 'Offline: změny jsou uložené v zařízení a odešlou se po připojení.');
+                naplanovat(OPAKOVAT_MS);
+            });
+        }, function () {
+            probiha = false;
+        });
+    }
+
+    // Neodeslané změny z minula mají přednost před stavem ve stránce
+    function obnovitNeodeslane() {
+        return ulozeneZmeny().then(function (zmeny) {
+            zmeny.forEach(function (z) {
+                var vstupy = pole(z.vino_id);
+                if (vstupy.body) {
+                    vstupy.body.value = z.body === null ? '' : z.body;
+                }
+                if (vstupy.poznamka) {
+                    vstupy.poznamka.value = z.poznamka || '';
+                }
+            });
+            if (zmeny.length) {
+                zobrazit('Neodesláno: ' + zmeny.length + ' změn uložených v zařízení.');
+            }
+        });
+    }
+
+    formular.addEventListener('input', function (udalost) {
+        var shoda = /^(body|poznamka)_(\d+)$/.exec(udalost.target.name || '');
+        if (!shoda) {
+            return;
+        }
+        var vinoId = parseInt(shoda[2], 10);
+        clearTimeout(casovaceZaznamu[vinoId]);
+        casovaceZaznamu[vinoId] = setTimeout(function () {
+            delete casovaceZaznamu[vinoId];
+            zaznamenat(vinoId);
+        }, ZAZNAMENAT_PO_MS);
+    });
+
+    formular.addEventListener('submit', function (udalost) {
+        udalost.preventDefault();
+        var cekajici = Object.keys(casovaceZaznamu).map(function (vinoId) {
+            clearTimeout(casovaceZaznamu[vinoId]);
+            delete casovaceZaznamu[vinoId];
+            return zaznamenat(parseInt(vinoId, 10));
+        });
+        Promise.all(cekajici).then(synchronizovat);
+    });
+
+    window.addEventListener('online', function () { synchronizovat(); });
+    setInterval(function () {
+        if (navigator.onLine !== false) {
+            synchronizovat();
+        }
+    }, OPAKOVAT_MS);
+
+    obnovitNeodeslane().then(synchronizovat);
+})();
@@ -0,0 +1,50 @@
+// Našeptávač pro textová pole s atributem data-naseptavac="<pole>".
+// Návrhy se načítají z /vina/naseptavac/<pole> do <datalist> pod polem.
+(function () {
+    var PRODLEVA_MS = 120;
+
+    function pripojit(input) {
+        var pole = input.dataset.naseptavac;
+        var seznam = document.createElement('datalist');
+        seznam.id = 'naseptavac-' + input.id;
+        input.setAttribute('list', seznam.id);
+        input.setAttribute('autocomplete', 'off');
+        input.parentNode.appendChild(seznam);
+
+        var casovac = null;
+        var posledni = null;
+        var pozadavek = null;
+
+        input.addEventListener('input', function () {
+            clearTimeout(casovac);
+            casovac = setTimeout(function () {
+                var dotaz = input.value.trim();
+                if (!dotaz || dotaz === posledni) {
+                    return;
+                }
+                posledni = dotaz;
+                if (pozadavek) {
+                    pozadavek.abort();
+                }
+                pozadavek = new AbortController();
+
+                fetch('/vina/naseptavac/' + pole + '?q=' + encodeURIComponent(dotaz), {
+                    signal: pozadavek.signal,
+                    credentials: 'same-origin'
+                })
+                    .then(function (odpoved) { return odpoved.ok ? odpoved.json() : []; })
+                    .then(function (navrhy) {
+                        seznam.innerHTML = '';
+                        navrhy.forEach(function (navrh) {
+                            var volba = document.createElement('option');
+                            volba.value = navrh;
+                            seznam.appendChild(volba);
+                        });
+                    })
+                    .catch(function () { /* zrušený nebo neúspěšný požadavek se ignoruje */ });
+            }, PRODLEVA_MS);
+        });
+    }
+
+    document.querySelectorAll('input[data-naseptavac]').forEach(pripojit);
+})();
@@ -0,0 +1,59 @@
+// Živý přenos výsledkové tabulky (Server-Sent Events z /prenos/{rocnik}).
+// Po změně pořadí přijdou jen změněné řádky a nové pořadí vín, tabulka
+// se upraví na místě. Bez EventSource zůstává obyčejná stránka.
+(function () {
+    var tabulka = document.getElementById('winesTable');
+    if (!tabulka || !tabulka.dataset.prenos || !window.EventSource) {
+        return;
+    }
+    var telo = tabulka.tBodies[0];
+    var zdroj = new EventSource(tabulka.dataset.prenos);
+
+    function nahraditRadek(vinoId, html) {
+        var sablona = document.createElement('template');
+        sablona.innerHTML = html;
+        var novy = sablona.content.querySelector('tr');
+        var radek = document.getElementById('vino-' + vinoId);
+        if (!novy) {
+            return;
+        }
+        if (radek) {
+            novy.style.display = radek.style.display;
+            radek.parentNode.replaceChild(novy, radek);
+        } else {
+            telo.appendChild(novy);
+        }
+    }
+
+    zdroj.addEventListener('poradi', function (udalost) {
+        var zmena = JSON.parse(udalost.data);
+        Object.keys(zmena.radky).forEach(function (vinoId) {
+            nahraditRadek(vinoId, zmena.radky[vinoId]);
+        });
+        zmena.smazane.forEach(function (vinoId) {
+            var radek = document.getElementById('vino-' + vinoId);
+            if (radek) {
+                radek.parentNode.removeChild(radek);
+            }
+        });
+        if (zmena.poradi) {
+            zmena.poradi.forEach(function (vinoId) {
+                var radek = document.getElementById('vino-' + vinoId);
+                if (radek) {
+                    telo.appendChild(radek);
+                }
+            });
+        }
+        // Nové řádky musí projít i filtrem, který má divák zrovna vyplněný
+        var hledani = document.getElementById('searchInput');
+        if (hledani && hledani.value && window.filterTable) {
+            window.filterTable();
+        }
+    });
+
+    // Stránka je starší než poslední změna nebo prohlížeč nestíhal zprávy
+    zdroj.addEventListener('obnovit', function () {
+        zdroj.close();
+        window.location.reload();
+    });
+})();
@@ -0,0 +1,63 @@
+import sys
+import os
+from pathlib import Path
+
+sys.path.append(os.getcwd())
+
+from app.core.backup import (
+    vytvorit_zalohu,
+    seznam_zaloh,
+    overit_zalohu,
+    obnovit_zalohu,
+    zaloha_archivu,
+    ChybaZalohy
+)
+from app.core.souteze import VYCHOZI, soutez_kontext
+
+NAPOVEDA = """Použití:
+    python scripts/backup.py zalohovat          vytvoří novou zálohu
+    python scripts/backup.py seznam             vypíše existující zálohy
+    python scripts/backup.py overit <soubor>    zkontroluje integritu zálohy
+    python scripts/backup.py obnovit <soubor>   obnoví databázi i archiv ze zálohy (zastavte aplikaci!)
+
+Jinou než výchozí soutěž vyberte proměnnou prostředí SOUTEZ=<nazev>."""
+
+def main():
+    if len(sys.argv) < 2:
+        print(NAPOVEDA)
+        return 1
+
+    prikaz = sys.argv[1]
+
+    try:
+        if prikaz == "zalohovat":
+            cesta = vytvorit_zalohu()
+            print(f"Záloha vytvořena: {cesta}")
+
+        elif prikaz == "seznam":
+            for cesta in seznam_zaloh():
+                archiv = zaloha_archivu(cesta)
+                popis = f" + archiv {archiv.stat().st_size // 1024} kB" if archiv.exists() else ""
+                print(f"{cesta.name}  ({cesta.stat().st_size // 1024} kB{popis})")
+
+        elif prikaz == "overit" and len(sys.argv) == 3:
+            cesta = Path(sys.argv[2])
+            print("OK" if overit_zalohu(cesta) else "POŠKOZENÁ")
+
+        elif prikaz == "obnovit" and len(sys.argv) == 3:
+            obnovit_zalohu(Path(sys.argv[2]))
+            print("Databáze byla obnovena ze zálohy.")
+
+        else:
+            print(NAPOVEDA)
+            return 1
+
+    except ChybaZalohy as e:
+        print(f"CHYBA: {e}")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    with soutez_kontext(os.environ.get("SOUTEZ", VYCHOZI)):
+        sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Porovná smazání ročníku se 100 000 hodnoceními dvěma způsoby:
+
+    orm       ORM načte ročník, všechna jeho vína, hodnocení, umístění a zařazení
+              do letů a maže je po jednom řádku (původní cascade="all, delete-orphan")
+    kaskada   jeden DELETE ročníku, závislé řádky smaže databáze (ON DELETE CASCADE),
+              viz app.repositories.rocniky.smazat_rocnik_logic
+
+Běží nad dočasnými databázemi, skutečná data nepoužívá. Každý způsob se měří
+dvakrát na čerstvé kopii: jednou čas, jednou špička paměti (tracemalloc
+měření času zkresluje).
+
+Použití:
+    python scripts/benchmark_mazani.py [pocet_hodnoceni] [pocet_hodnotitelu]
+"""
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.getcwd())
+
+from app.core.archiv import pripravit_archiv
+from app.core.config import settings
+from app.core.database import Base, SessionLocal, get_engine, registr_shardu
+from app.core.fulltext import pripravit_hledani
+from app.core.souteze import cesta_databaze, soutez_kontext
+from app.models.db import Rocnik
+from app.repositories.degustace import naplanovat_lety
+from app.repositories.poradi import prepocitat_poradi
+from app.repositories.rocniky import smazat_rocnik_logic
+
+VZOR = "benchmark-vzor"
+ROCNIK_ID = 1
+BARVY = ["Bílé", "Červené", "Růžové"]
+
+
+def log(msg):
+    print(f"[INFO] {msg}")
+
+def pripravit_vzor(pocet_hodnoceni: int, pocet_hodnotitelu: int) -> None:
+    """Založí databázi s jedním ročníkem, vinaři, hodnotiteli, víny, hodnoceními a plánem letů."""
+    cesta = cesta_databaze(VZOR)
+    cesta.parent.mkdir(parents=True)
+    sqlite3.connect(cesta).close()
+
+    pocet_vin = max(1, pocet_hodnoceni // pocet_hodnotitelu)
+    with soutez_kontext(VZOR):
+        engine = get_engine()
+        Base.metadata.create_all(bind=engine)
+        pripravit_archiv()
+        pripravit_hledani(engine)
+
+        raw = engine.raw_connection()
+        try:
+            conn = raw.driver_connection
+            conn.execute("INSERT INTO ROCNIK (id, rok, is_active, is_archived) VALUES (?, 2025, 1, 0)", (ROCNIK_ID,))
+            conn.executemany(
+                "INSERT INTO USERS (id, login, password_hash, jmeno, is_active, email) VALUES (?, ?, '-', ?, 1, ?)",
+                [(i, f"u{i}", f"Uživatel {i}", f"u{i}@example.com") for i in range(1, pocet_hodnotitelu + 11)]
+            )
+            vinari = range(pocet_hodnotitelu + 1, pocet_hodnotitelu + 11)
+            conn.executemany(
+                "INSERT INTO VINO (id, nazev, barva, odruda, privlastek, sladkost, rok_sklizne, vinar_id, rocnik_id) "
+                "VALUES (?, ?, ?, 'Ryzlink rýnský', 'Kabinet', 'Suché', 2024, ?, ?)",
+                [(v, f"Víno {v}", random.choice(BARVY), random.choice(vinari), ROCNIK_ID) for v in range(1, pocet_vin + 1)]
+            )
+            conn.executemany(
+                "INSERT INTO HODNOCENI (body, poznamka, vino_id, hodnotitel_id) VALUES (?, 'Harmonické víno.', ?, ?)",
+                (
+                    (random.randint(70, 100), v, h)
+                    for v in range(1, pocet_vin + 1)
+                    for h in range(1, pocet_hodnotitelu + 1)
+                )
+            )
+            conn.commit()
+        finally:
+            raw.close()
+
+        db = SessionLocal()
+        try:
+            prepocitat_poradi(db, ROCNIK_ID)
+            naplanovat_lety(db, ROCNIK_ID)
+            db.commit()
+        finally:
+            db.close()
+    registr_shardu.engine(VZOR).dispose()
+    log(f"Vzorová databáze: {pocet_vin} vín, {pocet_vin * pocet_hodnotitelu} hodnocení.")
+
+def smazat_orm(db) -> None:
+    rocnik = db.get(Rocnik, ROCNIK_ID)
+    for vino in rocnik.vina:
+        vino.hodnoceni, vino.umisteni, vino.zarazeni_do_letu
+    for let in rocnik.lety:
+        let.vina, let.panel
+    db.delete(rocnik)
+
+def smazat_kaskadou(db) -> None:
+    smazat_rocnik_logic(db, ROCNIK_ID)
+
+def zmerit(nazev: str, smazat, pamet: bool) -> float:
+    """Smaže ročník v čerstvé kopii vzoru, vrací sekundy nebo špičku paměti v MB."""
+    cil = cesta_databaze(nazev)
+    shutil.copytree(cesta_databaze(VZOR).parent, cil.parent)
+
+    with soutez_kontext(nazev):
+        db = SessionLocal()
+        try:
+            if pamet:
+                tracemalloc.start()
+            zacatek = time.perf_counter()
+            smazat(db)
+            db.commit()
+            trvani = time.perf_counter() - zacatek
+            if pamet:
+                _, spicka = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            zbyva = db.connection().exec_driver_sql(
+                "SELECT (SELECT count(*) FROM VINO) + (SELECT count(*) FROM HODNOCENI) + (SELECT count(*) FROM UMISTENI)"
+            ).scalar()
+        finally:
+            db.close()
+    registr_shardu.engine(nazev).dispose()
+
+    if zbyva:
+        raise RuntimeError(f"{nazev}: po smazání zůstalo {zbyva} řádků")
+    return spicka / (1024 * 1024) if pamet else trvani
+
+def main():
+    pocet_hodnoceni = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    pocet_hodnotitelu = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    adresar = tempfile.mkdtemp(prefix="kost-benchmark-")
+    settings.SOUTEZE_DIR = adresar
+    try:
+        pripravit_vzor(pocet_hodnoceni, pocet_hodnotitelu)
+        print(f"{'způsob':<10}{'čas [s]':>10}{'paměť [MB]':>14}")
+        for nazev, smazat in (("orm", smazat_orm), ("kaskada", smazat_kaskadou)):
+            cas = zmerit(f"benchmark-{nazev}-cas", smazat, pamet=False)
+            pamet = zmerit(f"benchmark-{nazev}-pamet", smazat, pamet=True)
+            print(f"{nazev:<10}{cas:>10.2f}{pamet:>14.1f}")
+    finally:
+        shutil.rmtree(adresar, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import sys
+import os
+
+sys.path.append(os.getcwd())
+
+from app.core.assets import sestavit_assety
+from app.core.config import settings
+
+def main():
+    """
+    Sestaví statické soubory s otiskem obsahu a jejich komprimované varianty
+    už při buildu (aplikace to jinak udělá sama při startu).
+    """
+    manifest = sestavit_assety()
+    for puvodni, hashovany in manifest.items():
+        print(f"{puvodni} -> {hashovany}")
+    print(f"Assety připraveny v {settings.ASSETS_DIR}.")
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ import os
 sys.path.append(os.getcwd())
 
 from app.core.database import SessionLocal
+from app.core.souteze import VYCHOZI, soutez_kontext
 from app.models.db import Users, Role
 from app.core.security import get_password_hash
 
@@ -35,4 +36,5 @@ def create_admin():
     print("--- Hotovo ---")
 
 if __name__ == "__main__":
-    create_admin()
\ No newline at end of file
+    with soutez_kontext(os.environ.get("SOUTEZ", VYCHOZI)):
+        create_admin()
\ No newline at end of file
@@ -1,9 +1,32 @@
-from app.core.database import engine, Base, SessionLocal
+import os
+import sqlite3
+
+from app.core.database import get_engine, Base, SessionLocal
+from app.core.souteze import VYCHOZI, cesta_archivu, cesta_databaze, soutez_kontext
+from app.core.migrace import migrovat
+from app.core.archiv import pripravit_archiv
+from app.core.fulltext import pripravit_hledani
+from app.core.udrzba import zapnout_inkrementalni_vacuum
 from app.models.db import Role, Users
 
 def init_db():
+    """
+    Založí nebo zmigruje databázi soutěže zadané proměnnou prostředí SOUTEZ
+    (bez ní výchozí soutěže), např. 'SOUTEZ=vinobrani python scripts/init_db.py'.
+    """
+    cesta = cesta_databaze()
+    cesta.parent.mkdir(parents=True, exist_ok=True)
+    sqlite3.connect(cesta).close()
+    engine = get_engine()
 
     Base.metadata.create_all(bind=engine)
+    migrovat(engine)
+    pripravit_archiv()
+    pripravit_hledani(engine)
+    engine.dispose()
+    for soubor in (cesta_databaze(), cesta_archivu()):
+        if zapnout_inkrementalni_vacuum(soubor):
+            print(f"{soubor}: zapnuto auto_vacuum=INCREMENTAL.")
     
     db = SessionLocal()
     roles = ["Admin", "Vinař", "Hodnotitel"]
@@ -15,4 +38,5 @@ def init_db():
     print("Databáze inicializována.")
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    with soutez_kontext(os.environ.get("SOUTEZ", VYCHOZI)):
+        init_db()
\ No newline at end of file